@@ -0,0 +1,346 @@
+"""
+Журнал проездов: каждый вердикт (время, камера, прочтение OCR, очищенный номер,
+лучшее совпадение, схожесть, решение, длительности стадий, вырезка номера).
+
+Запись не задерживает проверку: record() только кладёт событие в очередь,
+а поток журнала пишет накопившиеся события пачкой в одной транзакции.
+События хранятся по месяцам - в отдельном файле SQLite на месяц
+(access_2024_05.db), поэтому срок хранения соблюдается удалением старых
+файлов целиком, а индексы текущего месяца остаются небольшими.
+Запросы по номеру, камере и времени идут по индексам только нужных месяцев:
+    python access_journal.py А123ВС77 [--month] [--camera "Камера 1"] [--limit 100]
+"""
+import os
+import re
+import json
+import time
+import queue
+import shutil
+import sqlite3
+import argparse
+import threading
+
+import cv2
+
+from metrics import get_registry
+from plate_storage import configure, canonical_plate
+
+PARTITION_RE = re.compile(r'^access_(\d{4})_(\d{2})\.db$')
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        time REAL NOT NULL,
+        camera TEXT,
+        raw_text TEXT,
+        plate TEXT,
+        match_plate TEXT,
+        owner TEXT,
+        similarity REAL,
+        granted INTEGER NOT NULL,
+        confidence REAL,
+        timings TEXT,
+        crop TEXT
+    )
+    """,
+    # plate и match_plate - в виде canonical_plate: поиск по номеру находит и прочтение, и совпадение из базы
+    "CREATE INDEX IF NOT EXISTS idx_events_plate ON events (plate, time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_match ON events (match_plate, time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_camera ON events (camera, time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_time ON events (time)",
+)
+
+COLUMNS = ('id', 'time', 'camera', 'raw_text', 'plate', 'match_plate', 'owner', 'similarity',
+           'granted', 'confidence', 'timings', 'crop')
+
+
+def month_key(timestamp):
+    """(год, месяц) местного времени"""
+    moment = time.localtime(timestamp)
+    return moment.tm_year, moment.tm_mon
+
+
+def month_start(timestamp=None):
+    """Начало месяца (местное время), в котором находится timestamp"""
+    moment = time.localtime(time.time() if timestamp is None else timestamp)
+    return time.mktime((moment.tm_year, moment.tm_mon, 1, 0, 0, 0, 0, 0, -1))
+
+
+def shift_month(key, months):
+    year, month = key
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+class AccessJournal:
+    """
+    Журнал проездов в каталоге directory. Старше retention_months месяцев
+    (текущий считается) события удаляются вместе с вырезками.
+    Если очередь переполнена (диск не успевает), событие отбрасывается
+    и учитывается в journal_dropped_total - проверка на въезде не ждёт
+    """
+    def __init__(self, directory='journal', retention_months=12, batch_size=500, flush_interval=1.0,
+                 queue_size=10000, save_crops=False):
+        self.directory = directory
+        self.retention_months = retention_months
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.save_crops = save_crops
+        self.metrics = get_registry()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._connections = {}   # (год, месяц) -> соединение потока записи
+        self._lock = threading.Lock()  # Соединения месяцев: запись и удаление старых
+        self._thread = None
+        self._running = False
+        self._crop_ids = 0
+        self._last_purge = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """Журнал по настройкам config.py; None, если журнал выключен"""
+        if not config['journal_dir']:
+            return None
+        return cls(config['journal_dir'], retention_months=config['journal_retention_months'],
+                   batch_size=config['journal_batch_size'], flush_interval=config['journal_flush_interval'],
+                   queue_size=config['journal_queue_size'], save_crops=config['journal_crops'])
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, name="access-journal", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, verdict, camera=None, timings=None, confidence=None, crop=None, timestamp=None,
+               reading=None):
+        """
+        Событие проезда по вердикту LicensePlateValidator.get_verdict. Не блокирует:
+        запись на диск - в потоке журнала. crop - вырезка номера (сохраняется при save_crops),
+        reading - прочтение OCR до разбора (PlateDecoder); без него - номер вердикта
+        """
+        best = verdict['matches'][0] if verdict['matches'] else None
+        event = {
+            'time': time.time() if timestamp is None else timestamp,
+            'camera': camera,
+            'raw_text': reading if reading else verdict['input'],
+            'plate': verdict['cleaned'],
+            'match_plate': canonical_plate(best['plate']) if best else None,
+            'owner': best['owner'] if best else None,
+            'similarity': best['similarity'] if best else None,
+            'granted': int(verdict['access_granted']),
+            'confidence': confidence,
+            'timings': {stage: round(value, 6) for stage, value in (timings or {}).items()
+                        if isinstance(value, float)},
+            # вырезка - срез кадра; копия, чтобы очередь не держала кадры целиком
+            'crop': crop.copy() if self.save_crops and crop is not None and crop.size else None,
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            self.metrics.inc('journal_dropped_total')
+
+    def _write_loop(self):
+        self.purge()
+        while self._running or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.metrics.timer('journal_write_seconds'):
+                    self._write_batch(batch)
+                self.written += len(batch)
+                self.metrics.inc('journal_events_total', len(batch))
+            except (sqlite3.Error, OSError) as e:
+                self.errors += 1
+                self.metrics.inc('journal_errors_total')
+                print(f"Ошибка записи журнала проездов: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if time.monotonic() - self._last_purge > 3600:
+                self.purge()
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+
+    def _write_batch(self, batch):
+        """Пачка событий - по транзакции на месяц (обычно одна)"""
+        by_month = {}
+        for event in batch:
+            key = month_key(event['time'])
+            if event['crop'] is not None:
+                event['crop'] = self._save_crop(key, event['crop'])
+            by_month.setdefault(key, []).append(
+                (event['time'], event['camera'], event['raw_text'], event['plate'], event['match_plate'],
+                 event['owner'], event['similarity'], event['granted'], event['confidence'],
+                 json.dumps(event['timings']), event['crop']))
+        for key, rows in by_month.items():
+            with self._lock:
+                self._insert(key, rows)
+
+    def _insert(self, key, rows):
+        conn = self._partition(key)
+        try:
+            conn.executemany("INSERT INTO events (time, camera, raw_text, plate, match_plate, owner, "
+                             "similarity, granted, confidence, timings, crop) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def _save_crop(self, key, crop):
+        """Вырезка в crops/<год>_<месяц>/; возвращает путь относительно каталога журнала"""
+        self._crop_ids += 1
+        relative = os.path.join('crops', '%04d_%02d' % key, f"{int(time.time() * 1000)}_{self._crop_ids}.jpg")
+        path = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not cv2.imwrite(path, crop):
+            return None
+        return relative
+
+    def partition_path(self, key):
+        return os.path.join(self.directory, 'access_%04d_%02d.db' % key)
+
+    def _partition(self, key):
+        conn = self._connections.get(key)
+        if conn is None:
+            conn = configure(sqlite3.connect(self.partition_path(key), check_same_thread=False))
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            # открыты только последние месяцы: запись старых событий (после сбоя часов) - редкость
+            for old in sorted(self._connections)[:-1]:
+                self._connections.pop(old).close()
+            self._connections[key] = conn
+        return conn
+
+    def partitions(self):
+        """Месяцы, за которые есть файлы журнала, по возрастанию"""
+        keys = []
+        for name in os.listdir(self.directory):
+            match = PARTITION_RE.match(name)
+            if match:
+                keys.append((int(match.group(1)), int(match.group(2))))
+        return sorted(keys)
+
+    def purge(self, now=None):
+        """Удаление месяцев старше срока хранения (поток журнала вызывает её раз в час)"""
+        self._last_purge = time.monotonic()
+        if not self.retention_months:
+            return []
+        oldest = shift_month(month_key(time.time() if now is None else now), 1 - self.retention_months)
+        removed = [key for key in self.partitions() if key < oldest]
+        for key in removed:
+            with self._lock:
+                conn = self._connections.pop(key, None)
+                if conn is not None:
+                    conn.close()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.partition_path(key) + suffix):
+                    os.remove(self.partition_path(key) + suffix)
+            shutil.rmtree(os.path.join(self.directory, 'crops', '%04d_%02d' % key), ignore_errors=True)
+        return removed
+
+    def query(self, plate=None, camera=None, since=None, until=None, granted=None, limit=100):
+        """
+        События от новых к старым. plate ищется и среди прочтений, и среди совпадений
+        из базы; since/until - время (time.time()). Например, все проезды номера
+        за текущий месяц: query(plate, since=month_start())
+        """
+        clauses, params = [], []
+        if plate:
+            plate = canonical_plate(plate)
+            clauses.append("(plate = ? OR match_plate = ?)")
+            params += [plate, plate]
+        if camera is not None:
+            clauses.append("camera = ?")
+            params.append(camera)
+        if since is not None:
+            clauses.append("time >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("time < ?")
+            params.append(until)
+        if granted is not None:
+            clauses.append("granted = ?")
+            params.append(int(granted))
+        sql = f"SELECT {', '.join(COLUMNS)} FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY time DESC LIMIT ?"
+
+        first = month_key(since) if since is not None else None
+        last = month_key(until) if until is not None else None
+        events = []
+        for key in reversed(self.partitions()):
+            if len(events) >= limit:
+                break
+            if (first is not None and key < first) or (last is not None and key > last):
+                continue
+            conn = sqlite3.connect(f"file:{self.partition_path(key)}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(sql, params + [limit - len(events)]).fetchall()
+            except sqlite3.Error as e:
+                print(f"Ошибка чтения журнала проездов: {e}")
+                rows = []
+            finally:
+                conn.close()
+            for row in rows:
+                event = dict(zip(COLUMNS, row))
+                event['granted'] = bool(event['granted'])
+                event['timings'] = json.loads(event['timings']) if event['timings'] else {}
+                events.append(event)
+        return events
+
+    def flush(self):
+        """Ожидание записи всех событий из очереди"""
+        self._queue.join()
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped,
+                'errors': self.errors}
+
+    def close(self, timeout=5.0):
+        """Остановка потока записи; события из очереди дописываются"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('plate', nargs='?', help="номер (прочтение или совпадение из базы)")
+    parser.add_argument('--camera')
+    parser.add_argument('--month', action='store_true', help="только текущий месяц")
+    parser.add_argument('--denied', action='store_true', help="только отказы")
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--dir', help="каталог журнала (по умолчанию journal_dir из config.json)")
+    args = parser.parse_args()
+
+    directory = args.dir or load_config()['journal_dir']
+    if not directory:
+        parser.error("журнал выключен: укажите --dir или journal_dir в config.json")
+    journal = AccessJournal(directory)
+    for event in journal.query(args.plate, camera=args.camera, since=month_start() if args.month else None,
+                               granted=False if args.denied else None, limit=args.limit):
+        status = "разрешён" if event['granted'] else "запрещён"
+        match = f"{event['match_plate']} ({event['similarity']}%), {event['owner']}" if event['match_plate'] else "-"
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))}  {event['camera']}  "
+              f"{event['plate']}  {status}  {match}")
+
@@ -0,0 +1,260 @@
+"""
+Распознавание номеров в архиве: видеозаписи и папки со снимками (с подпапками).
+Кадры делятся на задачи (снимок или отрезок записи) и обрабатываются пулом
+процессов; в каждом процессе одна модель OCR, загруженная один раз.
+Результаты - JSON-строки: номер, уверенность, время в записи и вердикт по базе.
+После каждой задачи в файл пишется отметка {"type": "done"}, поэтому
+прерванный запуск продолжается с того же места (--resume).
+    python batch_recognize.py archive/ --output plates.jsonl [--stride 5] [--workers 4] [--resume]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import cv2
+
+from config import load_config
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.ts', '.mjpeg', '.mjpg', '.webm', '.flv')
+
+_worker = {}  # Состояние процесса пула: поиск номеров, подготовка вырезок, валидатор
+
+
+def find_sources(paths):
+    """Файлы снимков и записей из списка путей (папки обходятся рекурсивно, по имени)"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                sources += [os.path.join(root, name) for name in sorted(names)
+                            if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)]
+        else:
+            sources.append(path)
+    return sources
+
+
+def plan_tasks(sources, chunk_frames):
+    """
+    Задачи: снимок целиком или отрезок записи из chunk_frames кадров.
+    Идентификатор задачи (путь#первый кадр) не зависит от числа процессов - по нему идёт продолжение
+    """
+    tasks = []
+    for path in sources:
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            tasks.append({'id': path, 'path': path, 'kind': 'image'})
+            continue
+        cap = cv2.VideoCapture(path)
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        cap.release()
+        if count <= 0:
+            # длина записи неизвестна - одна задача на всю запись
+            tasks.append({'id': f"{path}#0", 'path': path, 'kind': 'video', 'start': 0, 'end': None})
+            continue
+        for start in range(0, count, chunk_frames):
+            tasks.append({'id': f"{path}#{start}", 'path': path, 'kind': 'video',
+                          'start': start, 'end': min(count, start + chunk_frames)})
+    return tasks
+
+
+def completed_tasks(path):
+    """
+    Задачи, отмеченные в файле результатов как выполненные.
+    Недописанная последняя строка (прерванный запуск) отрезается
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].decode('utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('type') == 'done':
+            done.add(record['task'])
+    return done
+
+
+def init_worker(config, verdicts):
+    """Инициализация процесса пула: модель OCR загружается здесь один раз"""
+    # один поток вычислений на процесс - параллельность даёт сам пул, без переподписки ядер
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    cv2.setNumThreads(1)
+    from ocr_engine import get_reader_pool
+    from plate_localizer import PlateLocalizer
+    from plate_preprocess import PlatePreprocessor
+    from plate_decoder import PlateDecoder
+    from plate_recognition import find_plate_regions
+
+    _worker['detector'] = PlateLocalizer.from_config({}, config) or find_plate_regions
+    _worker['preprocessor'] = PlatePreprocessor.from_config(config)
+    _worker['decoder'] = PlateDecoder.from_config(config)
+    _worker['threshold'] = config['similarity_threshold']
+    _worker['validator'] = None
+    if verdicts:
+        from plate_validator import LicensePlateValidator
+        _worker['validator'] = LicensePlateValidator(config['db_path'])
+    get_reader_pool(size=1).warm_up()
+
+
+def seek_frame(cap, path, index):
+    """
+    Установка записи точно на кадр index. Перемотка FFmpeg неточна (по ключевым кадрам),
+    поэтому позиция проверяется, и до нужного кадра поток дочитывается grab; если
+    перемотка ушла дальше, запись открывается заново и читается с начала.
+    Возвращает захват (возможно, новый) или None, если кадров меньше index.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= index:
+        cap.release()
+        cap = cv2.VideoCapture(path)
+        position = 0
+    for _ in range(index - position):
+        if not cap.grab():
+            cap.release()
+            return None
+    return cap
+
+
+def task_frames(task, stride):
+    """(номер кадра, позиция в секундах, кадр) задачи; из записи - каждый stride-й кадр"""
+    if task['kind'] == 'image':
+        frame = cv2.imread(task['path'])
+        if frame is not None:
+            yield 0, 0.0, frame
+        return
+    cap = cv2.VideoCapture(task['path'])
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        index = task['start']
+        if index:
+            cap = seek_frame(cap, task['path'], index)
+            if cap is None:
+                return
+        while task['end'] is None or index < task['end']:
+            # пропускаемые кадры только читаются из потока (grab), без перевода в BGR
+            if index % stride:
+                if not cap.grab():
+                    return
+            else:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield index, round(index / fps, 3) if fps else None, frame
+            index += 1
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def run_task(task, stride=1, batch_size=4):
+    """Обработка задачи в процессе пула; возвращает (задача, записи результатов, число кадров, ошибка)"""
+    from plate_recognition import detect_plates_batch
+
+    records, frames_count = [], 0
+    try:
+        batch = []
+        for item in task_frames(task, stride):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                records += _recognize(task, batch, detect_plates_batch)
+                frames_count += len(batch)
+                batch = []
+        if batch:
+            records += _recognize(task, batch, detect_plates_batch)
+            frames_count += len(batch)
+    except Exception as e:
+        return task, [], frames_count, f"{type(e).__name__}: {e}"
+    return task, records, frames_count, None
+
+
+def _recognize(task, batch, detect_plates_batch):
+    """Поиск и пакетное распознавание номеров на кадрах batch и вердикт по базе"""
+    results = detect_plates_batch([frame for _, _, frame in batch], _worker['detector'], _worker['preprocessor'],
+                                  _worker['decoder'])
+    records = []
+    for (index, position, _), plates in zip(batch, results):
+        for plate in plates:
+            if not plate['text']:
+                continue
+            record = {'type': 'plate', 'source': task['path'], 'frame': index, 'position_s': position,
+                      'text': plate['text'], 'confidence': round(plate['confidence'], 3),
+                      'reading': plate['reading'],
+                      'alternatives': [hypothesis['plate'] for hypothesis in (plate['hypotheses'] or [])[1:]],
+                      'box': [int(value) for value in plate['box']]}
+            validator = _worker['validator']
+            if validator is not None:
+                verdict = validator.check_plate(plate['text'], _worker['threshold'], hypotheses=plate['hypotheses'],
+                                                reading=plate['reading'])
+                best = verdict['matches'][0] if verdict['matches'] else None
+                record.update(plate=verdict['cleaned'], access_granted=verdict['access_granted'],
+                              match=best['plate'] if best else None,
+                              similarity=best['similarity'] if best else None,
+                              owner=best['owner'] if best else None)
+            records.append(record)
+    return records
+
+
+def _run_task(args):
+    return run_task(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help="видеофайлы, снимки или папки")
+    parser.add_argument('--output', required=True, help="файл результатов (JSON-строки)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="процессов (у каждого своя модель OCR в памяти)")
+    parser.add_argument('--stride', type=int, default=1, help="распознавать каждый N-й кадр записи")
+    parser.add_argument('--chunk-frames', type=int, default=500, help="кадров записи в одной задаче")
+    parser.add_argument('--batch', type=int, default=4, help="кадров в одном вызове OCR")
+    parser.add_argument('--resume', action='store_true', help="пропустить задачи, уже выполненные в --output")
+    parser.add_argument('--no-verdict', action='store_true', help="без проверки номеров по базе")
+    parser.add_argument('--config', default='config.json')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    tasks = plan_tasks(find_sources(args.sources), max(1, args.chunk_frames))
+    done = completed_tasks(args.output) if args.resume else set()
+    pending = [task for task in tasks if task['id'] not in done]
+    print(f"Задач: {len(tasks)}, уже выполнено: {len(tasks) - len(pending)}, процессов: {args.workers}")
+    if not pending:
+        return 0
+
+    start = time.perf_counter()
+    frames_total = plates_total = errors = 0
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as output, \
+            multiprocessing.Pool(args.workers, init_worker, (config, not args.no_verdict)) as pool:
+        work = ((task, max(1, args.stride), max(1, args.batch)) for task in pending)
+        for finished, (task, records, frames_count, error) in enumerate(pool.imap_unordered(_run_task, work), 1):
+            if error:
+                # без отметки done задача повторится при следующем запуске с --resume
+                errors += 1
+                print(f"\nОшибка в {task['id']}: {error}")
+                continue
+            lines = [json.dumps(record, ensure_ascii=False) for record in records]
+            lines.append(json.dumps({'type': 'done', 'task': task['id'], 'frames': frames_count,
+                                     'plates': len(records)}, ensure_ascii=False))
+            output.write("\n".join(lines) + "\n")  # результаты и отметка задачи - одной записью
+            output.flush()
+            frames_total += frames_count
+            plates_total += len(records)
+            elapsed = time.perf_counter() - start
+            print(f"\r{finished}/{len(pending)} задач, кадров {frames_total} "
+                  f"({frames_total / elapsed:.1f} кадр/с), номеров {plates_total}", end="", flush=True)
+    print(f"\nГотово за {time.perf_counter() - start:.1f} с, ошибок: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
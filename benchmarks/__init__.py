@@ -0,0 +1,13 @@
+"""
+Замеры производительности распознавания и проверки номеров.
+Запуск из корня проекта:
+    python -m benchmarks.bench_pipeline --synthetic 20      - конвейер на синтетических кадрах
+    python -m benchmarks.bench_pipeline --source video.mp4  - на записи или папке с кадрами
+    python -m benchmarks.bench_startup                      - время запуска окна и импорта модулей
+    python -m benchmarks.bench_preprocess                   - подготовка вырезок к OCR по вариантам настроек
+    python -m benchmarks.bench_normalize                    - нормализация номеров пакетом и загрузка индекса
+    python -m benchmarks.bench_capture                      - задержка кадров и переподключение захвата
+    python -m benchmarks.bench_decode                       - разбор прочтений OCR перед проверкой по базе
+    python -m benchmarks.mjpeg_server                       - камера-заменитель: поток MJPEG по HTTP
+    python -m benchmarks.report old.json new.json           - сравнение двух запусков
+"""
@@ -0,0 +1,114 @@
+"""
+Замер захвата (capture.py) на камере-заменителе benchmarks/mjpeg_server.py.
+Потребитель обрабатывает каждый кадр --work мс (медленнее частоты камеры);
+сравниваются прежний цикл (cap.read() и обработка в одном потоке) и CameraStream:
+задержка от отправки кадра до начала его обработки, частота обработки,
+а с --outage-every - время восстановления после обрыва связи.
+Запуск из корня проекта:
+    python -m benchmarks.bench_capture --seconds 20 --work 80
+    python -m benchmarks.bench_capture --outage-every 8 --outage-length 2 --output capture.json
+"""
+import time
+import argparse
+
+import cv2
+
+from capture import CameraStream
+from benchmarks.mjpeg_server import MJPEGServer, MarkedFrames, read_mark
+from benchmarks.report import summarize, save_results
+
+
+def busy(seconds):
+    """Обработка кадра: занимает поток на seconds (как поиск номеров в потоке захвата)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        time.sleep(0.001)
+
+
+def legacy_frames(url, deadline):
+    """Прежний захват: одно открытие потока, cap.read() в цикле, пауза 1 с при ошибке"""
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+    try:
+        while time.monotonic() < deadline:
+            ret, frame = cap.read()
+            if not ret:
+                time.sleep(1)
+                continue
+            yield frame
+    finally:
+        cap.release()
+
+
+def stream_frames(stream, deadline):
+    stream.start()
+    try:
+        while time.monotonic() < deadline:
+            frame = stream.read(timeout=0.5)
+            if frame is not None:
+                yield frame
+    finally:
+        stream.stop()
+
+
+def run(name, frames_source, marked, seconds, work, outage):
+    """Задержки кадров, частота обработки и паузы без кадров дольше обрыва"""
+    latencies, gaps = [], []
+    processed = 0
+    start = last = time.monotonic()
+    for frame in frames_source(start + seconds):
+        now = time.monotonic()
+        sent = marked.sent.get(read_mark(frame, marked.width))
+        if sent is not None:
+            latencies.append(now - sent)
+        if now - last > 0.5:
+            gaps.append(now - last)
+        last = now
+        processed += 1
+        busy(work)
+    if start + seconds - last > 0.5:
+        gaps.append(start + seconds - last)  # поток так и не восстановился
+    result = {'latency': summarize(latencies), 'fps': round(processed / seconds, 1)}
+    if outage:
+        result['gaps'] = summarize(gaps)
+    line = (f"{name:<8} задержка p50 {result['latency'].get('p50_ms')} мс, "
+            f"p99 {result['latency'].get('p99_ms')} мс, обработано {result['fps']} кадр/с")
+    if outage:
+        line += f", пауз без кадров {len(gaps)}, наибольшая {result['gaps'].get('max_ms')} мс"
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', help="запись для камеры-заменителя (без неё - синтетические кадры)")
+    parser.add_argument('--seconds', type=float, default=20.0, help="длительность каждого варианта")
+    parser.add_argument('--fps', type=float, default=25.0, help="частота кадров камеры")
+    parser.add_argument('--work', type=float, default=80.0, help="обработка одного кадра потребителем, мс")
+    parser.add_argument('--width', type=int, help="capture_width: уменьшать кадры до этой ширины")
+    parser.add_argument('--outage-every', type=float, help="период обрывов связи, с")
+    parser.add_argument('--outage-length', type=float, default=2.0, help="длительность обрыва, с")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    marked = MarkedFrames(args.source, count=100)
+    server = MJPEGServer(marked, args.fps, port=0, outage_every=args.outage_every,
+                         outage_length=args.outage_length).start()
+    work = args.work / 1000.0
+    results = {}
+    try:
+        results['legacy'] = run('legacy', lambda deadline: legacy_frames(server.url, deadline),
+                                marked, args.seconds, work, args.outage_every)
+        stream = CameraStream(server.url, reconnect_min=0.2, reconnect_max=2.0, timeout=2.0, width=args.width)
+        results['stream'] = run('stream', lambda deadline: stream_frames(stream, deadline),
+                                marked, args.seconds, work, args.outage_every)
+        results['stream']['stats'] = stream.stats()
+        print(f"Захват: {results['stream']['stats']}")
+    finally:
+        server.stop()
+    if args.output:
+        save_results(args.output, 'capture', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Замер разбора прочтений OCR по грамматике номера (plate_decoder.py) перед
+проверкой по базе. Прочтения - номера из базы и посторонние номера: без ошибок,
+с путаницами OCR (OCR_CONFUSIONS), со случайной заменой символа, с рамкой,
+прочитанной как символ, а также мусор (надписи и блики вместо номера).
+Сравниваются прежняя проверка прочтения (check_plate) и разбор с проверкой
+вариантов: сколько прочтений дошло до базы, доля точных совпадений,
+верные и ложные разрешения и время вердикта. Отдельно проверяется, что трек
+(plate_tracker.py), где перед прочтениями был мусорный кадр, даёт тот же
+вердикт, что и само прочтение. Запуск из корня проекта:
+    python -m benchmarks.bench_decode --size 100000 --queries 2000 --output decode.json
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from config import DEFAULT_CONFIG
+from plate_matcher import OCR_CONFUSIONS
+from plate_decoder import PlateDecoder
+from plate_tracker import PlateTracker
+from plate_validator import LicensePlateValidator
+from benchmarks.synthetic import LETTERS, DIGITS, make_whitelist_db, noisy, random_plate
+from benchmarks.report import summarize, save_results
+
+# символ -> символы, с которыми его путает OCR
+CONFUSED = {}
+for (_a, _b) in OCR_CONFUSIONS:
+    CONFUSED.setdefault(_a, []).append(_b)
+    CONFUSED.setdefault(_b, []).append(_a)
+
+
+def confused(plate, rng):
+    """Номер с одной типичной путаницей OCR (О/0, В/8 ...), если в нём есть такой символ"""
+    positions = [i for i, c in enumerate(plate) if c in CONFUSED]
+    if not positions:
+        return plate
+    i = rng.choice(positions)
+    return plate[:i] + rng.choice(CONFUSED[plate[i]]) + plate[i + 1:]
+
+
+def garbage(rng):
+    """Прочтение не номера: случайные символы номера случайной длины"""
+    return ''.join(rng.choice(LETTERS + DIGITS) for _ in range(rng.randint(2, 12)))
+
+
+def make_queries(plates, count, rng):
+    """(прочтение, номер из базы или None, вид прочтения)"""
+    known = set(plates)
+    kinds = ('clean', 'confusion', 'random', 'frame', 'stranger', 'garbage')
+    queries = []
+    for _ in range(count):
+        kind = rng.choice(kinds)
+        plate = rng.choice(plates)
+        if kind == 'clean':
+            text = plate
+        elif kind == 'confusion':
+            text = confused(plate, rng)
+        elif kind == 'random':
+            text = noisy(plate, rng)
+        elif kind == 'frame':
+            text = '1' + plate if rng.random() < 0.5 else plate + '1'
+        else:
+            plate = None
+            while kind == 'stranger' and (plate is None or plate in known):
+                plate = random_plate(rng)
+            text = plate if kind == 'stranger' else garbage(rng)
+            plate = None
+        queries.append((text, plate, kind))
+    return queries
+
+
+def run(name, queries, validator, threshold, decoder=None):
+    times, granted, correct, wrong = [], 0, 0, 0
+    for text, truth, _ in queries:
+        start = time.perf_counter()
+        if decoder is None:
+            verdict = validator.check_plate(text, threshold)
+        else:
+            hypotheses = decoder.decode(text, 0.9)
+            # отвергнутое прочтение дальше не идёт, как в конвейере; без вариантов - само прочтение
+            plate = text if hypotheses is None else (hypotheses[0]['plate'] if hypotheses else "")
+            verdict = validator.check_plate(plate, threshold, hypotheses=hypotheses, reading=text)
+        times.append(time.perf_counter() - start)
+        if verdict['access_granted']:
+            granted += 1
+            if truth is not None and verdict['matches'][0]['plate'] == truth:
+                correct += 1
+            else:
+                wrong += 1
+    cache = validator.cache.stats()
+    count = len(queries)
+    result = {
+        'verdict': summarize(times),
+        'db_lookups': round(cache['lookups'] / count, 3),
+        'exact_hits': round(cache['exact_hits'] / count, 3),
+        'fuzzy_hits': round(cache['fuzzy_hits'] / count, 3),
+        'granted': round(granted / count, 3),
+        'correct': round(correct / count, 3),
+        'wrong': round(wrong / count, 3),
+    }
+    print(f"{name:<8} проверка p50 {result['verdict']['p50_ms']} мс, p99 {result['verdict']['p99_ms']} мс; "
+          f"до базы {result['db_lookups']:.1%}, точных {result['exact_hits']:.1%}, "
+          f"нечётких {result['fuzzy_hits']:.1%}; верных разрешений {result['correct']:.1%}, "
+          f"ложных {result['wrong']:.1%}")
+    return result
+
+
+def check_tracker(queries, validator, threshold, decoder):
+    """
+    Трек из мусорного кадра (варианты - пустой список) и трёх одинаковых прочтений
+    должен получить тот же вердикт, что и одно прочтение; число расхождений
+    """
+    tracker = PlateTracker(min_votes=3)
+    mismatches = 0
+    for text, _, kind in queries:
+        if kind == 'garbage':
+            continue
+        hypotheses = decoder.decode(text, 0.9)
+        plate = text if hypotheses is None else (hypotheses[0]['plate'] if hypotheses else "")
+        expected = validator.check_plate(plate, threshold, hypotheses=hypotheses, reading=text)
+        track = tracker.update('check', [(0, 0, 10, 10)], 0.0)[0]
+        track.restart()
+        tracker.vote(track, "", 0.5, [], garbage(random.Random(text)))
+        decision = None
+        while decision is None:
+            decision = tracker.vote(track, plate, 0.9, hypotheses, text)
+        verdict = validator.check_plate(decision['text'], threshold, hypotheses=decision.get('hypotheses'),
+                                        reading=decision.get('reading'))
+        mismatches += verdict['access_granted'] != expected['access_granted']
+    print(f"трек с мусорным кадром: расхождений с вердиктом прочтения {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000, help="номеров в базе")
+    parser.add_argument('--queries', type=int, default=2000, help="прочтений OCR")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_CONFIG['similarity_threshold'])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    decoder = PlateDecoder.from_config(DEFAULT_CONFIG)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'whitelist.db')
+        plates = make_whitelist_db(path, args.size, rng)
+        queries = make_queries(plates, args.queries, rng)
+        for name, mode in (('legacy', None), ('decoded', decoder)):
+            validator = LicensePlateValidator(path)
+            try:
+                validator.cache.refresh()  # загрузка кэша не входит в замер
+                results[name] = run(name, queries, validator, args.threshold, mode)
+                if mode is not None:
+                    results['tracker_mismatches'] = check_tracker(queries, validator, args.threshold, mode)
+            finally:
+                validator.close()
+    if args.output:
+        save_results(args.output, 'decode', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
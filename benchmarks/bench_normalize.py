@@ -0,0 +1,92 @@
+"""
+Замер нормализации номеров (plate_normalizer.py) на синтетических прочтениях
+с латинскими буквами, пробелами и мусором: прежняя очистка по одной строке,
+normalize_plate по одной строке и normalize_plates пакетом, проверка шаблона
+и загрузка PlateIndex (массивами против добавления по одному номеру).
+Запуск из корня проекта:
+    python -m benchmarks.bench_normalize --size 300000 --output normalize.json
+"""
+import re
+import time
+import random
+import argparse
+
+from plate_index import PlateIndex
+from plate_normalizer import normalize_plate, normalize_plates, validate_plates
+from benchmarks.synthetic import LATIN, unique_plates
+from benchmarks.report import summarize, save_results
+
+
+def legacy_clean(text):
+    """Прежняя очистка (LicensePlateValidator.clean_plate): латиница удалялась"""
+    cleaned = re.sub(r'[^АВЕКМНОРСТУХЗЧ0-9]', '', text.upper())
+    return cleaned.replace('З', '3').replace('Ч', '4')
+
+
+def legacy_valid(plate):
+    return re.match(r'^[АВЕКМНОРСТУХ]\d{3}[АВЕКМНОРСТУХ]{2}\d{2,3}$', plate.upper()) is not None
+
+
+def noisy_reading(plate, rng):
+    """Прочтение OCR: часть букв латиницей, нижний регистр, пробелы и знаки"""
+    text = ''.join(c.translate(LATIN) if rng.random() < 0.5 else c for c in plate)
+    if rng.random() < 0.3:
+        text = text.lower()
+    if rng.random() < 0.3:
+        text = f"{text[:1]} {text[1:4]} {text[4:6]}|{text[6:]}"
+    return text
+
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return summarize(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000, help="число номеров")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plates = unique_plates(args.size, rng)
+    readings = [noisy_reading(plate, rng) for plate in plates]
+    rows = [(i, plate, f"Владелец {i}") for i, plate in enumerate(plates)]
+
+    def index_by_add():
+        index = PlateIndex(max(1024, len(rows)))
+        for row in rows:
+            index.add(*row)
+
+    cases = {
+        'legacy_clean': lambda: [legacy_clean(text) for text in readings],
+        'normalize_plate': lambda: [normalize_plate(text) for text in readings],
+        'normalize_plates': lambda: normalize_plates(readings),
+        'legacy_validate': lambda: [legacy_valid(plate) for plate in plates],
+        'validate_plates': lambda: validate_plates(plates)[1],
+        'index_add': index_by_add,
+        'index_load': lambda: PlateIndex().load(rows),
+    }
+    results = {}
+    for name, function in cases.items():
+        summary, result = measure(function, args.repeat)
+        results[name] = summary
+        if name in ('legacy_clean', 'normalize_plates'):
+            results[name]['recovered'] = round(sum(a == b for a, b in zip(result, plates)) / len(plates), 3)
+        line = f"{name:<18} p50 {summary['p50_ms']:>9} мс"
+        if 'recovered' in results[name]:
+            line += f", верных номеров {results[name]['recovered']:.1%}"
+        print(line)
+    if args.output:
+        save_results(args.output, 'normalize', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
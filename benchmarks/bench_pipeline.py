@@ -0,0 +1,263 @@
+"""
+Замер конвейера распознавания и проверки по базе.
+Кадры (запись, папка с кадрами или синтетические машины) подаются в тот же
+RecognitionPipeline, что и в VideoThread, с теми же настройками config.json.
+Отдельно замеряется проверка номеров по синтетическим базам разного размера.
+Запуск из корня проекта:
+    python -m benchmarks.bench_pipeline --synthetic 20 --output run.json
+    python -m benchmarks.bench_pipeline --source record.mp4 --fps 0
+    python -m benchmarks.bench_pipeline --synthetic 20 --ocr fake   - без модели OCR
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from config import load_config
+from plate_validator import LicensePlateValidator
+from plate_tracker import PlateTracker
+from plate_localizer import PlateLocalizer
+from plate_decoder import PlateDecoder, best_plate
+from recognition_pipeline import RecognitionPipeline
+from benchmarks.synthetic import make_whitelist_db, noisy, unique_plates, synthetic_frames
+from benchmarks.replay import ReplaySource, replay
+from benchmarks.report import summarize, save_results
+
+
+class Timed:
+    """Обёртка функции стадии: длительность и размер входа каждого вызова"""
+    def __init__(self, function):
+        self.function = function
+        self.times = []
+        self.sizes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, data):
+        start = time.perf_counter()
+        result = self.function(data)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.times.append(elapsed)
+            self.sizes.append(len(data) if isinstance(data, list) else 1)
+        return result
+
+
+class FakeRecognizer:
+    """
+    Замена OCR для замера остального конвейера: ждёт delay_ms на пакет
+    и per_crop_ms на вырезку и возвращает номер текущей синтетической
+    машины с ошибками. Точность распознавания при этом не измеряется
+    """
+    def __init__(self, current, delay_ms=20.0, per_crop_ms=5.0, error_rate=0.2, seed=1):
+        self.current = current
+        self.delay = delay_ms / 1000.0
+        self.per_crop = per_crop_ms / 1000.0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def __call__(self, crops):
+        time.sleep(self.delay + self.per_crop * len(crops))
+        plate = self.current.get('plate')
+        results = []
+        for _ in crops:
+            if not plate:
+                results.append({'text': '', 'confidence': 0.0})
+                continue
+            text = noisy(plate, self.rng) if self.rng.random() < self.error_rate else plate
+            results.append({'text': text, 'confidence': self.rng.uniform(0.4, 0.95)})
+        return results
+
+
+def bench_matching(sizes, queries, threshold, rng, directory):
+    """Проверка по базе: первая загрузка кэша и get_verdict на зашумлённых номерах"""
+    results = {}
+    for size in sizes:
+        path = os.path.join(directory, f"whitelist_{size}.db")
+        plates = make_whitelist_db(path, size, rng)
+        validator = LicensePlateValidator(path)
+        try:
+            start = time.perf_counter()
+            validator.cache.refresh()
+            load_time = time.perf_counter() - start
+
+            times, granted = [], 0
+            for _ in range(queries):
+                validator.set_camera_plate(noisy(rng.choice(plates), rng, rng.choice((0, 1, 2))))
+                start = time.perf_counter()
+                verdict = validator.get_verdict(threshold=threshold)
+                times.append(time.perf_counter() - start)
+                granted += verdict['access_granted']
+            results[str(size)] = {
+                'load_ms': round(load_time * 1000, 1),
+                'verdict': summarize(times),
+                'granted_rate': round(granted / queries, 3),
+                'cache': validator.cache.stats(),
+            }
+        finally:
+            validator.close()
+        print(f"база {size:>7}: загрузка {results[str(size)]['load_ms']} мс, "
+              f"проверка p50 {results[str(size)]['verdict']['p50_ms']} мс, "
+              f"p99 {results[str(size)]['verdict']['p99_ms']} мс")
+    return results
+
+
+def bench_pipeline(config, frames, fps, recognizer, vehicles, current, whitelist_path, settle=5.0):
+    """Прогон кадров через конвейер; vehicles - число машин, если известно"""
+    camera = config['cameras'][0]
+    localizer = PlateLocalizer.from_config(camera, config)
+    if localizer is None:
+        from plate_recognition import find_plate_regions
+        localizer = find_plate_regions
+    detector = Timed(localizer)
+    ocr = Timed(recognizer)
+
+    results = []
+    lock = threading.Lock()
+
+    def on_result(item):
+        latency = time.time() - item['timestamp']
+        with lock:
+            results.append((item['frame_id'], latency, best_plate(item['plates']) or {'text': ''}))
+
+    tracker = PlateTracker.from_config(config)
+    pipeline = RecognitionPipeline(detection_workers=config['detection_workers'],
+                                   ocr_workers=config['ocr_workers'],
+                                   ocr_queue_size=config['ocr_queue_size'],
+                                   detector=detector, recognizer=ocr, tracker=tracker)
+    pipeline.add_stream('bench', on_result)
+    truth = {}  # frame_id -> номер машины в кадре (синтетика)
+
+    def on_frame(index, item):
+        if isinstance(item, tuple):
+            current['plate'] = item[2]
+            truth[index + 1] = item[2]
+
+    pipeline.start()
+    start = time.perf_counter()
+    submitted = replay(frames, pipeline, 'bench', fps=fps, on_frame=on_frame)
+    # ждём, пока конвейер разберёт оставшиеся кадры
+    deadline = time.perf_counter() + settle
+    while time.perf_counter() < deadline:
+        stats = pipeline.stats()
+        if not stats['capture']['depth'] and not stats['ocr']['depth']:
+            break
+        time.sleep(0.05)
+    wall_time = time.perf_counter() - start
+    pipeline.stop()
+    stats = pipeline.stats()
+
+    # Проверка распознанных номеров по базе - как в MainWindow.on_plate_detected
+    validator = LicensePlateValidator(whitelist_path)
+    verdict_times, granted, correct = [], 0, 0
+    try:
+        for frame_id, _, plate in results:
+            begin = time.perf_counter()
+            verdict = validator.check_plate(plate['text'], config['similarity_threshold'],
+                                            hypotheses=plate.get('hypotheses'), reading=plate.get('reading'))
+            verdict_times.append(time.perf_counter() - begin)
+            granted += verdict['access_granted']
+            correct += truth.get(frame_id) is not None and verdict['cleaned'] == truth[frame_id]
+    finally:
+        validator.close()
+
+    vehicles = vehicles or (stats['tracking']['decided'] if stats['tracking'] else len(results)) or 1
+    crops = sum(ocr.sizes)
+    return {
+        'frames_submitted': submitted,
+        'frames_detected': stats['detection']['processed'],
+        'frames_dropped': stats['capture']['dropped'],
+        'wall_time_s': round(wall_time, 3),
+        'fps': round(stats['detection']['processed'] / wall_time, 2) if wall_time else 0.0,
+        'detection': summarize(detector.times),
+        'ocr_batch': summarize(ocr.times),
+        'ocr_calls': len(ocr.times),
+        'ocr_crops': crops,
+        'vehicles': vehicles,
+        'ocr_crops_per_vehicle': round(crops / vehicles, 2),
+        'results': len(results),
+        'result_latency': summarize([latency for _, latency, _ in results]),
+        'verdict': summarize(verdict_times),
+        'granted': granted,
+        'correct_reads': correct if truth else None,
+        'tracking': stats['tracking'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.json', help="настройки, как у main.py и gate_server.py")
+    parser.add_argument('--source', help="видеофайл, URL или папка с кадрами")
+    parser.add_argument('--synthetic', type=int, default=0, help="число синтетических машин")
+    parser.add_argument('--frames-per-vehicle', type=int, default=25)
+    parser.add_argument('--fps', type=float, default=None, help="темп подачи кадров, 0 - без пауз")
+    parser.add_argument('--ocr', choices=('easyocr', 'fake'), default='easyocr')
+    parser.add_argument('--no-tracking', action='store_true', help="распознавать каждый кадр")
+    parser.add_argument('--whitelist-sizes', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.no_tracking:
+        config['tracking'] = False
+    rng = random.Random(args.seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.whitelist_sizes:
+            results['matching'] = bench_matching(args.whitelist_sizes, args.queries,
+                                                 config['similarity_threshold'], rng, directory)
+
+        if args.source or args.synthetic:
+            current = {}
+            whitelist_path = os.path.join(directory, 'pipeline.db')
+            if args.synthetic:
+                plates = unique_plates(args.synthetic, rng)
+                frames = synthetic_frames(plates, args.frames_per_vehicle)
+                fps = 25.0 if args.fps is None else args.fps
+                vehicles = args.synthetic
+            else:
+                source = ReplaySource(args.source)
+                frames, plates = source, []
+                fps = (source.fps or 25.0) if args.fps is None else args.fps
+                vehicles = None
+            make_whitelist_db(whitelist_path, 1000, rng)
+            if plates:
+                # половина машин есть в базе
+                from license_plate_manager import LicensePlateManager
+                manager = LicensePlateManager(whitelist_path)
+                for plate in plates[::2]:
+                    manager.add_plate(plate, "Имя", "Фамилия", None)
+                manager.close()
+
+            if args.ocr == 'fake':
+                recognizer = FakeRecognizer(current, seed=args.seed)
+            else:
+                from ocr_engine import get_reader_pool
+                from functools import partial
+                from plate_preprocess import PlatePreprocessor
+                from plate_recognition import recognize_plates_batch
+                get_reader_pool(size=config['ocr_workers']).warm_up()  # загрузка модели не входит в замер
+                recognizer = partial(recognize_plates_batch, preprocessor=PlatePreprocessor.from_config(config),
+                                     decoder=PlateDecoder.from_config(config))
+
+            results['pipeline'] = bench_pipeline(config, frames, fps, recognizer, vehicles, current, whitelist_path)
+            pipeline = results['pipeline']
+            print(f"конвейер: {pipeline['frames_detected']} кадров за {pipeline['wall_time_s']} с "
+                  f"({pipeline['fps']} кадр/с), вытеснено {pipeline['frames_dropped']}")
+            print(f"  поиск номеров p50 {pipeline['detection'].get('p50_ms')} мс, "
+                  f"OCR p50 {pipeline['ocr_batch'].get('p50_ms')} мс, "
+                  f"вырезок OCR на машину {pipeline['ocr_crops_per_vehicle']}")
+            print(f"  результатов {pipeline['results']}, задержка p50 {pipeline['result_latency'].get('p50_ms')} мс, "
+                  f"проверка p50 {pipeline['verdict'].get('p50_ms')} мс")
+
+    if args.output:
+        save_results(args.output, 'pipeline', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
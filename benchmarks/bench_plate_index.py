@@ -0,0 +1,74 @@
+"""
+Сравнение PlateIndex.search с прежним полным перебором SequenceMatcher.
+Запуск из корня проекта: python benchmarks/bench_plate_index.py [--sizes 1000 10000 100000]
+С --weighted сравнивается взвешенный поиск (PlateMatcher) с перебором по matcher.similarity
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plate_index import PlateIndex
+from plate_matcher import PlateMatcher
+from benchmarks.synthetic import noisy, unique_plates
+from benchmarks.report import percentile
+
+
+def full_scan(rows, plate, threshold, matcher=None):
+    """Прежний алгоритм check_against_database (или перебор с matcher.similarity)"""
+    matches = []
+    for row_id, db_plate, owner in rows:
+        if matcher is not None:
+            similarity = matcher.similarity(plate, db_plate)
+        else:
+            similarity = SequenceMatcher(None, plate, db_plate).ratio() * 100
+        if similarity >= threshold:
+            matches.append({'plate': db_plate, 'similarity': round(similarity, 1), 'owner': owner})
+    matches.sort(key=lambda x: x['similarity'], reverse=True)
+    return matches
+
+
+def run(size, queries, threshold, rng, matcher=None):
+    rows = [(i + 1, plate, f"Владелец {i + 1}") for i, plate in enumerate(unique_plates(size, rng))]
+
+    start = time.perf_counter()
+    index = PlateIndex()
+    index.load(rows)
+    build_time = time.perf_counter() - start
+
+    probes = [noisy(rng.choice(rows)[1], rng, rng.choice((0, 1, 2))) for _ in range(queries)]
+    index_times, scan_times = [], []
+    checks = 20 if matcher is None else 3  # скалярный PlateMatcher ещё медленнее SequenceMatcher
+    for probe in probes:
+        start = time.perf_counter()
+        found = index.search(probe, threshold, matcher)
+        index_times.append(time.perf_counter() - start)
+
+        if len(scan_times) < checks:  # полный перебор медленный - проверяем на части запросов
+            start = time.perf_counter()
+            expected = full_scan(rows, probe, threshold, matcher)
+            scan_times.append(time.perf_counter() - start)
+            assert found == expected, f"расхождение для {probe}"
+
+    print(f"{size:>7} номеров: построение {build_time * 1000:8.1f} мс | "
+          f"индекс p50 {percentile(index_times, 0.5) * 1000:.3f} мс, p99 {percentile(index_times, 0.99) * 1000:.3f} мс | "
+          f"полный перебор p50 {percentile(scan_times, 0.5) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--threshold', type=float, default=75)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--weighted', action='store_true', help="взвешенное сравнение PlateMatcher")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matcher = PlateMatcher() if args.weighted else None
+    for size in args.sizes:
+        run(size, args.queries, args.threshold, rng, matcher)
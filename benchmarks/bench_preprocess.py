@@ -0,0 +1,141 @@
+"""
+Замер подготовки вырезок к OCR (plate_preprocess.py) на синтетических номерах
+разного размера, наклона и контраста: время подготовки пакета, площадь входа OCR
+и (с --ocr easyocr) время и точность распознавания для каждого варианта настроек.
+Запуск из корня проекта:
+    python -m benchmarks.bench_preprocess --crops 64 --output preprocess.json
+    python -m benchmarks.bench_preprocess --ocr easyocr
+"""
+import re
+import time
+import random
+import argparse
+
+import cv2
+import numpy as np
+
+from plate_preprocess import PlatePreprocessor
+from benchmarks.synthetic import LATIN, render_plate, unique_plates
+from benchmarks.report import summarize, save_results
+
+# Варианты настроек: имя -> параметры PlatePreprocessor (None - прежняя подготовка)
+VARIANTS = {
+    'legacy': None,
+    'otsu': dict(deskew=False),
+    'otsu+deskew': dict(),
+    'adaptive+deskew': dict(binarization='adaptive'),
+    'clahe+otsu+deskew': dict(clahe=True),
+}
+
+
+def legacy_prepare_batch(images, height=64, gap=8):
+    """Прежняя подготовка: Otsu по полной вырезке, затем INTER_CUBIC до общей высоты, холст без предела ширины"""
+    prepared = []
+    for image in images:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        h, w = binary.shape
+        interpolation = cv2.INTER_CUBIC if height > h else cv2.INTER_AREA
+        prepared.append(cv2.resize(binary, (max(1, int(round(w * height / h))), height),
+                                   interpolation=interpolation))
+    step = height + gap
+    canvas = np.full((step * len(prepared), max(p.shape[1] for p in prepared)), 255, dtype=np.uint8)
+    boxes = []
+    for i, plate in enumerate(prepared):
+        canvas[i * step:i * step + height, :plate.shape[1]] = plate
+        boxes.append([0, plate.shape[1], i * step, i * step + height])
+    return canvas, boxes
+
+
+def make_crop(plate, rng):
+    """Вырезка номера: случайные высота, наклон, контраст, тень и шум"""
+    image = render_plate(plate, height=rng.choice((20, 28, 40, 60, 90, 140)))
+    h, w = image.shape[:2]
+    pad = h // 3
+    image = cv2.copyMakeBorder(image, pad, pad, pad // 2, pad // 2, cv2.BORDER_CONSTANT, value=(170, 170, 170))
+    angle = rng.uniform(-12, 12)
+    matrix = cv2.getRotationMatrix2D((image.shape[1] / 2, image.shape[0] / 2), angle, 1.0)
+    image = cv2.warpAffine(image, matrix, image.shape[1::-1], borderMode=cv2.BORDER_REPLICATE)
+    # низкий контраст и тень с одной стороны номера
+    contrast = rng.uniform(0.4, 1.0)
+    shadow = np.linspace(rng.uniform(0.5, 1.0), 1.0, image.shape[1], dtype=np.float32)[None, :, None]
+    image = image.astype(np.float32) * contrast * shadow + rng.uniform(0, 60)
+    image += np.random.default_rng(rng.randrange(1 << 30)).normal(0, 6, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def normalize_text(text):
+    """Текст для сравнения: латиница вместо кириллицы, только буквы и цифры"""
+    return re.sub(r'[^0-9A-Z]', '', text.upper().translate(LATIN))
+
+
+def bench_variant(name, params, batches, ocr, repeat):
+    prepare = legacy_prepare_batch if params is None else PlatePreprocessor(**params).prepare_batch
+    prepare(batches[0][0])  # буферы потока создаются до замера
+    times, pixels = [], 0
+    for _ in range(repeat):
+        for crops, _ in batches:
+            start = time.perf_counter()
+            canvas, boxes = prepare(crops)
+            times.append(time.perf_counter() - start)
+    for crops, _ in batches:
+        _, boxes = prepare(crops)
+        pixels += sum((x_max - x_min) * (y_max - y_min) for x_min, x_max, y_min, y_max in boxes)
+    crops_total = sum(len(crops) for crops, _ in batches)
+    result = {'prepare_batch': summarize(times), 'ocr_pixels_per_crop': pixels // crops_total}
+
+    if ocr is not None:
+        ocr_times, correct = [], 0
+        for crops, plates in batches:
+            canvas, boxes = prepare(crops)
+            step = boxes[1][2] - boxes[0][2] if len(boxes) > 1 else canvas.shape[0]
+            start = time.perf_counter()
+            recognized = ocr.recognize(canvas, horizontal_list=boxes, free_list=[],
+                                       batch_size=len(boxes), detail=1)
+            ocr_times.append(time.perf_counter() - start)
+            texts = [""] * len(crops)
+            for bbox, text, _ in recognized:
+                index = int(bbox[0][1]) // step
+                if 0 <= index < len(texts):
+                    texts[index] = text
+            correct += sum(normalize_text(text) == normalize_text(plate) for text, plate in zip(texts, plates))
+        result['ocr_batch'] = summarize(ocr_times)
+        result['accuracy'] = round(correct / crops_total, 3)
+
+    line = (f"{name:<20} подготовка пакета p50 {result['prepare_batch']['p50_ms']:>7} мс, "
+            f"вход OCR {result['ocr_pixels_per_crop']:>6} пикс./вырезку")
+    if ocr is not None:
+        line += f", OCR p50 {result['ocr_batch']['p50_ms']} мс, точность {result['accuracy']:.1%}"
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--crops', type=int, default=64, help="число синтетических вырезок")
+    parser.add_argument('--batch', type=int, default=4, help="вырезок в пакете OCR")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--ocr', choices=('none', 'easyocr'), default='none')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plates = unique_plates(args.crops, rng)
+    crops = [make_crop(plate, rng) for plate in plates]
+    batches = [(crops[i:i + args.batch], plates[i:i + args.batch]) for i in range(0, len(crops), args.batch)]
+
+    ocr = None
+    if args.ocr == 'easyocr':
+        from ocr_engine import get_reader_pool
+        ocr = get_reader_pool()
+        ocr.warm_up()  # загрузка модели не входит в замер
+
+    results = {name: bench_variant(name, params, batches, ocr, args.repeat) for name, params in VARIANTS.items()}
+    if args.output:
+        save_results(args.output, 'preprocess', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Замер запуска: время импорта модулей, появления окна, первого кадра и готовности OCR.
+Каждый замер - в новом процессе Python, чтобы не мешал кэш уже загруженных модулей.
+Окно создаётся без экрана (QT_QPA_PLATFORM=offscreen) с камерой из синтетической
+записи и временной базой. Запуск из корня проекта:
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --check   - код возврата 1, если импорт модулей
+                                                    загружает тяжёлые библиотеки
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+
+import cv2
+
+from benchmarks.synthetic import unique_plates, synthetic_frames
+from benchmarks.report import summarize, save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, импорт которых замеряется
+MODULES = ('plate_recognition', 'recognition_pipeline', 'gate_server', 'gate_service', 'main')
+# Библиотеки, которые не должны загружаться до первого распознавания
+HEAVY = ('easyocr', 'torch', 'matplotlib', 'skimage', 'PIL', 'scipy')
+
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+WINDOW_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import main
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+imported = time.perf_counter() - start
+app = QApplication(sys.argv)
+window = main.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter() - start
+result = {{'import': imported, 'shown': shown, 'first_frame': None, 'recognizer_ready': None,
+          'recognizer_error': None}}
+pool = window.reader_pool
+
+def check():
+    # первый кадр - когда окно его показало (update_image), модель - по состоянию пула
+    now = time.perf_counter() - start
+    if result['first_frame'] is None and window.current_frame is not None:
+        result['first_frame'] = now
+    if result['recognizer_ready'] is None and (pool.ready.is_set() or pool.load_error):
+        result['recognizer_ready'] = now
+        result['recognizer_error'] = pool.load_error
+    done = result['first_frame'] is not None and (not {wait_ready} or result['recognizer_ready'] is not None)
+    if done or now > {timeout}:
+        app.quit()
+
+timer = QTimer()
+timer.timeout.connect(check)
+timer.start(5)
+app.exec_()
+result['heavy'] = [m for m in {heavy!r} if m in sys.modules]
+window.close()
+print(json.dumps(result))
+"""
+
+
+def run_script(script, cwd, env=None):
+    """Скрипт в новом процессе; результат - JSON в последней строке вывода"""
+    environment = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    environment.update(env or {})
+    completed = subprocess.run([sys.executable, '-c', script], cwd=cwd, env=environment,
+                               capture_output=True, text=True, timeout=600)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "нет вывода")
+    return json.loads(lines[-1])
+
+
+def write_video(path, seconds=10, fps=25.0):
+    """Синтетическая запись для камеры окна"""
+    rng = random.Random(1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (1280, 720))
+    try:
+        frames = synthetic_frames(unique_plates(4, rng), frames_per_vehicle=int(seconds * fps / 4))
+        for frame, _, _ in frames:
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def bench_imports(repeat, directory):
+    results = {}
+    for module in MODULES:
+        times, heavy = [], []
+        try:
+            for _ in range(repeat):
+                measured = run_script(IMPORT_SCRIPT.format(module=module, heavy=HEAVY), directory)
+                times.append(measured['seconds'])
+                heavy = measured['heavy']
+        except RuntimeError as e:
+            print(f"импорт {module}: ошибка - {e}")
+            continue
+        results[module] = dict(summarize(times), heavy=heavy)
+        print(f"импорт {module:<22} p50 {results[module]['p50_ms']:>8} мс"
+              + (f", загружены {', '.join(heavy)}" if heavy else ""))
+    return results
+
+
+def bench_window(repeat, directory, wait_ready, timeout):
+    """Появление окна, первый кадр предпросмотра и готовность модели OCR"""
+    video = os.path.join(directory, 'camera.avi')
+    write_video(video)
+    with open(os.path.join(directory, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump({'cameras': [{'name': 'Камера 1', 'url': video, 'mode': 'manual'}],
+                   'db_path': os.path.join(directory, 'plates.db'),
+                   'metrics_port': 0}, f, ensure_ascii=False)
+
+    runs = []
+    for _ in range(repeat):
+        try:
+            runs.append(run_script(WINDOW_SCRIPT.format(heavy=HEAVY, wait_ready=wait_ready, timeout=timeout),
+                                   directory, env={'QT_QPA_PLATFORM': 'offscreen'}))
+        except RuntimeError as e:
+            print(f"окно: ошибка - {e}")
+            return {}
+
+    results = {stage: summarize([run[stage] for run in runs if run[stage] is not None])
+               for stage in ('import', 'shown', 'first_frame', 'recognizer_ready')}
+    results['heavy'] = runs[-1]['heavy']
+    results['recognizer_error'] = runs[-1]['recognizer_error']
+    for stage, title in (('shown', 'окно показано'), ('first_frame', 'первый кадр'),
+                         ('recognizer_ready', 'модель OCR готова')):
+        print(f"{title:<22} p50 {results[stage].get('p50_ms')} мс")
+    if results['recognizer_error']:
+        print(f"  модель OCR не загрузилась: {results['recognizer_error']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-window', action='store_true', help="только время импорта")
+    parser.add_argument('--wait-ready', action='store_true', help="ждать загрузки модели OCR")
+    parser.add_argument('--timeout', type=float, default=120.0, help="предел ожидания в окне, с")
+    parser.add_argument('--check', action='store_true',
+                        help="ошибка, если импорт модулей загружает тяжёлые библиотеки")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        results['imports'] = bench_imports(args.repeat, directory)
+        if not args.no_window:
+            results['window'] = bench_window(args.repeat, directory, args.wait_ready, args.timeout)
+
+    if args.output:
+        save_results(args.output, 'startup', vars(args), results)
+        print(f"Результаты сохранены в {args.output}")
+
+    if args.check:
+        # фоновая загрузка модели в окне импортирует easyocr намеренно - проверяется только импорт
+        offenders = {module: data['heavy'] for module, data in results['imports'].items() if data['heavy']}
+        for module, heavy in offenders.items():
+            print(f"ОШИБКА: {module} загружает при запуске {', '.join(heavy)}")
+        sys.exit(1 if offenders else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Камера-заменитель: раздаёт запись (или синтетические кадры) по HTTP как поток
+MJPEG (multipart/x-mixed-replace) с заданной частотой кадров. Может имитировать
+обрывы связи: каждые --outage-every секунд закрывает соединения и --outage-length
+секунд не отвечает. В левом верхнем углу кадра - метка с номером кадра,
+по которой замер capture определяет задержку. Запуск из корня проекта:
+    python -m benchmarks.mjpeg_server --source video.mp4 --port 8081
+    python -m benchmarks.mjpeg_server --outage-every 20 --outage-length 3
+Адрес камеры для config.json: http://127.0.0.1:8081/stream.mjpg
+"""
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+
+from benchmarks.synthetic import unique_plates, synthetic_frames
+
+BOUNDARY = 'frame'
+MARK_BITS = 24    # Разрядов в метке номера кадра
+MARK_CELL = 8     # Сторона клетки метки (кратна блоку JPEG - метка читается без искажений)
+
+
+def draw_mark(frame, number):
+    """Метка номера кадра: MARK_BITS чёрных и белых клеток в верхней строке"""
+    for bit in range(MARK_BITS):
+        value = 255 if number >> bit & 1 else 0
+        frame[:MARK_CELL, bit * MARK_CELL:(bit + 1) * MARK_CELL] = value
+
+
+def read_mark(frame, width):
+    """Номер кадра по метке; width - ширина кадров источника (принятый кадр может быть уменьшен)"""
+    cell = MARK_CELL * frame.shape[1] / float(width)
+    row = frame[max(0, int(cell / 2))]
+    number = 0
+    for bit in range(MARK_BITS):
+        if row[int((bit + 0.5) * cell)].mean() > 127:
+            number |= 1 << bit
+    return number
+
+
+class MarkedFrames:
+    """Кадры источника с меткой номера кадра и время отправки каждого номера"""
+    def __init__(self, source=None, count=100, size=(1280, 720), quality=80):
+        frames = []
+        if source:
+            cap = cv2.VideoCapture(source)
+            while len(frames) < count:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            cap.release()
+            if not frames:
+                raise ValueError(f"Не удалось прочитать кадры из {source}")
+        else:
+            plates = unique_plates(max(1, count // 25), random.Random(1))
+            frames = [frame for frame, _, _ in synthetic_frames(plates, size=size)][:count]
+        self.width = frames[0].shape[1]
+        self.frames = frames
+        self.quality = quality
+        self.sent = {}  # номер кадра -> time.monotonic() отправки
+        self._number = 0
+        self._lock = threading.Lock()
+
+    def next_jpeg(self):
+        with self._lock:
+            number = self._number
+            self._number += 1
+        frame = self.frames[number % len(self.frames)].copy()
+        draw_mark(frame, number % (1 << MARK_BITS))
+        ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        self.sent[number % (1 << MARK_BITS)] = time.monotonic()
+        return data.tobytes()
+
+
+class MJPEGServer:
+    def __init__(self, frames, fps=25.0, host='127.0.0.1', port=8081, outage_every=None, outage_length=3.0):
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.outage_every = outage_every
+        self.outage_length = outage_length
+        self._started = time.monotonic()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/stream.mjpg"
+
+    def offline(self):
+        """Идёт ли сейчас имитируемый обрыв связи"""
+        if not self.outage_every:
+            return False
+        return (time.monotonic() - self._started) % self.outage_every > self.outage_every - self.outage_length
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if server.offline():
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                next_time = time.monotonic()
+                try:
+                    while not server.offline():
+                        data = server.frames.next_jpeg()
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(data)}\r\n\r\n".encode('ascii') + data + b"\r\n")
+                        next_time += server.interval
+                        time.sleep(max(0.0, next_time - time.monotonic()))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mjpeg-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', help="запись для раздачи (без неё - синтетические кадры)")
+    parser.add_argument('--frames', type=int, default=250, help="сколько кадров источника раздавать по кругу")
+    parser.add_argument('--fps', type=float, default=25.0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--outage-every', type=float, help="период имитируемых обрывов, с")
+    parser.add_argument('--outage-length', type=float, default=3.0, help="длительность обрыва, с")
+    args = parser.parse_args()
+
+    server = MJPEGServer(MarkedFrames(args.source, args.frames), args.fps, args.host, args.port,
+                         args.outage_every, args.outage_length).start()
+    print(f"Поток: {server.url} (Ctrl+C - остановить)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
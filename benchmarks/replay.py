@@ -0,0 +1,76 @@
+"""Источники кадров для замеров: запись с камеры, папка с кадрами, синтетические кадры"""
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class ReplaySource:
+    """
+    Кадры из видеофайла (или любого URL, который понимает cv2.VideoCapture)
+    либо из папки с изображениями (по имени файла). Итерация выдаёт BGR-кадры
+    """
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.fps = None     # Частота кадров записи, если известна
+
+        if not os.path.isdir(path):
+            cap = cv2.VideoCapture(path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            self.fps = fps if fps and fps > 0 else None
+
+    def _images(self):
+        names = sorted(name for name in os.listdir(self.path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names:
+            frame = cv2.imread(os.path.join(self.path, name))
+            if frame is not None:
+                yield frame
+
+    def _video(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        finally:
+            cap.release()
+
+    def __iter__(self):
+        while True:
+            frames = self._images() if os.path.isdir(self.path) else self._video()
+            count = 0
+            for frame in frames:
+                count += 1
+                yield frame
+            if not self.loop or not count:
+                return
+
+
+def replay(frames, pipeline, stream_id, fps=25.0, on_frame=None):
+    """
+    Передача кадров в конвейер так же, как VideoThread: submit без ожидания
+    результата, с темпом fps кадров в секунду (fps=0 - как можно быстрее).
+    on_frame(frame_index, item) вызывается перед отправкой каждого кадра.
+    Возвращает число отправленных кадров
+    """
+    interval = 1.0 / fps if fps else 0.0
+    next_time = time.perf_counter()
+    count = 0
+    for item in frames:
+        frame = item[0] if isinstance(item, tuple) else item
+        if on_frame is not None:
+            on_frame(count, item)
+        pipeline.submit(frame, stream_id=stream_id)
+        count += 1
+        if interval:
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return count
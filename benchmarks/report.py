@@ -0,0 +1,92 @@
+"""
+Сводка замеров и сравнение двух запусков.
+python -m benchmarks.report old.json new.json
+"""
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(seconds):
+    """Перцентили списка длительностей (в секундах) в миллисекундах"""
+    if not seconds:
+        return {'count': 0}
+    return {
+        'count': len(seconds),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3),
+        'p50_ms': round(percentile(seconds, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(seconds, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 0.99) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(path, name, params, results):
+    """Запись результатов в JSON вместе с условиями запуска"""
+    document = {
+        'benchmark': name,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'params': params,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return document
+
+
+def flatten(data, prefix=''):
+    """Вложенный словарь -> {'a.b.c': число}"""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new):
+    """Строки сравнения числовых результатов двух запусков"""
+    before, after = flatten(old['results']), flatten(new['results'])
+    lines = []
+    for name in sorted(before.keys() & after.keys()):
+        a, b = before[name], after[name]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else ""
+        lines.append(f"{name:<50} {a:>12} {b:>12} {change:>8}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{old['benchmark']}: {old.get('revision')} ({old['time']}) -> {new.get('revision')} ({new['time']})")
+    for line in compare(old, new):
+        print(line)
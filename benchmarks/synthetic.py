@@ -0,0 +1,91 @@
+"""Синтетические номера, кадры с машинами и базы номеров для замеров"""
+import cv2
+import numpy as np
+
+from license_plate_manager import LicensePlateManager
+from plate_decoder import REGION_CODES
+
+LETTERS = 'АВЕКМНОРСТУХ'
+DIGITS = '0123456789'
+REGIONS = sorted(REGION_CODES)
+
+# Буквы номеров совпадают по начертанию с латинскими - шрифты Hershey кириллицу не рисуют
+LATIN = str.maketrans('АВЕКМНОРСТУХ', 'ABEKMHOPCTYX')
+
+
+def random_plate(rng):
+    """Случайный номер формата А123ВС77 / А123ВС777 с кодом региона из REGION_CODES"""
+    region = rng.choice(REGIONS)
+    return (rng.choice(LETTERS) + ''.join(rng.choice(DIGITS) for _ in range(3))
+            + rng.choice(LETTERS) + rng.choice(LETTERS) + region)
+
+
+def noisy(plate, rng, errors=1):
+    """Номер с ошибками распознавания (замена символа)"""
+    chars = list(plate)
+    for _ in range(errors):
+        chars[rng.randrange(len(chars))] = rng.choice(LETTERS + DIGITS)
+    return ''.join(chars)
+
+
+def unique_plates(size, rng):
+    plates = set()
+    while len(plates) < size:
+        plates.add(random_plate(rng))
+    return sorted(plates)
+
+
+def make_whitelist_db(path, size, rng):
+    """
+    База номеров в формате LicensePlateManager с size записями.
+    Возвращает список номеров в базе
+    """
+    manager = LicensePlateManager(path)  # создаёт таблицу car_owners
+    plates = unique_plates(size, rng)
+    try:
+        manager.conn.execute("DELETE FROM car_owners")
+        manager.conn.commit()
+        manager.import_records(((i, {'plate_number': plate, 'first_name': f"Имя{i}", 'last_name': f"Фамилия{i}"})
+                                for i, plate in enumerate(plates)), batch_size=20000)
+    finally:
+        manager.close()
+    return plates
+
+
+def render_plate(plate, height=60):
+    """Изображение номера: тёмные символы на белом фоне с рамкой"""
+    text = plate.translate(LATIN)
+    scale = height / 40.0
+    (text_w, text_h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 3)
+    width = text_w + int(height * 0.5)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.rectangle(image, (1, 1), (width - 2, height - 2), (0, 0, 0), 2)
+    cv2.putText(image, text, (int(height * 0.25), (height + text_h) // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), 3)
+    return image
+
+
+def synthetic_frames(plates, frames_per_vehicle=25, size=(1280, 720), rng=None):
+    """
+    Кадры с машинами, проезжающими через кадр одна за другой.
+    Выдаёт (кадр, номер машины в списке или None, номер); между машинами - пустые кадры
+    """
+    rng = rng or np.random.default_rng(0)
+    width, height = size
+    background = cv2.GaussianBlur(rng.integers(0, 90, (height, width, 3), dtype=np.uint8), (7, 7), 0)
+    gap = max(1, frames_per_vehicle // 5)
+    for vehicle, plate in enumerate(plates):
+        image = render_plate(plate, height=max(30, height // 12))
+        ph, pw = image.shape[:2]
+        for i in range(frames_per_vehicle):
+            frame = background.copy()
+            # машина въезжает снизу и останавливается у шлагбаума
+            progress = min(1.0, i / (frames_per_vehicle * 0.6))
+            y = int(height - ph - 10 - progress * (height * 0.35))
+            x = (width - pw) // 2
+            car = (x - pw // 2, y - ph * 3, x + pw + pw // 2, min(height - 1, y + ph + 20))
+            cv2.rectangle(frame, car[:2], car[2:], (60, 60, 70), -1)
+            frame[y:y + ph, x:x + pw] = image
+            yield frame, vehicle, plate
+        for _ in range(gap):
+            yield background.copy(), None, None
@@ -0,0 +1,197 @@
+"""
+Захват видео с камеры: отдельный поток читает поток без пауз и хранит только
+последний кадр, поэтому потребитель всегда получает самый свежий кадр,
+а не накопившийся в буфере декодера. При обрыве поток переоткрывается
+с экспоненциально растущей паузой. Показатели (кадры на входе и выходе,
+время чтения кадра, переподключения, возраст кадра) - в stats()
+"""
+import os
+import time
+import random
+import threading
+from collections import deque
+
+import cv2
+
+from metrics import get_registry
+
+# Настройки FFmpeg для сетевых потоков: без входного буфера и с малой задержкой.
+# Переменная читается при открытии потока; заданное пользователем значение не меняется
+os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', 'fflags;nobuffer|flags;low_delay')
+
+
+class CameraStream:
+    """
+    Поток кадров камеры. read() возвращает кадр, новее уже выданного, или None
+    по истечении timeout; промежуточные кадры отбрасываются (dropped).
+    Файл на диске читается в темпе его частоты кадров и при окончании
+    открывается заново (запись в роли камеры)
+    """
+    def __init__(self, url, name=None, reconnect_min=0.5, reconnect_max=30.0, timeout=5.0, width=None,
+                 on_error=None, metrics=None):
+        self.url = url
+        self.name = name if name is not None else str(url)
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.timeout = timeout    # Ожидание открытия потока и очередного кадра, с
+        self.width = width        # Уменьшать кадры до этой ширины после декодирования
+        self.on_error = on_error
+        self.metrics = metrics if metrics is not None else get_registry()
+        self.is_file = isinstance(url, str) and os.path.isfile(url)
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._frame = None
+        self._frame_time = 0.0     # time.monotonic() декодирования последнего кадра
+        self._seq = 0              # Номер последнего декодированного кадра
+        self._delivered = 0        # Номер последнего выданного кадра
+
+        self.connected = False
+        self.reconnects = 0
+        self.dropped = 0
+        self.last_error = None
+        self.frame_age = 0.0       # Возраст последнего выданного кадра, с
+        self._in_times = deque(maxlen=64)
+        self._out_times = deque(maxlen=64)
+        self._read_total = 0.0     # Время cap.read(): ожидание кадра из сети и декодирование
+        self._read_count = 0
+
+    @classmethod
+    def from_config(cls, camera, config, on_error=None):
+        """Захват камеры по настройкам config.py; capture_width можно задать и у камеры"""
+        return cls(camera['url'], name=camera.get('name'), reconnect_min=config['capture_reconnect_min'],
+                   reconnect_max=config['capture_reconnect_max'], timeout=config['capture_timeout'],
+                   width=camera.get('capture_width', config['capture_width']), on_error=on_error)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(self.timeout + 1.0 if timeout is None else timeout)
+            self._thread = None
+
+    def _error(self, message):
+        self.last_error = message
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def _open(self):
+        timeout_ms = int(self.timeout * 1000)
+        params = []
+        for name in ('CAP_PROP_OPEN_TIMEOUT_MSEC', 'CAP_PROP_READ_TIMEOUT_MSEC'):
+            if hasattr(cv2, name):
+                params += [getattr(cv2, name), timeout_ms]
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, params)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # поддерживается не всеми источниками
+        return cap
+
+    def _backoff(self, attempt):
+        """Пауза перед попыткой attempt: удваивается от reconnect_min до reconnect_max, со случайным разбросом"""
+        delay = min(self.reconnect_max, self.reconnect_min * 2 ** max(0, attempt - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            cap = self._open()
+            if cap is None:
+                attempt += 1
+                delay = self._backoff(attempt)
+                self._error(f"Не удалось открыть камеру {self.name}, повтор через {delay:.1f} с")
+                self._stop.wait(delay)
+                continue
+            self.connected = True
+            try:
+                received = self._read_loop(cap)
+            finally:
+                cap.release()
+                self.connected = False
+            if self._stop.is_set():
+                break
+            if self.is_file and received:
+                continue  # запись закончилась - с начала, без паузы
+            attempt = 0 if received else attempt + 1
+            self.reconnects += 1
+            self.metrics.inc('capture_reconnects_total')
+            delay = self._backoff(max(1, attempt))
+            self._error(f"Потеряна связь с камерой {self.name}, переподключение через {delay:.1f} с")
+            self._stop.wait(delay)
+
+    def _read_loop(self, cap):
+        """Чтение кадров до обрыва; возвращает число прочитанных кадров"""
+        interval = 0.0
+        if self.is_file:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            interval = 1.0 / fps if fps and fps > 0 else 0.04
+        received = 0
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            read_time = time.perf_counter() - start
+            if not ret or frame is None:
+                return received
+            if self.width and frame.shape[1] > self.width:
+                height = max(1, int(round(frame.shape[0] * self.width / frame.shape[1])))
+                frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+            received += 1
+            now = time.monotonic()
+            with self._cond:
+                self._frame = frame
+                self._frame_time = now
+                self._seq += 1
+                self._in_times.append(now)
+                self._read_total += read_time
+                self._read_count += 1
+                self._cond.notify_all()
+            self.metrics.observe('capture_read_seconds', read_time)
+            if interval:
+                next_time = max(next_time + interval, now - interval)
+                self._stop.wait(max(0.0, next_time - time.monotonic()))
+        return received
+
+    def read(self, timeout=1.0):
+        """Самый свежий кадр новее уже выданного; None, если его нет за timeout секунд"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq != self._delivered or self._stop.is_set(), timeout):
+                return None
+            if self._stop.is_set():
+                return None
+            self.dropped += self._seq - self._delivered - 1
+            self._delivered = self._seq
+            now = time.monotonic()
+            self.frame_age = now - self._frame_time
+            self._out_times.append(now)
+            frame = self._frame
+        self.metrics.observe('capture_frame_age_seconds', self.frame_age)
+        return frame
+
+    @staticmethod
+    def _rate(times):
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return round((len(times) - 1) / (times[-1] - times[0]), 1)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'connected': self.connected,
+                'fps_in': self._rate(self._in_times),
+                'fps_out': self._rate(self._out_times),
+                'read_ms': round(self._read_total / self._read_count * 1000, 2) if self._read_count else 0.0,
+                'frames': self._seq,
+                'dropped': self.dropped,
+                'reconnects': self.reconnects,
+                'frame_age_ms': round(self.frame_age * 1000, 1),
+            }
@@ -0,0 +1,93 @@
+import json
+import os
+import copy
+
+CONFIG_PATH = 'config.json'
+
+# Значения по умолчанию; config.json может переопределить любое из них
+DEFAULT_CONFIG = {
+    # Список камер (полос въезда/выезда). mode: manual - распознавание по запросу,
+    # continuous - каждый кадр передаётся в общий конвейер, auto - только кадры
+    # с движением в области motion_roi ([x, y, w, h] в долях кадра, по умолчанию весь кадр).
+    # rois - список областей [x, y, w, h] в долях кадра, где ищутся номера (по умолчанию весь кадр)
+    'cameras': [
+        {'name': 'Камера 1', 'url': 'http://192.168.0.109:8080/video', 'mode': 'manual'},
+    ],
+    'detection_workers': 1,     # Потоков поиска номеров (общие для всех камер)
+    'ocr_workers': 1,           # Потоков и моделей OCR (общие для всех камер)
+    'ocr_queue_size': 4,        # Ёмкость очереди между поиском номеров и OCR
+    'similarity_threshold': 75, # Порог схожести при проверке по базе, %
+    'repeat_timeout': 10,       # Не повторять вердикт по тому же номеру на полосе, с
+    'db_path': 'plates.db',
+    'whitelist_poll_interval': 1.0,  # Как часто проверять изменения базы из других процессов, с
+    # Слежение за номером по кадрам и голосование по прочтениям OCR
+    'tracking': True,
+    'vote_min_readings': 3,     # Согласных прочтений для решения
+    'vote_agreement': 0.6,      # Минимальная доля голосов за каждый символ
+    'vote_max_readings': 8,     # Бюджет прочтений на трек; затем берётся лучший вариант
+    'track_max_age': 1.5,       # Трек без рамок дольше этого времени забывается, с
+    'track_decision_ttl': 5.0,  # Через сколько секунд номер трека распознаётся заново, с
+    # Детектор движения для режима auto
+    'motion_method': 'diff',    # diff - разность с фоном, mog2 - cv2.BackgroundSubtractorMOG2
+    'motion_scale_width': 160,  # Ширина уменьшенного кадра, px
+    'motion_min_area': 0.02,    # Доля изменившихся пикселей, при которой есть движение
+    'motion_trigger_frames': 2, # Кадров с движением подряд до включения распознавания
+    'motion_hold_time': 2.0,    # Сколько распознавать после последнего движения, с
+    # Поиск номеров: грубый проход на уменьшенной копии областей rois и уточнение в полном размере
+    'localizer': True,
+    'localizer_coarse_width': 640,  # Ширина копии области для грубого прохода, px
+    'localizer_top_k': 3,           # Сколько лучших кандидатов с кадра передавать в OCR
+    'localizer_min_score': 0.2,     # Минимальная оценка кандидата (границы и пятна символов), 0..1
+    # Подготовка вырезок номеров к OCR (plate_preprocess.py)
+    'preprocess_height': 64,            # Высота вырезки на входе OCR, px
+    'preprocess_max_aspect': 8.0,       # Наибольшее отношение ширины вырезки к высоте
+    'preprocess_binarization': 'otsu',  # otsu - по каждой вырезке, adaptive - по всему пакету, none
+    'preprocess_adaptive_block': 31,    # Окно адаптивной бинаризации, px
+    'preprocess_clahe': False,          # Выравнивание контраста (CLAHE) перед бинаризацией
+    'preprocess_deskew': True,          # Выравнивание наклона по minAreaRect контуров вырезки
+    # Разбор прочтений OCR по шаблону номера и кодам регионов (plate_decoder.py)
+    'decode_hypotheses': 5,         # Вариантов номера на прочтение для проверки по базе
+    'decode_max_cost': 1.5,         # Наибольшая суммарная стоимость замен символов (OCR_CONFUSIONS)
+    'decode_extra_regions': [],     # Коды регионов в дополнение к REGION_CODES, например ["199"]
+    # Метрики: http://127.0.0.1:<metrics_port>/metrics (None - выключено, обычно 9108) и файл JSON-строк
+    'metrics_port': None,
+    'metrics_jsonl': None,      # Путь к файлу попыток распознавания и снимков метрик
+    'metrics_interval': 10.0,   # Как часто писать снимок метрик в файл, с
+    'metrics_panel': True,      # Панель метрик в окне программы
+    # Журнал проездов: файл SQLite на каждый месяц в каталоге journal_dir (None - выключен),
+    # например "journal"
+    'journal_dir': None,
+    'journal_retention_months': 12,  # Сколько месяцев хранить, включая текущий (0 - без удаления)
+    'journal_batch_size': 500,       # Событий в одной транзакции записи
+    'journal_flush_interval': 1.0,   # Сколько ждать новых событий перед записью пачки, с
+    'journal_queue_size': 10000,     # Ёмкость очереди записи; при переполнении события отбрасываются
+    'journal_crops': False,          # Сохранять вырезки номеров (JPEG в journal_dir/crops)
+    # Захват видео (capture.py): при обрыве поток переоткрывается с паузой,
+    # растущей вдвое от capture_reconnect_min до capture_reconnect_max
+    'capture_reconnect_min': 0.5,    # Пауза перед первым переподключением, с
+    'capture_reconnect_max': 30.0,   # Наибольшая пауза между попытками, с
+    'capture_timeout': 5.0,          # Ожидание открытия потока и очередного кадра, с
+    'capture_width': None,           # Уменьшать кадры до этой ширины сразу после декодирования
+                                     # (None - без уменьшения; можно задать и у камеры)
+    # Служба без интерфейса (gate_service.py): HTTP API на service_host:service_port
+    # или на Unix-сокете service_socket, если он задан
+    'service_host': '127.0.0.1',
+    'service_port': 8765,
+    'service_socket': None,
+    # Адрес службы для окна программы (http://127.0.0.1:8765 или unix:///путь).
+    # Если задан, окно только показывает видео, а распознавание и база - в службе
+    'service_url': None,
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """Загрузка настроек из JSON-файла поверх значений по умолчанию"""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            config.update(json.load(f))
+
+    for i, camera in enumerate(config['cameras']):
+        camera.setdefault('name', f"Камера {i + 1}")
+        camera.setdefault('mode', 'manual')
+    return config
@@ -0,0 +1,154 @@
+import json
+import socket
+import http.client
+from urllib.parse import urlsplit, quote, urlencode
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP-соединение через Unix-сокет"""
+    def __init__(self, path, timeout=10.0):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class GateClient:
+    """
+    Клиент API gate_service.py. url - http://127.0.0.1:8765 или unix:///путь/к/сокету.
+    Методы add_plate, delete_plate, list_all_plates и close повторяют
+    LicensePlateManager, поэтому клиент можно передать окну управления базой.
+    Каждый запрос идёт в своём соединении - методы можно вызывать из разных потоков
+    """
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        self.unix_socket = parts.path if parts.scheme == 'unix' else None
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+
+    def _connection(self, timeout):
+        if self.unix_socket:
+            return UnixHTTPConnection(self.unix_socket, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def request(self, method, path, data=None, params=None, wait=0.0):
+        """Запрос к службе; возвращает (код ответа, JSON ответа)"""
+        if params:
+            path += '?' + urlencode(params)
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8') if data is not None else None
+        connection = self._connection(self.timeout + wait)
+        try:
+            connection.request(method, path, body=body,
+                               headers={'Content-Type': 'application/json; charset=utf-8'})
+            response = connection.getresponse()
+            raw = response.read()
+        finally:
+            connection.close()
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            return response.status, json.loads(raw.decode('utf-8'))
+        return response.status, raw.decode('utf-8')
+
+    def _get(self, path, params=None, wait=0.0):
+        status, payload = self.request('GET', path, params=params, wait=wait)
+        if status != 200:
+            raise ConnectionError(payload.get('error') if isinstance(payload, dict) else payload)
+        return payload
+
+    def health(self):
+        return self._get('/health')
+
+    def stats(self):
+        return self._get('/stats')
+
+    def metrics(self):
+        return self._get('/metrics')
+
+    def verify(self, plate, threshold=None):
+        """Вердикт по базе для номера, как LicensePlateValidator.get_verdict"""
+        data = {'plate': plate}
+        if threshold is not None:
+            data['threshold'] = threshold
+        status, payload = self.request('POST', '/verify', data)
+        if status != 200:
+            raise ConnectionError(payload.get('error') if isinstance(payload, dict) else payload)
+        return payload
+
+    def request_check(self, lane, wait=10.0):
+        """Проверка на полосе lane; вердикт или None, если номер не распознан за wait секунд"""
+        status, payload = self.request('POST', f"/lanes/{quote(lane)}/check",
+                                       params={'wait': wait} if wait else None, wait=wait)
+        if status != 200:
+            raise ConnectionError(payload.get('error') if isinstance(payload, dict) else payload)
+        return payload['verdict']
+
+    def verdicts(self, since=0, wait=0.0, lane=None):
+        """Вердикты полос после since (id); ждёт до wait секунд, если новых нет"""
+        params = {'since': since, 'wait': wait}
+        if lane is not None:
+            params['lane'] = lane
+        return self._get('/verdicts', params, wait=wait)
+
+    def journal(self, plate=None, camera=None, since=None, until=None, granted=None, limit=100):
+        """События журнала проездов, как AccessJournal.query"""
+        params = {'limit': limit}
+        for name, value in (('plate', plate), ('camera', camera), ('since', since), ('until', until)):
+            if value is not None:
+                params[name] = value
+        if granted is not None:
+            params['granted'] = int(granted)
+        return self._get('/journal', params)['events']
+
+    def add_plate(self, plate, first_name, last_name, patronymic):
+        try:
+            _, payload = self.request('POST', '/whitelist', {
+                'plate': plate, 'first_name': first_name, 'last_name': last_name, 'patronymic': patronymic})
+        except OSError as e:
+            return False, f"Служба недоступна: {e}"
+        return payload.get('success', False), payload.get('message') or payload.get('error')
+
+    def delete_plate(self, plate):
+        try:
+            _, payload = self.request('DELETE', f"/whitelist/{quote(plate)}")
+        except OSError as e:
+            return False, f"Служба недоступна: {e}"
+        return payload.get('success', False), payload.get('message') or payload.get('error')
+
+    def page_records(self, after=None, limit=200, search='', order='plate_number', descending=False):
+        """Страница записей, как LicensePlateManager.page_records"""
+        params = {'limit': limit, 'search': search, 'order': order, 'desc': int(descending)}
+        if after is not None:
+            params['after'] = json.dumps(list(after), ensure_ascii=False)
+        try:
+            records = self._get('/whitelist', params)['records']
+        except OSError as e:
+            print(f"Ошибка при получении данных: {e}")
+            return []
+        return [self._record(r) for r in records]
+
+    def count_records(self, search=''):
+        try:
+            return self._get('/whitelist/count', {'search': search})['count']
+        except OSError as e:
+            print(f"Ошибка при получении данных: {e}")
+            return 0
+
+    @staticmethod
+    def _record(r):
+        return (r['id'], r['plate_number'], r['first_name'], r['last_name'], r['patronymic'], r['created_at'])
+
+    def list_all_plates(self):
+        """Записи базы кортежами в порядке столбцов car_owners, как у LicensePlateManager"""
+        try:
+            records = self._get('/whitelist')['records']
+        except OSError as e:
+            print(f"Ошибка при получении данных: {e}")
+            return []
+        return [self._record(r) for r in records]
+
+    def close(self):
+        pass  # соединение открывается на каждый запрос
@@ -0,0 +1,245 @@
+import sys
+import time
+import queue
+import threading
+from functools import partial
+
+from config import load_config
+from ocr_engine import get_reader_pool
+from plate_validator import LicensePlateValidator
+from plate_tracker import PlateTracker
+from motion_gate import MotionGate
+from capture import CameraStream
+from plate_localizer import PlateLocalizer
+from plate_preprocess import PlatePreprocessor
+from plate_recognition import recognize_plates_batch
+from plate_decoder import PlateDecoder, best_plate
+from whitelist_cache import WhitelistCache
+from access_journal import AccessJournal
+from recognition_pipeline import RecognitionPipeline
+from metrics import get_registry, start_sinks
+
+
+class Lane:
+    """
+    Полоса въезда/выезда: захват кадров с одной камеры и собственный вердикт.
+    Поиск номеров и OCR выполняет общий для всех полос конвейер
+    """
+    def __init__(self, camera, pipeline, db_path='plates.db', threshold=75, repeat_timeout=10,
+                 on_verdict=None, on_error=None, cache=None, motion_gate=None, localizer=None, journal=None,
+                 stream=None):
+        self.name = camera['name']
+        self.url = camera['url']
+        self.mode = camera.get('mode', 'manual')
+        self.pipeline = pipeline
+        self.db_path = db_path
+        self.cache = cache  # Общий кэш базы номеров; без него у полосы свой
+        self.threshold = threshold
+        self.repeat_timeout = repeat_timeout
+        self.on_verdict = on_verdict
+        self.on_error = on_error
+        self.journal = journal  # Журнал проездов (AccessJournal), общий для полос
+        # Захват с переподключением; отдаёт только самый свежий кадр
+        self.stream = stream if stream is not None else CameraStream(self.url, name=self.name)
+        if self.stream.on_error is None:
+            self.stream.on_error = on_error  # сообщения захвата уже содержат имя камеры
+
+        self.check_enabled = self.mode == 'continuous'  # Отдавать ли кадры в конвейер
+        self.motion_gate = motion_gate  # В режиме auto кадры без движения в конвейер не идут
+        self.running = False
+        self._results = queue.Queue(maxsize=8)  # Распознанные номера, ждущие вердикта
+        self._last_plate = None
+        self._last_plate_time = 0.0
+        self._check_requested = None  # Время запроса ручной проверки (time.time())
+        self._threads = []
+
+        self.localizer = localizer  # Свой поиск номеров с областями камеры (None - общий поиск конвейера)
+        self.pipeline.add_stream(self.name, self._on_result, detector=self.localizer)
+
+    def start(self):
+        self.running = True
+        for target, suffix in ((self._capture_loop, 'capture'), (self._verdict_loop, 'verdict')):
+            thread = threading.Thread(target=target, name=f"{self.name}-{suffix}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self.stream.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.pipeline.remove_stream(self.name)
+
+    def request_check(self):
+        """Запрос однократной проверки (аналог кнопки в окне)"""
+        self.pipeline.reset_tracks(self.name)
+        self._check_requested = time.time()
+        self.check_enabled = True
+
+    def _error(self, message):
+        if self.on_error is not None:
+            self.on_error(f"[{self.name}] {message}")
+
+    def _capture_loop(self):
+        """Чтение кадров с камеры и передача их в общий конвейер"""
+        self.stream.start()
+        while self.running:
+            frame = self.stream.read(timeout=0.5)
+            if frame is None:
+                continue
+            moving = self.motion_gate is not None and self.motion_gate.update(frame)
+            if self.check_enabled or moving:
+                self.pipeline.submit(frame, stream_id=self.name)
+
+    def _on_result(self, result):
+        """Результат конвейера (поток OCR) - передаётся в поток вердиктов полосы"""
+        plate = best_plate(result['plates'])
+        if plate is None:
+            return
+        try:
+            self._results.put_nowait((plate, result))
+        except queue.Full:
+            get_registry().inc('results_dropped_total')
+
+    def _verdict_loop(self):
+        """Проверка номеров по базе; валидатор создаётся в этом потоке и принадлежит полосе"""
+        validator = LicensePlateValidator(self.db_path, cache=self.cache)
+        try:
+            while self.running:
+                try:
+                    plate, result = self._results.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                plate_text = plate['text']
+
+                if self.mode == 'manual':
+                    if not self.check_enabled:
+                        continue
+                    self.check_enabled = False
+                elif (plate_text == self._last_plate
+                      and time.monotonic() - self._last_plate_time < self.repeat_timeout):
+                    continue  # та же машина ещё стоит перед камерой
+                self._last_plate = plate_text
+                self._last_plate_time = time.monotonic()
+
+                start = time.perf_counter()
+                verdict = validator.check_plate(plate_text, self.threshold, hypotheses=plate.get('hypotheses'),
+                                                reading=plate.get('reading'))
+                lookup_time = time.perf_counter() - start
+                verdict['lane'] = self.name
+
+                # от запроса проверки (ручной режим) или от кадра, давшего номер, до вердикта
+                started = result['timestamp']
+                if self.mode == 'manual' and self._check_requested is not None:
+                    started = self._check_requested
+                timings = dict(result['timings'], lookup=lookup_time, total=time.time() - started)
+                get_registry().record_attempt(dict(
+                    timings, lane=self.name, frame_id=result['frame_id'], plate=verdict['cleaned'],
+                    access_granted=verdict['access_granted']))
+                if self.journal is not None:
+                    self.journal.record(verdict, camera=self.name, timings=timings, confidence=plate['confidence'],
+                                        crop=plate.get('crop'), reading=plate.get('reading'))
+                if self.on_verdict is not None:
+                    self.on_verdict(verdict)
+        finally:
+            validator.close()
+
+
+class GateServer:
+    """
+    Несколько камер в одном процессе: по полосе (Lane) на камеру
+    и один общий конвейер поиска номеров и OCR. Память растёт с числом
+    рабочих потоков OCR, а не с числом камер
+    """
+    def __init__(self, config, on_verdict=None, on_error=None):
+        self.config = config
+        self.on_error = on_error
+        get_reader_pool(size=config['ocr_workers'])  # одна модель на поток OCR
+        recognizer = partial(recognize_plates_batch, preprocessor=PlatePreprocessor.from_config(config),
+                             decoder=PlateDecoder.from_config(config))
+        self.pipeline = RecognitionPipeline(on_error=on_error,
+                                            detection_workers=config['detection_workers'],
+                                            ocr_workers=config['ocr_workers'],
+                                            ocr_queue_size=config['ocr_queue_size'],
+                                            recognizer=recognizer,
+                                            tracker=PlateTracker.from_config(config))
+        # Одна копия базы номеров в памяти на все полосы
+        self.whitelist = WhitelistCache(config['db_path'], config['whitelist_poll_interval'])
+        self.journal = AccessJournal.from_config(config)
+        get_registry().add_collector(self.metrics_stats)
+        self.metrics_sinks = []
+        self.lanes = {}
+        for camera in config['cameras']:
+            motion_gate = MotionGate.from_config(camera, config) if camera['mode'] == 'auto' else None
+            lane = Lane(camera, self.pipeline, db_path=config['db_path'],
+                        threshold=config['similarity_threshold'],
+                        repeat_timeout=config['repeat_timeout'],
+                        on_verdict=on_verdict, on_error=on_error, cache=self.whitelist,
+                        motion_gate=motion_gate,
+                        localizer=PlateLocalizer.from_config(camera, config), journal=self.journal,
+                        stream=CameraStream.from_config(camera, config))
+            self.lanes[lane.name] = lane
+
+    def start(self):
+        self.metrics_sinks = start_sinks(self.config)
+        if self.journal is not None:
+            self.journal.start()
+        get_reader_pool().warm_up_async()
+        self.pipeline.start()
+        for lane in self.lanes.values():
+            lane.start()
+
+    def stop(self):
+        for lane in self.lanes.values():
+            lane.stop()
+        self.pipeline.stop()
+        self.whitelist.close()
+        if self.journal is not None:
+            self.journal.close()  # дописывает события из очереди
+        for sink in self.metrics_sinks:
+            sink.stop()
+
+    def metrics_stats(self):
+        """Показатели stats() для выгрузки метрик - без разбивки по камерам"""
+        pipeline = self.pipeline.stats()
+        pipeline.pop('streams')
+        stats = {'pipeline': pipeline, 'ocr_pool': get_reader_pool().stats(), 'whitelist': self.whitelist.stats()}
+        if self.journal is not None:
+            stats['journal'] = self.journal.stats()
+        return stats
+
+    def request_check(self, lane_name):
+        self.lanes[lane_name].request_check()
+
+    def stats(self):
+        return {'pipeline': self.pipeline.stats(), 'ocr': get_reader_pool().stats(),
+                'whitelist': self.whitelist.stats(),
+                'journal': self.journal.stats() if self.journal is not None else None,
+                'motion': {name: lane.motion_gate.stats() for name, lane in self.lanes.items()
+                           if lane.motion_gate is not None},
+                'localizer': {name: lane.localizer.stats() for name, lane in self.lanes.items()
+                              if lane.localizer is not None},
+                'cameras': {name: lane.stream.stats() for name, lane in self.lanes.items()}}
+
+
+def print_verdict(verdict):
+    """Вывод вердикта в консоль"""
+    status = "ПРОЕЗД РАЗРЕШЁН" if verdict['access_granted'] else "ПРОЕЗД ЗАПРЕЩЁН"
+    best = verdict['matches'][0] if verdict['matches'] else None
+    details = f"{best['plate']} ({best['similarity']}%), {best['owner']}" if best else "совпадений нет"
+    print(f"[{time.strftime('%H:%M:%S')}] {verdict['lane']}: {verdict['cleaned']} - {status}: {details}")
+
+
+if __name__ == "__main__":
+    # Запуск без графического интерфейса: python gate_server.py [config.json]
+    config = load_config(sys.argv[1] if len(sys.argv) > 1 else 'config.json')
+    server = GateServer(config, on_verdict=print_verdict, on_error=print)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
@@ -0,0 +1,372 @@
+"""
+Служба без графического интерфейса: GateServer (захват, поиск номеров, OCR,
+проверка по базе) и локальный HTTP API поверх asyncio на TCP-порту или Unix-сокете.
+Окно программы (main.py с service_url) - один из клиентов этого API.
+
+    GET    /health                       - состояние службы и готовность модели OCR
+    GET    /stats                        - stats() конвейера, пула OCR, кэша базы
+    GET    /metrics                      - метрики в текстовом формате Prometheus
+    GET    /verdicts?since=<id>&wait=<с> - вердикты полос после since (ожидание до wait секунд)
+    POST   /verify                       - {"plate": "...", "threshold": 75} -> вердикт по базе
+    POST   /lanes/<полоса>/check?wait=<с> - запрос проверки на полосе и ожидание вердикта
+    GET    /whitelist                    - все записи базы; с limit - страница page_records
+                                           (after=<JSON последней записи>, search=, order=, desc=1)
+    GET    /whitelist/count?search=      - число записей
+    POST   /whitelist                    - {"plate", "first_name", "last_name", "patronymic"}
+    DELETE /whitelist/<номер>            - удаление записи
+    GET    /journal?plate=&camera=&since=&until=&granted=&limit= - журнал проездов,
+                                           от новых событий к старым (since/until - время Unix)
+
+Запуск: python gate_service.py [config.json]
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from config import load_config
+
+MAX_BODY = 1 << 20      # Максимальный размер тела запроса, байт
+MAX_WAIT = 60.0         # Максимальное ожидание вердикта в одном запросе, с
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class GateService:
+    """
+    Цикл asyncio обслуживает запросы; распознавание и проверка по базе идут
+    в потоках GateServer и пула исполнителей, поэтому медленный OCR не задерживает
+    ответы API. Порт (или сокет) открывается сразу, GateServer с тяжёлыми
+    импортами создаётся уже после этого - до готовности /health отвечает
+    'starting', остальные запросы - 503
+    """
+    def __init__(self, config, host='127.0.0.1', port=8765, unix_socket=None, history=100):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.server = None          # GateServer, создаётся в start()
+        self.validator = None       # Общий валидатор для /verify (без состояния, check_plate)
+        self.error = None           # Ошибка запуска GateServer
+        self.started_at = time.time()
+
+        self.verdicts = deque(maxlen=history)  # Последние вердикты полос с id и временем
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._listener = None
+        self._new_verdict = None    # asyncio.Event, заменяется новым после каждого вердикта
+        self._stopping = None
+        self._workers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="service")
+        # Запись в базу - по одной операции; чтение идёт через пул соединений в self._workers
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-db")
+        self._manager = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config, host=config['service_host'], port=config['service_port'],
+                   unix_socket=config['service_socket'])
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._new_verdict = asyncio.Event()
+        self._stopping = asyncio.Event()
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket):
+                os.unlink(self.unix_socket)  # сокет от прошлого запуска
+            self._listener = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+            print(f"API службы: unix://{self.unix_socket}")
+        else:
+            self._listener = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._listener.sockets[0].getsockname()[1]
+            print(f"API службы: http://{self.host}:{self.port}")
+        try:
+            await self._loop.run_in_executor(self._workers, self._start_server)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ошибка запуска распознавания: {e}")
+
+    def _start_server(self):
+        """Создание и запуск GateServer (в потоке: импорт OpenCV и конвейера занимает время)"""
+        from gate_server import GateServer
+        from plate_validator import LicensePlateValidator
+        from license_plate_manager import LicensePlateManager
+
+        server = GateServer(self.config, on_verdict=self._on_verdict, on_error=print)
+        self.validator = LicensePlateValidator(self.config['db_path'], cache=server.whitelist)
+        # Менеджер базы для /whitelist; его изменения сразу попадают в кэш полос
+        self._manager = LicensePlateManager(self.config['db_path'])
+        server.whitelist.follow(self._manager)
+        server.start()
+        self.server = server
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            await self._listener.wait_closed()
+            self._listener = None
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.unlink(self.unix_socket)
+        if self._manager is not None:
+            await self._loop.run_in_executor(self._db, self._manager.close)
+        if self.server is not None:
+            await self._loop.run_in_executor(self._workers, self.server.stop)
+        if self.validator is not None:
+            self.validator.close()
+        self._db.shutdown(wait=False)
+        self._workers.shutdown(wait=False)
+
+    async def run(self):
+        """Работа до SIGINT/SIGTERM"""
+        await self.start()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: остановка по KeyboardInterrupt
+        try:
+            await self._stopping.wait()
+        finally:
+            await self.stop()
+
+    # --- Вердикты полос ---
+
+    def _on_verdict(self, verdict):
+        """Вердикт полосы (поток вердиктов GateServer) - передаётся в цикл asyncio"""
+        self._loop.call_soon_threadsafe(self._add_verdict, dict(verdict, time=time.time()))
+
+    def _add_verdict(self, verdict):
+        verdict['id'] = next(self._ids)
+        self.verdicts.append(verdict)
+        event, self._new_verdict = self._new_verdict, asyncio.Event()
+        event.set()
+
+    def last_verdict_id(self):
+        return self.verdicts[-1]['id'] if self.verdicts else 0
+
+    async def wait_verdicts(self, since=0, wait=0.0, lane=None):
+        """Вердикты с id больше since (только полосы lane, если задана); ждёт до wait секунд"""
+        deadline = self._loop.time() + min(wait, MAX_WAIT)
+        while True:
+            found = [v for v in self.verdicts if v['id'] > since and (lane is None or v['lane'] == lane)]
+            timeout = deadline - self._loop.time()
+            if found or timeout <= 0:
+                return found
+            try:
+                await asyncio.wait_for(self._new_verdict.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        """Соединение HTTP/1.1 с keep-alive"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                try:
+                    status, payload = await self._dispatch(method, path, query, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            self._write_response(writer, e.status, {'error': str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "Неверная строка запроса")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        return method.upper(), unquote(url.path), parse_qs(url.query), headers, body
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+    async def _dispatch(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        if parts == ['health']:
+            return 200, self.health()
+        if self.server is None:
+            raise HttpError(503, self.error or "Служба запускается")
+
+        def param(name, default, kind=float):
+            try:
+                return kind(query[name][0]) if name in query else default
+            except ValueError:
+                raise HttpError(400, f"Неверное значение параметра {name}")
+
+        if method == 'GET' and parts == ['stats']:
+            return 200, await self._run(self._workers, self.server.stats)
+        if method == 'GET' and parts == ['metrics']:
+            from metrics import get_registry
+            return 200, await self._run(self._workers, get_registry().prometheus)
+        if method == 'GET' and parts == ['verdicts']:
+            verdicts = await self.wait_verdicts(param('since', 0, int), param('wait', 0.0),
+                                                query.get('lane', [None])[0])
+            return 200, {'verdicts': verdicts, 'last_id': self.last_verdict_id()}
+        if method == 'POST' and parts == ['verify']:
+            data = self._json(body)
+            if not data.get('plate'):
+                raise HttpError(400, "Не указан номер (plate)")
+            try:
+                threshold = float(data.get('threshold', self.config['similarity_threshold']))
+            except (TypeError, ValueError):
+                raise HttpError(400, "Неверное значение threshold")
+            return 200, await self._run(self._workers, self.validator.check_plate, data['plate'], threshold)
+        if len(parts) == 3 and parts[0] == 'lanes' and parts[2] == 'check':
+            if method != 'POST':
+                raise HttpError(405, "Используйте POST")
+            return 200, await self.check_lane(parts[1], param('wait', 0.0))
+        if parts[:1] == ['whitelist']:
+            return await self._whitelist(method, parts[1:], query, body, param)
+        if method == 'GET' and parts == ['journal']:
+            return 200, await self._journal(query, param)
+        raise HttpError(404, f"Неизвестный адрес {path}")
+
+    async def _run(self, executor, function, *args):
+        return await self._loop.run_in_executor(executor, function, *args)
+
+    @staticmethod
+    def _json(body):
+        try:
+            data = json.loads(body.decode('utf-8') or '{}')
+        except ValueError:
+            raise HttpError(400, "Тело запроса - не JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Ожидается JSON-объект")
+        return data
+
+    def health(self):
+        pool = None
+        if self.server is not None:
+            from ocr_engine import get_reader_pool
+            pool = get_reader_pool()
+        return {
+            'status': 'ready' if self.server is not None else ('error' if self.error else 'starting'),
+            'error': self.error,
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'recognizer_ready': pool is not None and pool.ready.is_set(),
+            'recognizer_error': pool.load_error if pool is not None else None,
+            'lanes': sorted(self.server.lanes) if self.server is not None else [],
+        }
+
+    async def check_lane(self, name, wait=0.0):
+        """Запрос проверки на полосе; с wait - ожидание её вердикта"""
+        if name not in self.server.lanes:
+            raise HttpError(404, f"Нет полосы {name}")
+        since = self.last_verdict_id()
+        self.server.request_check(name)
+        verdicts = await self.wait_verdicts(since, wait, lane=name) if wait else []
+        return {'lane': name, 'verdict': verdicts[0] if verdicts else None}
+
+    async def _journal(self, query, param):
+        journal = self.server.journal
+        if journal is None:
+            raise HttpError(404, "Журнал проездов выключен (journal_dir)")
+        granted = query.get('granted', [None])[0]
+        events = await self._run(self._workers, lambda: journal.query(
+            plate=query.get('plate', [None])[0], camera=query.get('camera', [None])[0],
+            since=param('since', None), until=param('until', None),
+            granted=None if granted is None else granted in ('1', 'true'),
+            limit=min(param('limit', 100, int), 10000)))
+        return {'events': events}
+
+    # --- База номеров ---
+
+    def _list_records(self, limit, after, search, order, descending):
+        from license_plate_manager import RECORD_FIELDS
+        manager = self._manager
+        if limit:
+            records = manager.page_records(after, limit, search, order, descending)
+        else:
+            records = manager.iter_records()
+        return {'records': [dict(zip(RECORD_FIELDS, record)) for record in records]}
+
+    async def _whitelist(self, method, parts, query, body, param):
+        if method == 'GET' and not parts:
+            after = query.get('after', [None])[0]
+            try:
+                after = json.loads(after) if after else None
+            except ValueError:
+                raise HttpError(400, "Неверное значение параметра after")
+            order = query.get('order', ['plate_number'])[0]
+            from license_plate_manager import SORT_FIELDS
+            if order not in SORT_FIELDS:
+                raise HttpError(400, f"Сортировка возможна по {', '.join(SORT_FIELDS)}")
+            return 200, await self._run(self._workers, self._list_records, param('limit', 0, int), after,
+                                        query.get('search', [''])[0], order, bool(param('desc', 0, int)))
+        if method == 'GET' and parts == ['count']:
+            search = query.get('search', [''])[0]
+            return 200, {'count': await self._run(self._workers, lambda: self._manager.count_records(search))}
+        if method == 'POST' and not parts:
+            data = self._json(body)
+            if not data.get('plate') or not data.get('first_name') or not data.get('last_name'):
+                raise HttpError(400, "Нужны поля plate, first_name, last_name")
+            success, message = await self._run(
+                self._db, lambda: self._manager.add_plate(
+                    data['plate'], data['first_name'], data['last_name'], data.get('patronymic', '')))
+            return (200 if success else 409), {'success': success, 'message': message}
+        if method == 'DELETE' and len(parts) == 1:
+            success, message = await self._run(self._db, lambda: self._manager.delete_plate(parts[0]))
+            return (200 if success else 404), {'success': success, 'message': message}
+        raise HttpError(405, "Неподдерживаемый запрос к /whitelist")
+
+
+if __name__ == "__main__":
+    # Запуск без графического интерфейса: python gate_service.py [config.json]
+    config = load_config(sys.argv[1] if len(sys.argv) > 1 else 'config.json')
+    service = GateService.from_config(config)
+    try:
+        asyncio.run(service.run())
+    except KeyboardInterrupt:
+        pass
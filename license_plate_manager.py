@@ -1,90 +1,339 @@
 import sqlite3
-import re
 import sys
 import io
+import itertools
+import threading
 from datetime import datetime
 
+from plate_storage import connect, get_pool, migrate, canonical_plate
+from plate_normalizer import normalize_plate, validate_plates, PLATE_RE
+
 # кодировка
 if sys.stdout.encoding != 'UTF-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+# Поля записей list_all_plates, iter_records, page_records - столбцы car_owners в этом порядке
+RECORD_FIELDS = ('id', 'plate_number', 'first_name', 'last_name', 'patronymic', 'created_at')
+RECORD_COLUMNS = ", ".join(RECORD_FIELDS)
+# Столбцы, по которым page_records умеет сортировать (по индексу)
+SORT_FIELDS = ('id', 'plate_number', 'last_name')
+
 class LicensePlateManager:
     def __init__(self, db_name='plates.db'):
-        """Инициализация соединения с базой данных"""
-        self.conn = sqlite3.connect(db_name)
+        """
+        Инициализация соединения с базой данных (при первом открытии - миграции схемы).
+        Запись идёт через своё соединение под блокировкой, чтение - через общий пул
+        plate_storage, поэтому методы можно вызывать из разных потоков
+        """
+        self.db_name = db_name
+        self.conn = connect(db_name, check_same_thread=False)
         self.cursor = self.conn.cursor()
-        self.create_table()
+        self.pool = get_pool(db_name)
+        self._lock = threading.RLock()  # Запись - по одной операции за раз
+        self.listeners = []  # Подписчики на изменения базы (индексы, кэши)
+
+    def add_listener(self, callback):
+        """
+        Подписка на изменения: callback(event, record) вызывается после commit.
+        event - 'add' (record - словарь с полями строки), 'delete' (record - {'plate_number'})
+        или 'import' (record - {'count'}: пакетная загрузка изменила count строк)
+        """
+        self.listeners.append(callback)
+
+    def data_version(self, wait=True):
+        """
+        PRAGMA data_version соединения записи: меняется от commit других соединений
+        и процессов, но не от записи этого менеджера. None - идёт запись, а wait=False
+        """
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._lock.release()
+
+    def notify(self, event, record):
+        """Оповещение подписчиков об изменении"""
+        for callback in self.listeners:
+            try:
+                callback(event, record)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений: {e}")
         
     def create_table(self):
-        """Создание таблицы, если она не существует"""
+        """Создание таблицы и индексов - миграции plate_storage (выполняются и при открытии базы)"""
         try:
-            self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS car_owners (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                plate_number TEXT NOT NULL UNIQUE,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                patronymic TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            self.conn.commit()
+            with self._lock:
+                migrate(self.conn)
         except sqlite3.Error as e:
             print(f"Ошибка при создании таблицы: {e}")
     
     @staticmethod
     def is_valid_plate(plate):
-        """Проверка формата номера по российскому стандарту"""
-        pattern = r'^[АВЕКМНОРСТУХ]\d{3}[АВЕКМНОРСТУХ]{2}\d{2,3}$'
-        return re.match(pattern, plate.upper()) is not None
+        """
+        Проверка формата номера по российскому стандарту (после normalize_plate:
+        латинские буквы того же начертания считаются кириллицей, пробелы не мешают)
+        """
+        return PLATE_RE.fullmatch(normalize_plate(plate)) is not None
     
     def add_plate(self, plate, first_name, last_name, patronymic):
-        """Добавление нового номера в базу данных"""
+        """Добавление нового номера в базу данных; номер сохраняется нормализованным"""
         if not self.is_valid_plate(plate):
             return False, "Неверный формат номера! Используйте формат: А123АA123 "
+        plate = normalize_plate(plate)
         
-        try:
-            self.cursor.execute("""
-            INSERT INTO car_owners (plate_number, first_name, last_name, patronymic)
-            VALUES (?, ?, ?, ?)
-            """, (plate.upper(), first_name, last_name, patronymic))
-            self.conn.commit()
-            return True, f"Номер {plate} успешно добавлен!"
-        except sqlite3.IntegrityError:
-            return False, f"Ошибка: номер {plate} уже существует в базе!"
-        except sqlite3.Error as e:
-            return False, f"Ошибка базы данных: {e}"
+        with self._lock:
+            try:
+                self.cursor.execute("""
+                INSERT INTO car_owners (plate_number, first_name, last_name, patronymic, plate_canonical)
+                VALUES (?, ?, ?, ?, ?)
+                """, (plate, first_name, last_name, patronymic, canonical_plate(plate)))
+                self.conn.commit()
+            except sqlite3.IntegrityError:
+                self.conn.rollback()  # не держать открытую транзакцию записи
+                return False, f"Ошибка: номер {plate} уже существует в базе!"
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                return False, f"Ошибка базы данных: {e}"
+            row_id = self.cursor.lastrowid
+        self.notify('add', {
+            'id': row_id,
+            'plate_number': plate,
+            'first_name': first_name,
+            'last_name': last_name,
+            'patronymic': patronymic,
+        })
+        return True, f"Номер {plate} успешно добавлен!"
 
 
     def delete_plate(self, plate):
         """Удаление номера из базы данных"""
+        plate = normalize_plate(plate)
         try:
-            #  существует ли номер
-            self.cursor.execute("""
-            SELECT id FROM car_owners WHERE plate_number = ?
-            """, (plate.upper(),))
-            if not self.cursor.fetchone():
-                return False, f"Номер {plate} не найден в базе данных"
-            
-            # Удаляем запись
-            self.cursor.execute("""
-            DELETE FROM car_owners WHERE plate_number = ?
-            """, (plate.upper(),))
-            self.conn.commit()
-            
+            with self._lock:
+                #  существует ли номер
+                self.cursor.execute("""
+                SELECT id FROM car_owners WHERE plate_number = ?
+                """, (plate,))
+                if not self.cursor.fetchone():
+                    return False, f"Номер {plate} не найден в базе данных"
+
+                # Удаляем запись
+                self.cursor.execute("""
+                DELETE FROM car_owners WHERE plate_number = ?
+                """, (plate,))
+                self.conn.commit()
+                deleted = self.cursor.rowcount
+
             # Проверяем успешность удаления
-            if self.cursor.rowcount > 0:
+            if deleted > 0:
+                self.notify('delete', {'plate_number': plate})
                 return True, f"Номер {plate} успешно удален!"
             return False, f"Ошибка при удалении номера {plate}"
         except sqlite3.Error as e:
+            self.conn.rollback()
             return False, f"Ошибка базы данных: {e}"
     
+    def import_records(self, records, upsert=False, batch_size=5000, on_progress=None, max_errors=1000):
+        """
+        Пакетная загрузка записей. records - итерируемое из пар (номер строки, словарь
+        с полями plate_number, first_name, last_name, patronymic) и читается потоково.
+        Каждые batch_size строк - один executemany и один commit. Ошибочные строки
+        не прерывают загрузку и попадают в отчёт (первые max_errors, всего - error_count).
+        upsert - владельцы уже существующих номеров обновляются, иначе такие строки - ошибка.
+        Номер, повторённый в файле, - ошибка, а при upsert берётся последняя строка и повтор
+        считается в 'repeated', а не в 'updated' (там только номера, бывшие в базе до загрузки).
+        on_progress(report) вызывается после каждой пачки. Возвращает отчёт
+        {'read', 'added', 'updated', 'repeated', 'error_count', 'errors': [{'line', 'plate', 'error'}]}
+        """
+        report = {'read': 0, 'added': 0, 'updated': 0, 'repeated': 0, 'error_count': 0, 'errors': []}
+
+        def error(line, plate, message):
+            report['error_count'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({'line': line, 'plate': plate, 'error': message})
+
+        seen = {}  # номер -> первая строка файла с ним, за всю загрузку
+        batch = {}  # номер -> (строка файла, кортеж для INSERT)
+        repeats = set()  # номера пачки, уже записанные прошлыми пачками
+        records = iter(records)
+        while True:
+            # номера читаются пачками: нормализация и проверка формата - одним проходом на пачку
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            raw_plates = [str(record.get('plate_number') or '').strip().upper() for _, record in chunk]
+            plates, valid = validate_plates(raw_plates)
+            for (line, record), raw_plate, plate, is_valid in zip(chunk, raw_plates, plates, valid):
+                report['read'] += 1
+                first_name = str(record.get('first_name') or '').strip()
+                last_name = str(record.get('last_name') or '').strip()
+                patronymic = str(record.get('patronymic') or '').strip()
+                if record.get('_error'):
+                    error(line, raw_plate or None, record['_error'])
+                elif not is_valid:
+                    error(line, raw_plate, "Неверный формат номера")
+                elif not first_name or not last_name:
+                    error(line, plate, "Не указаны фамилия или имя")
+                elif plate in seen and not upsert:
+                    error(line, plate, f"Номер повторяется в файле (строка {seen[plate]})")
+                else:
+                    if plate in seen:
+                        report['repeated'] += 1  # повтор в файле при upsert - берётся последняя строка
+                        if plate not in batch:
+                            repeats.add(plate)
+                    else:
+                        seen[plate] = line
+                    # нормализованный номер совпадает со своим canonical_plate
+                    batch[plate] = (line, (plate, first_name, last_name, patronymic, plate))
+                if len(batch) >= batch_size:
+                    self._import_batch(batch, upsert, report, error, repeats)
+                    batch, repeats = {}, set()
+                    if on_progress is not None:
+                        on_progress(report)
+        if batch:
+            self._import_batch(batch, upsert, report, error, repeats)
+        report['errors'].sort(key=lambda item: item['line'])
+        if on_progress is not None:
+            on_progress(report)
+        if report['added'] or report['updated']:
+            self.notify('import', {'count': report['added'] + report['updated']})
+        return report
+
+    def _import_batch(self, batch, upsert, report, error, repeats):
+        """Одна пачка import_records: поиск уже существующих номеров и executemany в одной транзакции"""
+        with self._lock:
+            self._write_batch(batch, upsert, report, error, repeats)
+
+    def _write_batch(self, batch, upsert, report, error, repeats):
+        plates = list(batch)
+        existing = set()
+        for i in range(0, len(plates), 500):  # не больше 999 параметров в запросе
+            chunk = plates[i:i + 500]
+            self.cursor.execute(f"SELECT plate_number FROM car_owners WHERE plate_number IN "
+                                f"({','.join('?' * len(chunk))})", chunk)
+            existing.update(row[0] for row in self.cursor.fetchall())
+
+        rows = []
+        for plate, (line, row) in batch.items():
+            if plate in existing and not upsert:
+                error(line, plate, f"Номер {plate} уже существует в базе")
+            else:
+                rows.append(row)
+        if not rows:
+            return
+        try:
+            if upsert:
+                self.cursor.executemany("""
+                INSERT INTO car_owners (plate_number, first_name, last_name, patronymic, plate_canonical)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(plate_number) DO UPDATE SET first_name = excluded.first_name,
+                    last_name = excluded.last_name, patronymic = excluded.patronymic
+                """, rows)
+            else:
+                self.cursor.executemany("""
+                INSERT INTO car_owners (plate_number, first_name, last_name, patronymic, plate_canonical)
+                VALUES (?, ?, ?, ?, ?)
+                """, rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            for plate, (line, _) in batch.items():
+                if plate not in existing or upsert:
+                    error(line, plate, f"Ошибка базы данных: {e}")
+            return
+        if upsert:
+            # номера из прошлых пачек уже есть в базе, но это строки самой загрузки
+            report['updated'] += len(existing - repeats)
+            report['added'] += len(rows) - len(existing)
+        else:
+            report['added'] += len(rows)
+
+    def iter_records(self, batch_size=1000):
+        """Потоковое чтение всех записей (по batch_size строк за запрос к курсору)"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"SELECT {RECORD_COLUMNS} FROM car_owners ORDER BY id")
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def find_plate(self, plate):
+        """Запись с номером plate (сравнение в виде canonical_plate, по индексу) или None"""
+        with self.pool.connection() as conn:
+            return conn.execute(f"SELECT {RECORD_COLUMNS} FROM car_owners WHERE plate_canonical = ?",
+                                (canonical_plate(plate),)).fetchone()
+
+    @staticmethod
+    def _search_clause(search):
+        """Условие поиска по началу номера или фамилии - диапазоны, которые идут по индексам"""
+        search = (search or '').strip()
+        if not search:
+            return "", []
+        plate = normalize_plate(search)  # латиница того же начертания, как при вводе номера
+        name = search[:1].upper() + search[1:]
+        if not plate:
+            # в строке нет символов номера - иначе пустое начало подошло бы к любому номеру
+            return "(last_name >= ? AND last_name < ?)", [name, name + '\U0010ffff']
+        return ("((plate_number >= ? AND plate_number < ?) OR (last_name >= ? AND last_name < ?))",
+                [plate, plate + '\U0010ffff', name, name + '\U0010ffff'])
+
+    def page_records(self, after=None, limit=200, search='', order='plate_number', descending=False):
+        """
+        Страница записей для постраничного просмотра без OFFSET: after - последняя
+        запись предыдущей страницы (None - первая страница), search - начало номера
+        или фамилии, order - столбец из SORT_FIELDS. Время запроса не зависит
+        от того, насколько далеко пролистан список
+        """
+        if order not in SORT_FIELDS:
+            raise ValueError(f"Сортировка по {order} не поддерживается")
+        where, params = self._search_clause(search)
+        clauses = [where] if where else []
+        direction, op = ("DESC", "<") if descending else ("ASC", ">")
+        if after is not None:
+            after_id = after[0]
+            if order == 'id':
+                clauses.append(f"id {op} ?")
+                params.append(after_id)
+            elif order == 'plate_number':  # номер уникален - достаточно его самого
+                clauses.append(f"plate_number {op} ?")
+                params.append(after[1])
+            else:
+                clauses.append(f"({order}, id) {op} (?, ?)")
+                params.extend((after[RECORD_FIELDS.index(order)], after_id))
+        sql = f"SELECT {RECORD_COLUMNS} FROM car_owners"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order} {direction}" + (f", id {direction}" if order == 'last_name' else "")
+        sql += " LIMIT ?"
+        try:
+            with self.pool.connection() as conn:
+                return conn.execute(sql, params + [limit]).fetchall()
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении данных: {e}")
+            return []
+
+    def count_records(self, search=''):
+        """Число записей (подходящих под поиск page_records)"""
+        where, params = self._search_clause(search)
+        try:
+            with self.pool.connection() as conn:
+                sql = "SELECT COUNT(*) FROM car_owners" + (f" WHERE {where}" if where else "")
+                return conn.execute(sql, params).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении данных: {e}")
+            return 0
+
     def list_all_plates(self):
         """Получение всех записей из базы"""
         try:
-            self.cursor.execute("SELECT * FROM car_owners")
-            return self.cursor.fetchall()
+            with self.pool.connection() as conn:
+                return conn.execute(f"SELECT {RECORD_COLUMNS} FROM car_owners").fetchall()
         except sqlite3.Error as e:
             print(f"Ошибка при получении данных: {e}")
             return []
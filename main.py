@@ -1,9 +1,12 @@
 import sys
-import cv2
-import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox
+import time
+import threading
+from functools import partial
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QMessageBox, QDockWidget,
+                             QTableWidget, QTableWidgetItem, QFileDialog, QProgressDialog,
+                             QTableView, QLineEdit, QLabel, QVBoxLayout, QWidget, QAbstractItemView)
 from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor
-from PyQt5.QtCore import QThread, pyqtSignal, QElapsedTimer, Qt
+from PyQt5.QtCore import QThread, pyqtSignal, QTimer, Qt, QAbstractTableModel, QModelIndex
 from PyQt5 import QtCore, QtGui
 
 # Импортируем UI классы, сгенерированные из Qt Designer
@@ -12,8 +15,23 @@ from data_modification_designe import Ui_MainWindow as DataModificationWindowUI
 
 # Импортируем менеджер БД, модуль распознавания и валидатор номеров
 from license_plate_manager import LicensePlateManager
-from plate_recognition import detect_place
+from recognition_pipeline import RecognitionPipeline
 from plate_validator import LicensePlateValidator
+from plate_tracker import PlateTracker
+from motion_gate import MotionGate
+from plate_localizer import PlateLocalizer
+from plate_preprocess import PlatePreprocessor
+from plate_recognition import recognize_plates_batch
+from plate_decoder import PlateDecoder, best_plate
+from whitelist_cache import WhitelistCache
+from preview import PreviewBuffer
+from capture import CameraStream
+from access_journal import AccessJournal
+from ocr_engine import get_reader_pool
+from metrics import get_registry, start_sinks
+from gate_client import GateClient
+from whitelist_io import import_file, export_file, format_report
+from config import load_config
 
 
 class VideoThread(QThread):
@@ -21,64 +39,86 @@ class VideoThread(QThread):
     Класс потока для обработки видео с камеры в отдельном потоке.
     Позволяет не блокировать интерфейс во время обработки видео.
     """
-    change_pixmap_signal = pyqtSignal(np.ndarray)  # Сигнал для обновления изображения
-    plate_detected_signal = pyqtSignal(str)       # Сигнал при обнаружении номера
+    frame_ready_signal = pyqtSignal()             # Готов новый кадр предпросмотра (в self.preview)
+    plate_detected_signal = pyqtSignal(str, object)  # Сигнал при обнаружении номера (текст, результат конвейера)
     error_signal = pyqtSignal(str)                # Сигнал об ошибках
 
-    def __init__(self, url):
+    def __init__(self, url, pipeline=None, stream_id=None, motion_gate=None, detector=None, recognition=True,
+                 stream=None):
         super().__init__()
         self.url = url          # URL видеопотока
         self.running = True     # Флаг работы потока
         self.plate_check_enabled = False  # Флаг активации проверки номеров
-        self.cap = None         # Объект захвата видео
+        # Захват с переподключением; поток захвата отдаёт только самый свежий кадр
+        self.stream = stream if stream is not None else CameraStream(url)
+        if self.stream.on_error is None:
+            self.stream.on_error = self.error_signal.emit
+        self.motion_gate = motion_gate  # Автоматический режим: распознавание при движении в кадре
+        self.preview = PreviewBuffer()  # Кадры для окна: уже в размере окна и в RGB
+        self.latest_frame = None        # Последний кадр в полном разрешении (ссылка, без копии)
+
+        # Поиск номеров и OCR выполняются в своих потоках, чтобы захват не ждал распознавания.
+        # Конвейер может быть общим для нескольких камер - тогда им управляет владелец.
+        # Без recognition поток только показывает видео (распознаёт служба gate_service.py)
+        self.owns_pipeline = pipeline is None and recognition
+        self.pipeline = pipeline
+        if self.owns_pipeline:
+            self.pipeline = RecognitionPipeline(on_error=self.error_signal.emit)
+        self.stream_id = stream_id if stream_id is not None else url
+        if self.pipeline is not None:
+            self.pipeline.add_stream(self.stream_id, self.on_pipeline_result, detector=detector)
+        self._check_lock = threading.Lock()
+
+    def request_check(self):
+        """Однократная проверка: номер распознаётся заново, даже если машина уже проверялась"""
+        self.pipeline.reset_tracks(self.stream_id)
+        self.plate_check_enabled = True
+
+    def on_pipeline_result(self, result):
+        """Обработка результата конвейера (вызывается из потока OCR)"""
+        plate = best_plate(result['plates'])
+        if plate is None:
+            return
+        with self._check_lock:
+            # Проверка могла уже завершиться по более раннему кадру;
+            # в автоматическом режиме результат передаётся без запроса
+            if not self.plate_check_enabled and self.motion_gate is None:
+                return
+            self.plate_check_enabled = False
+        # Отправляем распознанный номер
+        self.plate_detected_signal.emit(plate['text'], result)
 
     def run(self):
         """Основной метод потока, получает и обрабатывает кадры"""
         try:
-            # Инициализируем захват видео через FFMPEG
-            self.cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
-            if not self.cap.isOpened():
-                self.error_signal.emit("Ошибка: Не удалось открыть камеру")
-                return
-
-            timer = QElapsedTimer()
+            self.stream.start()
+            if self.owns_pipeline:
+                self.pipeline.start()
+            # Темп задаёт сама камера: read() ждёт следующий кадр, устаревшие пропускаются
             while self.running:
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.error_signal.emit("Ошибка чтения кадра, попытка переподключения...")
-                    self.msleep(1000)
+                frame = self.stream.read(timeout=0.5)
+                if frame is None:
                     continue
 
-                # Отправляем кадр для отображения
-                self.change_pixmap_signal.emit(frame)
-
-                # Если активирована проверка номеров
-                if self.plate_check_enabled:
-                    try:
-                        # Сохраняем временный файл для распознавания
-                        temp_file = "temp_plate.jpg"
-                        if cv2.imwrite(temp_file, frame):
-                            # Распознаем номер на изображении
-                            plate_text = detect_place(temp_file)
-                            if plate_text and plate_text != "Номер не найден или не прочитан":
-                                # Отправляем распознанный номер
-                                self.plate_detected_signal.emit(plate_text)
-                                self.plate_check_enabled = False
-                    except Exception as e:
-                        self.error_signal.emit(f"Ошибка распознавания: {str(e)}")
-
-                # Ограничение FPS (~25 кадров/сек)
-                ms_per_frame = 40
-                elapsed = timer.elapsed()
-                if elapsed < ms_per_frame:
-                    self.msleep(ms_per_frame - elapsed)
-                timer.start()
+                # Кадр для окна готовится здесь; сигнал - только если окно забрало предыдущий
+                self.latest_frame = frame
+                if self.preview.publish(frame):
+                    self.frame_ready_signal.emit()
+
+                # Если активирована проверка номеров или в кадре движение - отдаём кадр конвейеру,
+                # не дожидаясь результата
+                moving = self.motion_gate is not None and self.motion_gate.update(frame)
+                if self.pipeline is not None and (self.plate_check_enabled or moving):
+                    self.pipeline.submit(frame, stream_id=self.stream_id)
 
         except Exception as e:
             self.error_signal.emit(f"Критическая ошибка в потоке видео: {str(e)}")
         finally:
-            if self.cap:
-                self.cap.release()
+            if self.pipeline is not None:
+                self.pipeline.remove_stream(self.stream_id)
+            if self.owns_pipeline:
+                self.pipeline.stop()
+            self.stream.stop()
 
     def stop(self):
         """Остановка потока"""
@@ -86,6 +126,177 @@ class VideoThread(QThread):
         self.wait()
 
 
+class MetricsPanel(QDockWidget):
+    """Панель метрик: перцентили длительностей стадий, счётчики и показатели конвейера"""
+    def __init__(self, registry, parent=None, interval=1000):
+        super().__init__("Метрики", parent)
+        self.registry = registry
+        self.table = QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels(["Показатель", "Значение"])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.setWidget(self.table)
+
+        # Обновление по таймеру в потоке интерфейса
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        snapshot = self.registry.snapshot()
+        rows = []
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            if name.endswith('_seconds'):
+                rows.append((name[:-len('_seconds')], f"p50 {histogram['p50'] * 1000:.1f} мс, "
+                             f"p99 {histogram['p99'] * 1000:.1f} мс (n={histogram['count']})"))
+            else:
+                rows.append((name, f"p50 {histogram['p50']}, p99 {histogram['p99']} (n={histogram['count']})"))
+        rows.extend(sorted(snapshot['counters'].items()))
+        rows.extend(sorted(snapshot['gauges'].items()))
+
+        self.table.setRowCount(len(rows))
+        for i, (name, value) in enumerate(rows):
+            self.table.setItem(i, 0, QTableWidgetItem(name))
+            self.table.setItem(i, 1, QTableWidgetItem(str(value)))
+
+
+class PlateTableModel(QAbstractTableModel):
+    """
+    Записи базы для QTableView. Строки запрашиваются страницами (page_records)
+    по мере прокрутки (canFetchMore/fetchMore), поэтому открытие не зависит
+    от размера базы. Поиск и сортировка выполняются запросом к базе
+    """
+    HEADERS = ("№", "Номер", "Фамилия", "Имя", "Отчество", "Добавлен")
+    COLUMNS = (0, 1, 3, 2, 4, 5)  # Позиции полей записи (порядок RECORD_FIELDS) по столбцам таблицы
+    SORTABLE = {0: 'id', 1: 'plate_number', 2: 'last_name', 5: 'id'}  # Столбец таблицы -> сортировка в базе
+
+    def __init__(self, manager, page_size=200, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.page_size = page_size
+        self.rows = []
+        self.exhausted = False      # Все подходящие записи уже загружены
+        self.search = ''
+        self.order = 'plate_number'
+        self.descending = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self.rows[index.row()][self.COLUMNS[index.column()]]
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        page = self.manager.page_records(self.rows[-1] if self.rows else None, self.page_size,
+                                         self.search, self.order, self.descending)
+        self.exhausted = len(page) < self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column not in self.SORTABLE:
+            return  # по имени и отчеству индексов нет
+        self.order = self.SORTABLE[column]
+        self.descending = order == Qt.DescendingOrder
+        self.reset()
+
+    def set_search(self, text):
+        self.search = text.strip()
+        self.reset()
+
+    def reset(self):
+        """Сброс загруженных строк; первая страница запрашивается сразу"""
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+
+class WhitelistBrowser(QWidget):
+    """Окно просмотра базы: таблица с подгрузкой при прокрутке, поиск и сортировка по заголовку"""
+    def __init__(self, manager, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Список записей")
+        self.resize(800, 600)
+        self.manager = manager
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Поиск по началу номера или фамилии")
+        self.model = PlateTableModel(manager, parent=self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.verticalHeader().setVisible(False)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.horizontalHeader().setSortIndicator(1, Qt.AscendingOrder)
+        self.view.setSortingEnabled(True)  # вызывает model.sort - загрузка первой страницы
+        self.status_label = QLabel()
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.view)
+        layout.addWidget(self.status_label)
+
+        # Поиск после паузы в наборе, а не на каждую букву
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(lambda: self.model.set_search(self.search_edit.text()))
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        # Всего записей (с учётом поиска): COUNT(*) - один раз на новый поиск или сортировку,
+        # а не на каждую страницу прокрутки
+        self.total = None
+        self._recount = True
+        self.model.modelReset.connect(self.on_reset)
+        self.model.rowsInserted.connect(self.update_status)
+        self.on_reset()
+
+    def on_reset(self):
+        if self._recount and hasattr(self.manager, 'count_records'):
+            self.total = self.manager.count_records(self.model.search)
+        self._recount = True
+        self.update_status()
+
+    def update_status(self):
+        loaded = len(self.model.rows)
+        self.status_label.setText(f"Показано {loaded} из {self.total}" if self.total is not None
+                                  else f"Показано {loaded}")
+
+    def refresh(self, added=None):
+        """
+        Перечитать записи после изменения базы. added - +1 или -1 после добавления
+        или удаления одной записи: итог меняется на месте без подсчёта (при поиске
+        и после загрузки из файла - подсчёт заново)
+        """
+        if added is not None and self.total is not None and not self.model.search:
+            self.total = max(0, self.total + added)
+            self._recount = False
+        self.model.reset()
+
+
 class DataModificationWindow(QMainWindow, DataModificationWindowUI):
     """
     Окно для управления базой данных номеров (добавление/удаление/просмотр записей)
@@ -95,12 +306,23 @@ class DataModificationWindow(QMainWindow, DataModificationWindowUI):
         super().__init__()
         self.setupUi(self)
         self.manager = manager  # Менеджер базы данных
+        self.browser = None     # Окно просмотра записей
 
         # Связываем кнопки с методами
         self.add_button.clicked.connect(self.add_record)
         self.delete_button.clicked.connect(self.delete_record)
         self.check_list_button.clicked.connect(self.show_all_records)
 
+        # Загрузка и выгрузка списком (только с локальной базой, не через службу)
+        file_menu = self.menuBar().addMenu("Файл")
+        self.import_action = file_menu.addAction("Загрузить из CSV / JSON-строк...")
+        self.import_action.triggered.connect(self.import_records)
+        self.export_action = file_menu.addAction("Выгрузить в CSV / JSON-строки...")
+        self.export_action.triggered.connect(self.export_records)
+        local = hasattr(self.manager, 'import_records')
+        self.import_action.setEnabled(local)
+        self.export_action.setEnabled(local)
+
     def show_message(self, title, message):
         """Вспомогательный метод для показа сообщений"""
         msg = QMessageBox()
@@ -129,6 +351,8 @@ class DataModificationWindow(QMainWindow, DataModificationWindowUI):
 
         # Добавляем запись через менеджер
         success, message = self.manager.add_plate(plate_number, first_name, last_name, patronymic)
+        if success:
+            self.refresh_browser(added=1)
         self.show_message("Результат", message)
         self.lineEdit.clear()
 
@@ -141,82 +365,218 @@ class DataModificationWindow(QMainWindow, DataModificationWindowUI):
 
         plate_number = plate.split()[0]
         success, message = self.manager.delete_plate(plate_number)
+        if success:
+            self.refresh_browser(added=-1)
         self.show_message("Результат", message)
         self.lineEdit.clear()
 
-    def show_all_records(self):
-        """Показать все записи из базы данных"""
-        records = self.manager.list_all_plates()
-        if not records:
-            self.show_message("Информация", "Нет записей в базе.")
+    def import_records(self):
+        """Загрузка списка номеров из файла пачками с отчётом об ошибочных строках"""
+        path, _ = QFileDialog.getOpenFileName(self, "Загрузка номеров", "",
+                                              "CSV или JSON-строки (*.csv *.txt *.jsonl *.ndjson)")
+        if not path:
+            return
+        answer = QMessageBox.question(self, "Загрузка номеров",
+                                      "Обновлять владельцев номеров, которые уже есть в базе?",
+                                      QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.No)
+        if answer == QMessageBox.Cancel:
             return
 
-        # Форматируем записи для отображения
-        message = "Все записи в базе:\n\n"
-        for record in records:
-            full_name = f"{record[3]} {record[2]} {record[4]}" if record[4] else f"{record[3]} {record[2]}"
-            message += f"{record[0]} | {record[1]} | {full_name} | {record[5]}\n"
+        progress = QProgressDialog("Загрузка...", None, 0, 0, self)
+        progress.setWindowTitle("Загрузка номеров")
+        progress.setMinimumDuration(500)
 
-        self.show_message("Список записей", message)
+        def on_progress(report):
+            progress.setLabelText(f"Прочитано строк: {report['read']}")
+            QApplication.processEvents()
+
+        try:
+            report = import_file(self.manager, path, upsert=answer == QMessageBox.Yes, on_progress=on_progress)
+        except (OSError, UnicodeDecodeError) as e:
+            self.show_message("Ошибка", f"Не удалось прочитать файл: {e}")
+            return
+        finally:
+            progress.close()
+        self.refresh_browser()
+        self.show_message("Результат", format_report(report))
+
+    def export_records(self):
+        """Выгрузка всех записей в файл"""
+        path, _ = QFileDialog.getSaveFileName(self, "Выгрузка номеров", "plates.csv",
+                                              "CSV (*.csv);;JSON-строки (*.jsonl)")
+        if not path:
+            return
+        try:
+            count = export_file(self.manager, path)
+        except OSError as e:
+            self.show_message("Ошибка", f"Не удалось записать файл: {e}")
+            return
+        self.show_message("Результат", f"Выгружено записей: {count}")
+
+    def show_all_records(self):
+        """Показать записи базы данных в окне просмотра"""
+        if self.browser is None:
+            self.browser = WhitelistBrowser(self.manager, self)
+        self.browser.show()
+        self.browser.activateWindow()
+        self.browser.raise_()
+
+    def refresh_browser(self, added=None):
+        """Перечитать открытое окно просмотра после изменения базы (added - см. WhitelistBrowser.refresh)"""
+        if self.browser is not None and self.browser.isVisible():
+            self.browser.refresh(added)
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
     """
-    Главное окно приложения, наследуется от сгенерированного UI класса
+    Главное окно приложения, наследуется от сгенерированного UI класса.
+    С service_url в настройках окно - клиент службы gate_service.py
     """
+    verdict_signal = pyqtSignal(object)  # Вердикт службы (или None) из потока запроса
+    recognizer_signal = pyqtSignal(object)  # Окончание загрузки модели OCR (текст ошибки или None)
+
     def __init__(self):
         super().__init__()
         self.setupUi(self)  # Инициализация UI
 
         # Инициализация переменных
         self.current_frame = None      # Текущий кадр с камеры
-        self.is_processing = False     # Флаг обработки изображения
-        self.url = "http://192.168.0.109:8080/video"  # URL камеры
+        self.config = load_config()    # Настройки из config.json
+        self.camera = self.config['cameras'][0]  # Окно показывает первую камеру из списка
+        self.url = self.camera['url']  # URL камеры
         self.recognized_plate = None   # Последний распознанный номер
-
-        # Инициализация менеджеров
-        self.manager = LicensePlateManager()  # Для работы с базой данных
-        self.validator = LicensePlateValidator()  # Для валидации номеров
+        self.check_started = None      # Время нажатия кнопки проверки (time.time())
+
+        # Клиент службы: база, распознавание и проверка выполняются в gate_service.py
+        self.client = GateClient(self.config['service_url']) if self.config['service_url'] else None
+        self.whitelist = None
+        self.validator = None
+        self.reader_pool = None
+        self.pipeline = None
+        self.journal = None
+
+        if self.client is not None:
+            self.manager = self.client  # Те же методы, что у LicensePlateManager
+        else:
+            # Инициализация менеджеров
+            self.manager = LicensePlateManager(self.config['db_path'])  # Для работы с базой данных
+            # Кэш базы номеров в памяти; следует за изменениями менеджера
+            self.whitelist = WhitelistCache(self.config['db_path'], self.config['whitelist_poll_interval'])
+            self.whitelist.follow(self.manager)
+            self.validator = LicensePlateValidator(cache=self.whitelist)  # Для валидации номеров
+            self.reader_pool = get_reader_pool(size=self.config['ocr_workers'])
+            # Журнал проездов: запись в своём потоке, проверка её не ждёт
+            self.journal = AccessJournal.from_config(self.config)
+            if self.journal is not None:
+                self.journal.start()
 
         self.data_modification_window = None  # Ссылка на окно управления данными
 
-        # Настройка видеопотока
+        # Настройка видеопотока: просмотр начинается сразу, не дожидаясь модели OCR
         self.setup_video_thread()
 
+        # Модель OCR загружается один раз в фоне и разделяется всеми потоками;
+        # до окончания загрузки в строке состояния - "Загрузка модели распознавания"
+        self.recognizer_signal.connect(self.on_recognizer_ready)
+        if self.reader_pool is not None:
+            self.statusBar().showMessage("Загрузка модели распознавания...")
+            self.reader_pool.warm_up_async(on_done=self.recognizer_signal.emit)
+        else:
+            self.statusBar().showMessage(f"Распознавание выполняет служба {self.config['service_url']}")
+
+        # Метрики: показатели конвейера, пула OCR и кэша базы, выгрузка и панель в окне.
+        # В режиме клиента метрики выгружает служба
+        self.metrics = get_registry()
+        self.metrics_sinks = []
+        self.metrics_panel = None
+        if self.client is None:
+            self.metrics.add_collector(self.metrics_stats)
+            self.metrics_sinks = start_sinks(self.config, self.metrics)
+        if self.config['metrics_panel'] and self.client is None:
+            self.metrics_panel = MetricsPanel(self.metrics, self)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.metrics_panel)
+
         # Связываем кнопки с обработчиками
         self.check_button.clicked.connect(self.start_plate_recognition)
         self.database_button.clicked.connect(self.open_data_modification_window)
+        self.verdict_signal.connect(self.on_service_verdict)
 
     def setup_video_thread(self):
         """Инициализация и запуск потока обработки видео"""
-        self.thread = VideoThread(self.url)
+        if self.client is not None:
+            # Только просмотр видео; кадры для распознавания служба берёт с камеры сама
+            self.thread = VideoThread(self.url, stream_id=self.camera['name'], recognition=False,
+                                      stream=CameraStream.from_config(self.camera, self.config))
+            self.thread.frame_ready_signal.connect(self.update_image)
+            self.thread.error_signal.connect(self.log)
+            self.set_preview_size()
+            self.thread.start()
+            return
+
+        # Подготовка вырезок к OCR по настройкам preprocess_* config.py
+        recognizer = partial(recognize_plates_batch, preprocessor=PlatePreprocessor.from_config(self.config),
+                             decoder=PlateDecoder.from_config(self.config))
+        self.pipeline = RecognitionPipeline(detection_workers=self.config['detection_workers'],
+                                            ocr_workers=self.config['ocr_workers'],
+                                            ocr_queue_size=self.config['ocr_queue_size'],
+                                            recognizer=recognizer,
+                                            tracker=PlateTracker.from_config(self.config))
+        motion_gate = MotionGate.from_config(self.camera, self.config) if self.camera['mode'] == 'auto' else None
+        self.thread = VideoThread(self.url, pipeline=self.pipeline, stream_id=self.camera['name'],
+                                  motion_gate=motion_gate,
+                                  detector=PlateLocalizer.from_config(self.camera, self.config),
+                                  stream=CameraStream.from_config(self.camera, self.config))
+        # Ошибки рабочих потоков конвейера попадают в лог через сигнал, а не напрямую
+        self.pipeline.on_error = self.thread.error_signal.emit
+        self.pipeline.start()
         # Подключаем сигналы потока к методам
-        self.thread.change_pixmap_signal.connect(self.update_image)
+        self.thread.frame_ready_signal.connect(self.update_image)
         self.thread.plate_detected_signal.connect(self.on_plate_detected)
         self.thread.error_signal.connect(self.log)
+        self.set_preview_size()
         self.thread.start()
 
-    def update_image(self, frame):
-        """Обновление изображения в интерфейсе"""
-        if self.is_processing or frame is None or frame.size == 0:
-            return
+    def metrics_stats(self):
+        """Показатели для выгрузки метрик"""
+        pipeline = self.pipeline.stats()
+        pipeline.pop('streams')
+        stats = {'pipeline': pipeline, 'ocr_pool': self.reader_pool.stats(), 'whitelist': self.whitelist.stats(),
+                 'preview': self.thread.preview.stats(), 'camera': self.thread.stream.stats()}
+        if self.journal is not None:
+            stats['journal'] = self.journal.stats()
+        return stats
+
+    def on_recognizer_ready(self, error):
+        """Модель OCR загружена (или не загрузилась) - вызывается в потоке интерфейса"""
+        if error:
+            self.statusBar().showMessage("Распознавание недоступно")
+            self.log(f"Ошибка загрузки модели распознавания: {error}")
+        else:
+            self.statusBar().showMessage("Распознавание готово")
 
-        self.is_processing = True
-        self.current_frame = frame.copy()
+    def set_preview_size(self):
+        """Размер кадров предпросмотра - по текущему размеру области видео"""
+        label_size = self.video_label.size()
+        self.thread.preview.set_size(label_size.width(), label_size.height())
 
+    def update_image(self):
+        """
+        Показ последнего кадра предпросмотра. Кадр уже уменьшен до размера окна
+        и переведён в RGB в потоке видео - здесь только QImage над готовым буфером
+        """
+        self.current_frame = self.thread.latest_frame  # ссылка: кадр нужен только для проверки наличия
+        self.set_preview_size()
+        image = self.thread.preview.take()
+        if image is None:
+            return
         try:
-            # Подготавливаем изображение для отображения в Qt
-            label_size = self.video_label.size()
-            resized = cv2.resize(frame, (label_size.width(), label_size.height()))
-            rgb_image = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(qt_image))
+            h, w, ch = image.shape
+            qt_image = QImage(image.data, w, h, ch * w, QImage.Format_RGB888)
+            self.video_label.setPixmap(QPixmap.fromImage(qt_image))  # fromImage копирует - буфер можно вернуть
         except Exception as e:
             self.log(f"Ошибка обновления изображения: {str(e)}")
         finally:
-            self.is_processing = False
+            self.thread.preview.release()
 
     def start_plate_recognition(self):
         """Активация процесса распознавания номеров"""
@@ -224,23 +584,82 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.log("Ошибка: Нет доступного кадра для проверки")
             return
 
-        self.thread.plate_check_enabled = True
+        self.check_started = time.time()
+        if self.reader_pool is not None and not self.reader_pool.ready.is_set():
+            self.log("Модель распознавания ещё загружается - проверка начнётся после загрузки")
+        if self.client is not None:
+            threading.Thread(target=self.request_service_check, name="service-check", daemon=True).start()
+        else:
+            self.thread.request_check()
         self.log("Начато распознавание номерного знака...")
 
-    def on_plate_detected(self, plate_text):
+    def request_service_check(self):
+        """Запрос проверки у службы (отдельный поток); вердикт приходит через verdict_signal"""
+        try:
+            verdict = self.client.request_check(self.camera['name'], wait=self.config['repeat_timeout'])
+        except OSError as e:
+            verdict = {'error': str(e)}
+        self.verdict_signal.emit(verdict)
+
+    def on_service_verdict(self, verdict):
+        """Вердикт службы в потоке интерфейса"""
+        self.check_started = None
+        if verdict is None:
+            self.log("Номер не распознан")
+        elif 'error' in verdict:
+            self.log(f"Ошибка запроса к службе: {verdict['error']}")
+        else:
+            self.recognized_plate = verdict['input']
+            self.log(f"Распознан номер: {verdict['input']}")
+            self.show_verdict(verdict)
+
+    def on_plate_detected(self, plate_text, pipeline_result=None):
         """
         Обработка обнаруженного номерного знака
         Использует валидатор для проверки номера в базе данных
         """
         self.recognized_plate = plate_text
         self.log(f"Распознан номер: {plate_text}")
+        stats = self.pipeline.stats()
+        self.log(f"Конвейер: кадров {stats['capture']['pushed']}, вытеснено {stats['capture']['dropped']}, "
+                 f"в очереди OCR {stats['ocr']['depth']}")
+        if stats['tracking']:
+            self.log(f"Слежение: прочтений OCR {stats['tracking']['ocr_requested']}, "
+                     f"пропущено {stats['tracking']['ocr_skipped']}")
 
         # Используем валидатор для проверки номера
-        self.validator.set_camera_plate(plate_text)
-        result = self.validator.get_verdict(threshold=75)  # Порог схожести 75%
-
+        lookup_start = time.perf_counter()
+        # рамка, давшая номер: её варианты (PlateDecoder) и прочтение OCR до разбора
+        plate = best_plate(pipeline_result['plates']) if pipeline_result is not None else None
+        plate = plate or {}
+        result = self.validator.check_plate(plate_text, self.config['similarity_threshold'],
+                                            hypotheses=plate.get('hypotheses'), reading=plate.get('reading'))
+        lookup_time = time.perf_counter() - lookup_start
+
+        # Длительности стадий: от нажатия кнопки (или кадра с номером в режиме auto) до вердикта
+        if pipeline_result is not None:
+            started = self.check_started if self.check_started is not None else pipeline_result['timestamp']
+            timings = dict(pipeline_result['timings'], lookup=lookup_time, total=time.time() - started)
+            self.metrics.record_attempt(dict(
+                timings, lane=self.camera['name'], frame_id=pipeline_result['frame_id'],
+                plate=result['cleaned'], access_granted=result['access_granted']))
+            if self.journal is not None:
+                self.journal.record(result, camera=self.camera['name'], timings=timings,
+                                    confidence=plate.get('confidence'), crop=plate.get('crop'),
+                                    reading=plate.get('reading'))
+        elif self.journal is not None:
+            self.journal.record(result, camera=self.camera['name'])
+        self.check_started = None
+        self.show_verdict(result)
+
+    def show_verdict(self, result):
+        """Вывод вердикта (своего или полученного от службы) в лог и окно результата"""
         # Логируем процесс очистки номера
         self.log(f"Очищенный номер: {result['cleaned']}")
+        if self.whitelist is not None:
+            cache_stats = self.whitelist.stats()
+            self.log(f"Кэш базы: точных совпадений {cache_stats['exact_hits']} из {cache_stats['lookups']}, "
+                     f"перечитываний {cache_stats['reloads']}")
 
         if result['matches']:
             # Если найдены совпадения в базе
@@ -255,6 +674,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def show_result(self, result):
         """Отображение результата проверки в диалоговом окне"""
+        if self.camera['mode'] == 'auto':
+            # Автоматический режим работает без оператора - модальное окно не показываем
+            self.log("ПРОЕЗД РАЗРЕШЁН" if result == "Проезжает" else "ПРОЕЗД ЗАПРЕЩЁН")
+            return
+
         msg = QMessageBox()
         msg.setWindowTitle("Результат проверки")
 
@@ -331,8 +755,17 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def closeEvent(self, event):
         """Обработка закрытия главного окна"""
         self.thread.stop()  # Останавливаем поток видео
+        if self.pipeline is not None:
+            self.pipeline.stop()  # и конвейер распознавания
         self.manager.close()  # Закрываем соединение с БД
-        self.validator.close()  # Закрываем валидатор
+        if self.validator is not None:
+            self.validator.close()  # Закрываем валидатор
+        if self.whitelist is not None:
+            self.whitelist.close()  # Закрываем кэш базы
+        if self.journal is not None:
+            self.journal.close()  # Дописываем журнал проездов
+        for sink in self.metrics_sinks:
+            sink.stop()  # Останавливаем выгрузку метрик
         if self.data_modification_window is not None:
             self.data_modification_window.close()  # Закрываем окно управления данными
         event.accept()
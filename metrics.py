@@ -0,0 +1,278 @@
+import re
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Границы корзин гистограмм длительностей, с
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин для количеств (кандидатов на кадр, вырезок в пакете)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+PREFIX = 'gate_'
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами (накопительная, как в Prometheus)
+    и окном последних window значений для перцентилей
+    """
+    def __init__(self, buckets=TIME_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя - +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self, qs=(0.5, 0.9, 0.99)):
+        values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in qs}
+        return {q: values[min(len(values) - 1, int(len(values) * q))] for q in qs}
+
+
+class MetricsRegistry:
+    """
+    Счётчики, гистограммы и показатели (gauge) процесса.
+    Запись значения - захват блокировки, поиск корзины и добавление в окно,
+    поэтому замеры можно держать включёнными всегда. Сборщики (add_collector)
+    вызываются только при выгрузке и добавляют показатели из уже существующих
+    stats() (конвейер, пул OCR, кэш базы). Попытки распознавания (record_attempt)
+    дополнительно передаются подписанным приёмникам (add_sink)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self._collectors = []
+        self._sinks = []
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=TIME_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        """Замер длительности блока with в гистограмму name (секунды)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def add_collector(self, collector):
+        """collector() -> словарь (возможно вложенный) чисел, выгружаемых как gauge"""
+        self._collectors.append(collector)
+
+    def add_sink(self, sink):
+        """Приёмник попыток распознавания: объект с методом on_attempt(attempt)"""
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def record_attempt(self, attempt):
+        """
+        Попытка распознавания: словарь с длительностями стадий в секундах
+        (capture_wait, detection, ocr, lookup, total) и прочими полями.
+        Длительности попадают в гистограммы attempt_<стадия>_seconds
+        """
+        for stage in ('capture_wait', 'detection', 'ocr', 'lookup', 'total'):
+            value = attempt.get(stage)
+            if value is not None:
+                self.observe(f"attempt_{stage}_seconds", value)
+        self.inc('attempts_total')
+        for sink in list(self._sinks):
+            try:
+                sink.on_attempt(attempt)
+            except Exception as e:
+                print(f"Ошибка приёмника метрик: {e}")
+
+    def _collected(self):
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                gauges.update(flatten(collector()))
+            except Exception as e:
+                print(f"Ошибка сборщика метрик: {e}")
+        return gauges
+
+    def snapshot(self):
+        """Все значения в виде словаря (для JSON и окна статистики)"""
+        gauges = self._collected()
+        with self._lock:
+            gauges.update(self.gauges)
+            histograms = {}
+            for name, histogram in self.histograms.items():
+                p = histogram.percentiles()
+                histograms[name] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'p50': round(p[0.5], 6),
+                    'p90': round(p[0.9], 6),
+                    'p99': round(p[0.99], 6),
+                }
+            return {'counters': dict(self.counters), 'gauges': gauges, 'histograms': histograms}
+
+    def prometheus(self):
+        """Текстовый формат Prometheus"""
+        gauges = self._collected()
+        lines = []
+        with self._lock:
+            gauges.update(self.gauges)
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines.append(f"{PREFIX}{name} {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                total = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    total += count
+                    lines.append(f'{PREFIX}{name}_bucket{{le="{bound}"}} {total}')
+                lines.append(f'{PREFIX}{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{PREFIX}{name}_sum {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count {histogram.count}")
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.append(f"{PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def flatten(data, prefix=''):
+    """{'ocr': {'depth': 1}} -> {'ocr_depth': 1}; нечисловые значения пропускаются"""
+    flat = {}
+    for key, value in data.items():
+        name = re.sub(r'[^0-9A-Za-z_]', '_', f"{prefix}{key}")
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '_'))
+        elif isinstance(value, bool):
+            flat[name] = int(value)
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+class PrometheusServer:
+    """HTTP-сервер на localhost, отдающий /metrics в текстовом формате Prometheus"""
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # только если выгрузка включена
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # без вывода каждого запроса в консоль
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class JsonLinesSink:
+    """
+    Запись в файл JSON-строк: каждая попытка распознавания ({'type': 'attempt', ...})
+    и раз в interval секунд снимок всех метрик ({'type': 'snapshot', ...})
+    """
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._file = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.registry.add_sink(self)
+        if self.interval:
+            threading.Thread(target=self._snapshot_loop, name="metrics-jsonl", daemon=True).start()
+        return self
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def on_attempt(self, attempt):
+        self._write(dict(attempt, type='attempt', time=time.time()))
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.interval):
+            self._write(dict(self.registry.snapshot(), type='snapshot', time=time.time()))
+
+    def stop(self):
+        self._stop.set()
+        self.registry.remove_sink(self)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def start_sinks(config, registry=None):
+    """Запуск приёмников по настройкам config.py; возвращает список для stop()"""
+    registry = registry or get_registry()
+    sinks = []
+    if config['metrics_port']:
+        try:
+            sinks.append(PrometheusServer(registry, port=config['metrics_port']).start())
+        except OSError as e:
+            print(f"Не удалось запустить сервер метрик: {e}")
+    if config['metrics_jsonl']:
+        sinks.append(JsonLinesSink(registry, config['metrics_jsonl'], config['metrics_interval']).start())
+    return sinks
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """Общий для процесса набор метрик"""
+    return _registry
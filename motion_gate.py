@@ -0,0 +1,122 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Дешёвый детектор присутствия машины для автоматического режима.
+    Кадр (или его область roi) уменьшается до ширины scale_width, и к нему
+    применяется разность с фоном (method='diff', фон - скользящее среднее)
+    или вычитание фона MOG2 (method='mog2'). Машина считается в кадре,
+    если доля изменившихся пикселей не меньше min_area в trigger_frames
+    кадрах подряд; после этого кадры идут в распознавание ещё hold_time
+    секунд после последнего движения
+    """
+    def __init__(self, roi=None, scale_width=160, min_area=0.02, pixel_threshold=25,
+                 trigger_frames=2, hold_time=2.0, learning_rate=0.05, method='diff'):
+        self.roi = roi                      # (x, y, w, h) в долях кадра, None - весь кадр
+        self.scale_width = scale_width
+        self.min_area = min_area
+        self.pixel_threshold = pixel_threshold
+        self.trigger_frames = trigger_frames
+        self.hold_time = hold_time
+        self.learning_rate = learning_rate  # Скорость подстройки фона под освещение и стоящие машины
+        self.method = method
+
+        self._background = None             # float32 фон для method='diff'
+        self._subtractor = None             # cv2.BackgroundSubtractorMOG2 для method='mog2'
+        self._size = None                   # (ширина, высота) уменьшенного кадра
+        self._motion_frames = 0             # Кадров с движением подряд
+        self._last_motion = None            # Время последнего кадра с движением
+        self.active = False                 # Машина в кадре (кадры идут в распознавание)
+
+        # Счётчики
+        self.frames = 0
+        self.passed = 0                     # Кадров, пропущенных в распознавание
+        self.activations = 0                # Сколько раз включалось распознавание
+        self.last_ratio = 0.0               # Доля изменившихся пикселей в последнем кадре
+
+    def _roi_view(self, frame):
+        """Срез кадра по roi без копирования"""
+        if self.roi is None:
+            return frame
+        fh, fw = frame.shape[:2]
+        x, y, w, h = self.roi
+        x0, y0 = int(x * fw), int(y * fh)
+        x1, y1 = max(x0 + 1, int((x + w) * fw)), max(y0 + 1, int((y + h) * fh))
+        return frame[y0:y1, x0:x1]
+
+    def _small_gray(self, frame):
+        view = self._roi_view(frame)
+        if self._size is None:
+            h, w = view.shape[:2]
+            width = min(self.scale_width, w)
+            self._size = (width, max(1, int(round(h * width / w))))
+        # ближайший сосед: читается только каждый k-й пиксель, шум гасит размытие
+        small = cv2.resize(view, self._size, interpolation=cv2.INTER_NEAREST)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _motion_ratio(self, gray):
+        if self.method == 'mog2':
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            mask = self._subtractor.apply(gray, learningRate=self.learning_rate)
+        else:
+            if self._background is None:
+                self._background = gray.astype(np.float32)
+                return 0.0
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+            _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def update(self, frame, timestamp=None):
+        """Учёт нового кадра; True - кадр нужно передать в распознавание"""
+        now = time.monotonic() if timestamp is None else timestamp
+        self.frames += 1
+        self.last_ratio = self._motion_ratio(self._small_gray(frame))
+
+        if self.last_ratio >= self.min_area:
+            self._motion_frames += 1
+            if self._motion_frames >= self.trigger_frames:
+                if not self.active:
+                    self.activations += 1
+                self.active = True
+                self._last_motion = now
+        else:
+            self._motion_frames = 0
+            if self.active and now - self._last_motion > self.hold_time:
+                self.active = False
+
+        if self.active:
+            self.passed += 1
+        return self.active
+
+    def reset(self):
+        """Сброс фона, например после переподключения камеры"""
+        self._background = None
+        self._subtractor = None
+        self._size = None
+        self._motion_frames = 0
+        self.active = False
+
+    @classmethod
+    def from_config(cls, camera, config):
+        """Детектор для камеры в режиме auto по настройкам config.py"""
+        return cls(roi=camera.get('motion_roi'), scale_width=config['motion_scale_width'],
+                   min_area=config['motion_min_area'], trigger_frames=config['motion_trigger_frames'],
+                   hold_time=config['motion_hold_time'], method=config['motion_method'])
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'frames': self.frames,
+            'passed': self.passed,
+            'pass_rate': round(self.passed / self.frames, 3) if self.frames else 0.0,
+            'activations': self.activations,
+            'motion_ratio': round(self.last_ratio, 4),
+        }
@@ -0,0 +1,178 @@
+import threading
+import time
+import queue
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_LANGUAGES = ('ru',)
+
+
+class OCRReaderPool:
+    """
+    Пул долгоживущих экземпляров easyocr.Reader.
+    Модель загружается один раз, после чего читатели переиспользуются
+    всеми потоками (VideoThread, пакетные инструменты и т.д.)
+    """
+    def __init__(self, languages=DEFAULT_LANGUAGES, size=1, gpu=False):
+        self.languages = list(languages)
+        self.size = max(1, int(size))   # Максимальное число одновременно загруженных моделей
+        self.gpu = gpu
+        self._idle = queue.Queue()      # Свободные читатели
+        self._created = 0               # Сколько читателей уже загружено
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.ready = threading.Event()  # Хотя бы одна модель загружена - распознавание готово
+        self.load_error = None          # Ошибка фоновой загрузки (warm_up_async)
+
+        # Счётчики времени загрузки и вызовов
+        self.load_count = 0
+        self.load_time_total = 0.0
+        self.call_count = 0
+        self.call_time_total = 0.0
+        self.call_time_max = 0.0
+        self.wait_time_total = 0.0
+
+    def _create_reader(self):
+        """Загрузка одного экземпляра модели"""
+        import easyocr  # тяжёлый импорт (torch), выполняется только при первой загрузке
+
+        start = time.perf_counter()
+        reader = easyocr.Reader(self.languages, gpu=self.gpu, verbose=False)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.load_count += 1
+            self.load_time_total += elapsed
+        self.load_error = None
+        self.ready.set()
+        return reader
+
+    def _take(self):
+        """Получение свободного читателя, при необходимости загружает новый"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._create_reader()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Все модели заняты - ждём освобождения
+        return self._idle.get()
+
+    @contextmanager
+    def acquire(self):
+        """Эксклюзивный доступ к одному читателю на время блока with"""
+        start = time.perf_counter()
+        reader = self._take()
+        with self._stats_lock:
+            self.wait_time_total += time.perf_counter() - start
+        try:
+            yield reader
+        finally:
+            self._idle.put(reader)
+
+    def _timed_call(self, method, *args, **kwargs):
+        """Вызов метода читателя с учётом времени выполнения"""
+        with self.acquire() as reader:
+            start = time.perf_counter()
+            try:
+                return getattr(reader, method)(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._stats_lock:
+                    self.call_count += 1
+                    self.call_time_total += elapsed
+                    self.call_time_max = max(self.call_time_max, elapsed)
+
+    def readtext(self, image, **kwargs):
+        """Аналог easyocr.Reader.readtext с использованием пула"""
+        return self._timed_call('readtext', image, **kwargs)
+
+    def recognize(self, image, **kwargs):
+        """
+        Аналог easyocr.Reader.recognize: только распознавание в заданных
+        прямоугольниках, без прохода детектора текста
+        """
+        return self._timed_call('recognize', image, **kwargs)
+
+    def warm_up(self, count=None):
+        """
+        Предварительная загрузка моделей и пробный прогон,
+        чтобы первый реальный кадр не ждал инициализации
+        """
+        count = self.size if count is None else min(max(1, count), self.size)
+        readers = []
+        try:
+            while len(readers) < count:
+                with self._lock:
+                    if self._created >= self.size:
+                        break
+                readers.append(self._take())
+            blank = np.zeros((32, 100), dtype=np.uint8)
+            for reader in readers:
+                reader.readtext(blank)
+        finally:
+            for reader in readers:
+                self._idle.put(reader)
+
+    def warm_up_async(self, count=None, on_done=None):
+        """
+        Загрузка моделей в фоновом потоке. on_done(error) вызывается из этого
+        потока по окончании: error - None или текст ошибки (он же в load_error)
+        """
+        def run():
+            error = None
+            try:
+                self.warm_up(count)
+            except Exception as e:
+                error = self.load_error = f"{type(e).__name__}: {e}"
+                print(f"Ошибка загрузки модели OCR: {error}")
+            if on_done is not None:
+                on_done(error)
+
+        thread = threading.Thread(target=run, name="ocr-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """Снимок счётчиков пула"""
+        with self._stats_lock:
+            calls = self.call_count
+            return {
+                'ready': self.ready.is_set(),
+                'readers_loaded': self._created,
+                'readers_idle': self._idle.qsize(),
+                'pool_size': self.size,
+                'load_count': self.load_count,
+                'load_time_total_s': round(self.load_time_total, 3),
+                'calls': calls,
+                'call_time_avg_ms': round(self.call_time_total / calls * 1000, 1) if calls else 0.0,
+                'call_time_max_ms': round(self.call_time_max * 1000, 1),
+                'wait_time_total_s': round(self.wait_time_total, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_reader_pool(languages=DEFAULT_LANGUAGES, size=1, gpu=False):
+    """
+    Общий для процесса пул читателей. Параметры учитываются только
+    при первом вызове, дальше возвращается уже созданный пул
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRReaderPool(languages=languages, size=size, gpu=gpu)
+        return _pool
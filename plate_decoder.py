@@ -0,0 +1,128 @@
+"""
+Разбор прочтения OCR по грамматике номера: буква, 3 цифры, 2 буквы и код
+региона из таблицы REGION_CODES. EasyOCR отдаёт только лучшую строку и её
+уверенность, поэтому варианты символов берутся из типичных путаниц OCR
+(OCR_CONFUSIONS: О/0, В/8, А/4 ...): на месте цифры буква заменяется похожей
+цифрой и наоборот. Результат - несколько вариантов номера по убыванию оценки;
+пустой список - вырезка не похожа на номер, и проверять её по базе незачем;
+None - в прочтении символ не своего класса без похожего, варианты не строятся
+и номер проверяется нечётким поиском по самому прочтению
+"""
+import math
+
+from plate_matcher import OCR_CONFUSIONS
+from plate_normalizer import PLATE_LETTERS, DIGITS, normalize_plate
+
+# Коды регионов на номерах: двузначные 01-99 и трёхзначные дополнительные коды
+REGION_CODES = frozenset([f"{code:02d}" for code in range(1, 100)] + [
+    '102', '702', '113', '116', '716', '118', '121', '122', '123', '193', '793', '124', '125', '725',
+    '126', '134', '136', '138', '142', '147', '150', '190', '750', '790', '152', '154', '754', '155',
+    '156', '158', '159', '161', '761', '163', '763', '164', '173', '174', '774', '177', '197', '199',
+    '777', '797', '799', '977', '178', '198', '778', '180', '181', '184', '185', '186', '196',
+])
+
+# Шаблоны по длине номера: L - буква, D - цифра
+TEMPLATES = {8: 'LDDDLLDD', 9: 'LDDDLLDDD'}
+CLASSES = {'L': PLATE_LETTERS, 'D': DIGITS}
+UNKNOWN = '?'  # символ не своего класса без похожего (в вариант не подставляется)
+
+
+class PlateDecoder:
+    """
+    Варианты номера для прочтения OCR. Стоимость варианта - сумма стоимостей
+    замен символов (OCR_CONFUSIONS) и отброшенных крайних символов (trim_cost:
+    рамка или болт, прочитанные как символ). Символ не своего класса без похожего
+    стоит unknown_cost и не заменяется. Оценка = уверенность OCR * exp(-стоимость).
+    Варианты дороже max_cost и с кодом региона не из таблицы отбрасываются
+    """
+    def __init__(self, confusions=OCR_CONFUSIONS, regions=REGION_CODES, max_hypotheses=5, max_cost=1.5,
+                 trim_cost=0.5, unknown_cost=1.0):
+        self.regions = frozenset(regions)
+        self.max_hypotheses = max_hypotheses
+        self.max_cost = max_cost
+        self.trim_cost = trim_cost
+        # (прочитанный символ, класс позиции) -> [(символ номера, стоимость)] по возрастанию стоимости
+        pairs = {}
+        for (a, b), cost in confusions.items():
+            pairs.setdefault(a, []).append((b, cost))
+            pairs.setdefault(b, []).append((a, cost))
+        self.options = {}
+        for char in PLATE_LETTERS + DIGITS:
+            for kind, allowed in CLASSES.items():
+                options = [(char, 0.0)] if char in allowed else []
+                options += sorted((other, cost) for other, cost in pairs.get(char, ()) if other in allowed)
+                if not options:
+                    options = [(UNKNOWN, unknown_cost)]
+                self.options[char, kind] = sorted(options, key=lambda option: option[1])
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(regions=REGION_CODES | set(config['decode_extra_regions']),
+                   max_hypotheses=config['decode_hypotheses'], max_cost=config['decode_max_cost'])
+
+    def _spans(self, length):
+        """(начало, конец, стоимость) частей прочтения длиной 8-9 символов; отбрасываются до 2 крайних символов"""
+        spans = []
+        for start in range(3):
+            for end in range(length, length - 3, -1):
+                trimmed = start + length - end
+                if end - start in TEMPLATES and trimmed <= 2:
+                    spans.append((start, end, trimmed * self.trim_cost))
+        return spans
+
+    def _region_known(self, region):
+        if UNKNOWN not in region:
+            return region in self.regions
+        return any(region.replace(UNKNOWN, digit) in self.regions for digit in DIGITS)
+
+    def _decode_span(self, text, base_cost):
+        """
+        Варианты для строки ровно по шаблону: перебор замен по позициям. Перебор
+        ограничен только max_cost, без отсечения равных по стоимости вариантов
+        """
+        candidates = [(base_cost, '')]
+        for char, kind in zip(text, TEMPLATES[len(text)]):
+            candidates = [(cost + extra, prefix + option)
+                          for cost, prefix in candidates
+                          for option, extra in self.options[char, kind]
+                          if cost + extra <= self.max_cost]
+            if not candidates:
+                return []
+        return [(cost, plate) for cost, plate in candidates if self._region_known(plate[6:])]
+
+    def decode(self, text, confidence=1.0, normalized=False):
+        """
+        Варианты номера [{'plate', 'region', 'score', 'cost'}] по убыванию оценки;
+        пустой список - прочтение не похоже на номер, None - лучший разбор содержит
+        символ без похожего (проверять прочтение нечётким поиском). Вариантов
+        не больше max_hypotheses, кроме равных по стоимости последнему - они не
+        отсекаются, чтобы выбор между ними не зависел от алфавита
+        """
+        text = text if normalized else normalize_plate(text)
+        best = {}
+        for start, end, trim in self._spans(len(text)):
+            for cost, plate in self._decode_span(text[start:end], trim):
+                if cost < best.get(plate, math.inf):
+                    best[plate] = cost
+        ranked = sorted(best.items(), key=lambda item: (item[1], item[0]))
+        if ranked and UNKNOWN in ranked[0][0]:
+            return None
+        ranked = [(plate, cost) for plate, cost in ranked if UNKNOWN not in plate]
+        if len(ranked) > self.max_hypotheses:
+            limit = ranked[self.max_hypotheses - 1][1]
+            ranked = [(plate, cost) for plate, cost in ranked if cost <= limit]
+        confidence = max(float(confidence), 0.0)
+        return [{'plate': plate, 'region': plate[6:], 'score': round(confidence * math.exp(-cost), 4),
+                 'cost': round(cost, 3)} for plate, cost in ranked]
+
+
+def best_plate(plates):
+    """
+    Рамка результата конвейера для проверки по базе: с лучшим вариантом номера
+    (text трека - его итоговый номер), без вариантов - первая прочитанная.
+    None - ни одна рамка не прочитана
+    """
+    read = [plate for plate in plates if plate['text']]
+    if not read:
+        return None
+    return max(read, key=lambda plate: plate['hypotheses'][0]['score'] if plate.get('hypotheses') else 0.0)
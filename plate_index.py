@@ -0,0 +1,326 @@
+import threading
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# Символы нормализованного номера (LicensePlateValidator.clean_plate) и их коды
+from plate_normalizer import ALPHABET, CHAR_CODES, encode_plates
+
+MAX_WIDTH = 12          # номера длиннее хранятся отдельно и проверяются без векторного фильтра
+FREE_SLOT_LENGTH = 255  # длина свободной ячейки - не проходит ни один порог
+
+
+class PlateIndex:
+    """
+    Индекс номеров в памяти для нечёткого поиска.
+    Номера хранятся в виде матрицы кодов символов и векторов количества
+    символов алфавита. Число совпавших символов в SequenceMatcher не превышает
+    ни размер общего мультимножества символов, ни длину наибольшей общей
+    подпоследовательности, поэтому обе величины дают верхнюю оценку схожести
+    200 * M / (len1 + len2). Первая считается векторно сразу для всех номеров,
+    вторая - битово-параллельным алгоритмом для прошедших первый фильтр.
+    Оставшиеся кандидаты проверяются тем же SequenceMatcher, что и раньше,
+    так что результат совпадает с полным перебором
+    """
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self._slots = {}            # номер -> ячейка
+        self._free = []             # освободившиеся ячейки
+        self._size = 0              # число использованных ячеек (включая освободившиеся)
+        self._long_slots = set()    # ячейки с номерами длиннее MAX_WIDTH или с посторонними символами
+        self._length_counts = {}    # длина -> сколько номеров такой длины
+        self._row_ids = np.zeros(capacity, dtype=np.int64)
+        self._plates = [None] * capacity
+        self._owners = [None] * capacity
+        self._lengths = np.full(capacity, FREE_SLOT_LENGTH, dtype=np.uint8)
+        self._codes = np.zeros((capacity, MAX_WIDTH), dtype=np.uint8)
+        self._counts = np.zeros((len(ALPHABET) + 1, capacity), dtype=np.uint8)  # по строке на символ
+        self._constants = {}        # значение -> массив-константа (минимум с массивом быстрее, чем со скаляром)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, plate):
+        return plate in self._slots
+
+    def _grow(self):
+        capacity = len(self._plates) * 2
+        size = self._size
+        self._row_ids = np.resize(self._row_ids, capacity)
+        self._plates.extend([None] * (capacity - len(self._plates)))
+        self._owners.extend([None] * (capacity - len(self._owners)))
+        lengths = np.full(capacity, FREE_SLOT_LENGTH, dtype=np.uint8)
+        lengths[:size] = self._lengths[:size]
+        self._lengths = lengths
+        codes = np.zeros((capacity, MAX_WIDTH), dtype=np.uint8)
+        codes[:size] = self._codes[:size]
+        self._codes = codes
+        counts = np.zeros((len(ALPHABET) + 1, capacity), dtype=np.uint8)
+        counts[:, :size] = self._counts[:, :size]
+        self._counts = counts
+        self._constants = {}
+
+    def _constant(self, value):
+        array = self._constants.get(value)
+        if array is None:
+            array = self._constants[value] = np.full(len(self._plates), value, dtype=np.uint8)
+        return array
+
+    @staticmethod
+    def char_counts(plate):
+        """Количество каждого символа алфавита в строке (по кодам)"""
+        counts = {}
+        for c in plate:
+            code = CHAR_CODES.get(c)
+            if code is not None:
+                counts[code] = counts.get(code, 0) + 1
+        return counts
+
+    def add(self, row_id, plate, owner):
+        """Добавление или замена номера"""
+        with self._lock:
+            if plate in self._slots:
+                self.remove(plate)
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._size == len(self._plates):
+                    self._grow()
+                slot = self._size
+                self._size += 1
+
+            self._slots[plate] = slot
+            self._row_ids[slot] = row_id
+            self._plates[slot] = plate
+            self._owners[slot] = owner
+            self._lengths[slot] = min(len(plate), FREE_SLOT_LENGTH - 1)
+            self._length_counts[self._lengths[slot]] = self._length_counts.get(self._lengths[slot], 0) + 1
+            self._codes[slot] = 0
+            self._counts[:, slot] = 0
+            codes = [CHAR_CODES.get(c, 0) for c in plate]
+            if len(codes) > MAX_WIDTH or 0 in codes:
+                self._long_slots.add(slot)
+            else:
+                self._codes[slot, :len(codes)] = codes
+            for code, count in self.char_counts(plate).items():
+                self._counts[code, slot] = min(count, 255)
+
+    def remove(self, plate):
+        """Удаление номера; возвращает False, если его не было"""
+        with self._lock:
+            slot = self._slots.pop(plate, None)
+            if slot is None:
+                return False
+            self._plates[slot] = None
+            self._owners[slot] = None
+            length = self._lengths[slot]
+            self._length_counts[length] -= 1
+            if not self._length_counts[length]:
+                del self._length_counts[length]
+            self._lengths[slot] = FREE_SLOT_LENGTH
+            self._codes[slot] = 0
+            self._counts[:, slot] = 0
+            self._long_slots.discard(slot)
+            self._free.append(slot)
+            return True
+
+    def load(self, rows):
+        """
+        Полная перезагрузка из строк (id, plate_number, owner). Матрицы кодов, длин
+        и количеств символов заполняются массивами сразу для всех номеров
+        """
+        with self._lock:
+            self._reset(max(1024, len(rows)))
+            count = len(rows)
+            if not count:
+                return
+            row_ids, plates, owners = zip(*rows)
+            slots = dict(zip(plates, range(count)))
+            if len(slots) != count:
+                for row_id, plate, owner in rows:  # повторы номеров - последняя строка, как у add
+                    self.add(row_id, plate, owner)
+                return
+            codes, lengths, regular = encode_plates(plates, MAX_WIDTH)
+            self._slots = slots
+            self._size = count
+            self._row_ids[:count] = row_ids
+            self._plates[:count] = plates
+            self._owners[:count] = owners
+            self._lengths[:count] = np.minimum(lengths, FREE_SLOT_LENGTH - 1)
+            for length, number in zip(*np.unique(self._lengths[:count], return_counts=True)):
+                self._length_counts[length] = int(number)
+            self._codes[:count] = codes
+            for code in range(1, len(ALPHABET) + 1):
+                self._counts[code, :count] = np.count_nonzero(codes == code, axis=1)
+            # длинные номера и номера с посторонними символами - как в add
+            for slot in np.flatnonzero(~regular).tolist():
+                self._long_slots.add(slot)
+                for code, number in self.char_counts(plates[slot]).items():
+                    self._counts[code, slot] = min(number, 255)
+
+    @staticmethod
+    def required_common(query_length, threshold):
+        """
+        Таблица: длина номера в базе -> минимальное число совпавших символов,
+        при котором схожесть может достичь порога
+        """
+        lengths = np.arange(256)
+        required = np.ceil(threshold * (query_length + lengths) / 200.0 - 1e-9)
+        required[FREE_SLOT_LENGTH] = 255
+        return np.clip(required, 0, 255).astype(np.uint8)
+
+    def _lcs_lengths(self, plate, slots, classes=None):
+        """
+        Длины наибольшей общей подпоследовательности запроса с номерами
+        в ячейках slots (битово-параллельный алгоритм по матрице кодов).
+        classes - символ -> коды его класса, если совпадением считается
+        любой символ того же класса
+        """
+        masks = np.zeros(len(ALPHABET) + 1, dtype=np.uint64)  # код символа -> позиции в запросе
+        for i, c in enumerate(plate):
+            for code in (classes[c] if classes else (CHAR_CODES[c],)):
+                masks[code] |= np.uint64(1 << i)
+        full = np.uint64((1 << len(plate)) - 1)
+        if not len(slots):
+            return np.zeros(0, dtype=np.int64)
+        width = min(int(self._lengths[slots].max()), MAX_WIDTH)
+        columns = np.ascontiguousarray(self._codes[slots, :width].T)
+        v = np.full(len(slots), full, dtype=np.uint64)
+        u = np.empty_like(v)
+        for column in columns:
+            np.bitwise_and(v, masks[column], out=u)
+            v = ((v + u) | (v - u)) & full
+        return len(plate) - np.bitwise_count(v).astype(np.int64)
+
+    def _overlap(self, groups, n):
+        """
+        Размер пересечения мультимножеств для всех номеров сразу.
+        groups - список (коды символов группы, сколько раз группа встречается в запросе)
+        """
+        common = np.zeros(n, dtype=np.uint8)
+        part = np.empty(n, dtype=np.uint8)
+        total = np.empty(n, dtype=np.uint8)
+        for codes, count in groups:
+            np.copyto(total, self._counts[codes[0], :n])
+            for code in codes[1:]:
+                total += self._counts[code, :n]
+            np.minimum(total, self._constant(min(count, 255))[:n], out=part)
+            common += part
+        return common
+
+    def _prefilter(self, common, required):
+        """Ячейки, где пересечение не меньше требуемого для длины номера"""
+        lengths = self._lengths[:len(common)]
+        # сначала сравнение со скаляром (порог для самой короткой длины), затем точный порог по длине
+        slots = np.flatnonzero(common >= required[min(self._length_counts)])
+        return slots[common[slots] >= required[lengths[slots]]]
+
+    def _candidates(self, plate, required):
+        """Ячейки, для которых обе верхние оценки допускают достижение порога"""
+        n = self._size
+        if len(plate) >= 64 or not all(c in CHAR_CODES for c in plate):
+            # посторонние символы в запросе - оценки по алфавиту неприменимы
+            return np.arange(n)
+
+        # Оценка по мультимножеству символов для всех номеров сразу
+        groups = [([code], count) for code, count in self.char_counts(plate).items()]
+        slots = self._prefilter(self._overlap(groups, n), required)
+
+        # Оценка по наибольшей общей подпоследовательности
+        slots = slots[self._lcs_lengths(plate, slots) >= required[self._lengths[slots]]]
+        if self._long_slots:
+            slots = np.union1d(slots, np.fromiter(self._long_slots, dtype=np.int64))
+        return slots
+
+    def _weighted_matches(self, plate, threshold, matcher):
+        """
+        Взвешенное сравнение (PlateMatcher). Замены внутри класса путаемых
+        символов дешевле, все прочие операции стоят не меньше
+        matcher.min_cross_cost. Поэтому пересечение по классам и наибольшая
+        общая подпоследовательность по классам дают нижние оценки расстояния
+        и отсекают почти все номера до векторной динамики
+        """
+        n = self._size
+        if len(plate) >= 64 or not all(c in CHAR_CODES for c in plate):
+            short, long_slots = np.arange(0), np.arange(n)
+        else:
+            classes = {c: matcher.class_codes[matcher.char_class[c]] for c in plate}
+            counts = {}
+            for c in plate:
+                root = matcher.char_class[c]
+                counts[root] = counts.get(root, 0) + 1
+            groups = [(matcher.class_codes[root], count) for root, count in counts.items()]
+
+            # длина номера в базе -> сколько символов должно совпасть хотя бы по классу
+            longest = np.maximum(np.arange(256), len(plate))
+            allowed = matcher.max_distance(threshold, len(plate), np.arange(256))
+            required = np.ceil(longest - allowed / matcher.min_cross_cost - 1e-9)
+            required[FREE_SLOT_LENGTH] = 255
+            required = np.clip(required, 0, 255).astype(np.uint8)
+
+            short = self._prefilter(self._overlap(groups, n), required)
+            short = short[self._lcs_lengths(plate, short, classes) >= required[self._lengths[short]]]
+            long_slots = np.fromiter(self._long_slots, dtype=np.int64)
+            if len(long_slots):
+                short = np.setdiff1d(short, long_slots)
+
+        matched, similarities = [], []
+        if len(short):
+            lengths = self._lengths[short]
+            distances = matcher.distances(plate, self._codes[short], lengths)
+            similarity = matcher.to_similarity(distances, len(plate), lengths)
+            passed = similarity >= threshold
+            matched.extend(short[passed])
+            similarities.extend(similarity[passed])
+        for slot in long_slots:
+            db_plate = self._plates[slot]
+            if db_plate is None:
+                continue
+            similarity = matcher.similarity(plate, db_plate)
+            if similarity >= threshold:
+                matched.append(slot)
+                similarities.append(similarity)
+
+        order = np.argsort(self._row_ids[np.array(matched, dtype=np.int64)], kind='stable')
+        return [{
+            'plate': self._plates[matched[i]],
+            'similarity': round(float(similarities[i]), 1),
+            'owner': self._owners[matched[i]],
+        } for i in order]
+
+    def search(self, plate, threshold=80, matcher=None):
+        """
+        Номера со схожестью не ниже threshold (в процентах), отсортированные
+        по убыванию схожести - в том же виде, что и check_against_database.
+        Без matcher схожесть считается SequenceMatcher, как раньше
+        """
+        with self._lock:
+            if not self._slots:
+                return []
+            if matcher is not None:
+                matches = self._weighted_matches(plate, threshold, matcher)
+            else:
+                matches = self._sequence_matches(plate, threshold)
+
+        matches.sort(key=lambda x: x['similarity'], reverse=True)
+        return matches
+
+    def _sequence_matches(self, plate, threshold):
+        candidates = self._candidates(plate, self.required_common(len(plate), threshold))
+        matches = []
+        for slot in candidates[np.argsort(self._row_ids[candidates], kind='stable')]:
+            db_plate = self._plates[slot]
+            if db_plate is None:
+                continue
+            # То же выражение, что и LicensePlateValidator.calculate_similarity
+            similarity = SequenceMatcher(None, plate, db_plate).ratio() * 100
+            if similarity >= threshold:
+                matches.append({
+                    'plate': db_plate,
+                    'similarity': round(similarity, 1),
+                    'owner': self._owners[slot],
+                })
+        return matches
@@ -0,0 +1,160 @@
+import threading
+
+import cv2
+import numpy as np
+
+from plate_tracker import box_iou
+
+MIN_PLATE_WIDTH = 50    # минимальные размеры номера на кадре полного разрешения, px
+MIN_PLATE_HEIGHT = 10
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def find_candidates(gray, min_width=MIN_PLATE_WIDTH, min_height=MIN_PLATE_HEIGHT):
+    """
+    Прямоугольники (x, y, w, h), похожие на номер, на полутоновом изображении:
+    светлые области (inRange + dilate), внешние контуры с пропорциями 2:1 - 5:1
+    """
+    binary = cv2.inRange(gray, 100, 255)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    transform_img = cv2.dilate(binary, kernel, iterations=1)
+
+    regions = []
+    contours, _ = cv2.findContours(transform_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for icontour in contours:
+        x, y, w, h = cv2.boundingRect(icontour)
+        # номер обычно шире, чем высота (2:1 - 5:1)
+        if 2 < w / h < 5 and w > min_width and h > min_height:
+            regions.append((x, y, w, h))
+    return regions
+
+
+def score_plate(gray_plate):
+    """
+    Дешёвая оценка вырезки перед OCR (0..1): плотность вертикальных границ
+    и число пятен размером с символ. У настоящего номера много резких
+    вертикальных переходов и 6-9 отдельных символов
+    """
+    h, w = gray_plate.shape[:2]
+    if h < 4 or w < 8:
+        return 0.0, 0.0, 0
+    edges = cv2.convertScaleAbs(cv2.Sobel(gray_plate, cv2.CV_16S, 1, 0, ksize=3))
+    edge_density = cv2.countNonZero(cv2.threshold(edges, 80, 255, cv2.THRESH_BINARY)[1]) / float(h * w)
+
+    # символы - тёмные пятна на светлом фоне
+    _, binary = cv2.threshold(gray_plate, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights, widths = stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_WIDTH]
+    blobs = int(np.count_nonzero((heights >= 0.3 * h) & (heights <= 0.95 * h) & (widths <= 0.25 * w)))
+
+    score = 0.5 * min(edge_density / 0.25, 1.0) + 0.5 * min(blobs, 8) / 8.0
+    return score, edge_density, blobs
+
+
+class PlateLocalizer:
+    """
+    Поиск номеров в заданных областях кадра в два прохода.
+    Грубый проход ищет кандидатов на уменьшенной до coarse_width копии
+    каждой области (rois - [x, y, w, h] в долях кадра, по умолчанию весь кадр),
+    уточнение повторяет поиск в полном разрешении только вокруг найденных
+    прямоугольников. Кандидаты ранжируются score_plate, и в OCR идут
+    не больше top_k лучших с оценкой не ниже min_score.
+    Вызов localizer(frame) возвращает список (x, y, w, h), как find_plate_regions
+    """
+    def __init__(self, rois=None, coarse_width=640, top_k=3, min_score=0.0, margin=0.25):
+        self.rois = [tuple(roi) for roi in rois] if rois else [(0.0, 0.0, 1.0, 1.0)]
+        self.coarse_width = coarse_width
+        self.top_k = top_k
+        self.min_score = min_score
+        self.margin = margin        # Расширение грубого прямоугольника при уточнении, доля размера
+        self._lock = threading.Lock()
+
+        # Счётчики
+        self.frames = 0
+        self.coarse_candidates = 0  # Найдено грубым проходом
+        self.passed = 0             # Передано в OCR
+        self.time_total = 0.0
+
+    @staticmethod
+    def _roi_rect(roi, frame_shape):
+        fh, fw = frame_shape[:2]
+        x, y, w, h = roi
+        x0, y0 = max(0, int(x * fw)), max(0, int(y * fh))
+        x1, y1 = min(fw, int((x + w) * fw)), min(fh, int((y + h) * fh))
+        return x0, y0, max(x0 + 1, x1), max(y0 + 1, y1)
+
+    def _refine(self, image, box, scale):
+        """Уточнение прямоугольника грубого прохода в полном разрешении"""
+        x, y, w, h = (int(round(v / scale)) for v in box)
+        mx, my = int(w * self.margin) + 2, int(h * self.margin) + 2
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(image.shape[1], x + w + mx), min(image.shape[0], y + h + my)
+        found = [(fx + x0, fy + y0, fw, fh) for fx, fy, fw, fh in find_candidates(to_gray(image[y0:y1, x0:x1]))]
+        if not found:
+            return (x, y, w, h)
+        return max(found, key=lambda candidate: box_iou(candidate, (x, y, w, h)))
+
+    def locate(self, frame):
+        """Кандидаты с оценками: список {'box', 'score', 'edge_density', 'blobs'} по убыванию оценки"""
+        start = cv2.getTickCount()
+        boxes, coarse = [], 0
+        for roi in self.rois:
+            x0, y0, x1, y1 = self._roi_rect(roi, frame.shape)
+            image = frame[y0:y1, x0:x1]
+            scale = min(1.0, self.coarse_width / float(x1 - x0))
+            if scale < 1.0:
+                # в оттенки серого переводится только уменьшенная копия и окрестности кандидатов
+                size = (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale)))
+                small = to_gray(cv2.resize(image, size, interpolation=cv2.INTER_LINEAR))
+                found = find_candidates(small, MIN_PLATE_WIDTH * scale, MIN_PLATE_HEIGHT * scale)
+                coarse += len(found)
+                found = [self._refine(image, box, scale) for box in found]
+            else:
+                found = find_candidates(to_gray(image))
+                coarse += len(found)
+            for x, y, w, h in found:
+                box = (x + x0, y + y0, w, h)
+                # пересекающиеся области и уточнение могут дать один номер дважды
+                if all(box_iou(box, other) < 0.5 for other in boxes):
+                    boxes.append(box)
+
+        candidates = []
+        for box in boxes:
+            x, y, w, h = box
+            score, edge_density, blobs = score_plate(to_gray(frame[y + 1:y + h - 1, x + 1:x + w - 1]))
+            if score >= self.min_score:
+                candidates.append({'box': box, 'score': round(score, 3),
+                                   'edge_density': round(edge_density, 3), 'blobs': blobs})
+        candidates.sort(key=lambda candidate: candidate['score'], reverse=True)
+        candidates = candidates[:self.top_k]
+
+        elapsed = (cv2.getTickCount() - start) / cv2.getTickFrequency()
+        with self._lock:
+            self.frames += 1
+            self.coarse_candidates += coarse
+            self.passed += len(candidates)
+            self.time_total += elapsed
+        return candidates
+
+    def __call__(self, frame):
+        return [candidate['box'] for candidate in self.locate(frame)]
+
+    @classmethod
+    def from_config(cls, camera, config):
+        """Поиск номеров для камеры по настройкам config.py; None - прежний поиск по всему кадру"""
+        if not config['localizer']:
+            return None
+        return cls(rois=camera.get('rois'), coarse_width=config['localizer_coarse_width'],
+                   top_k=config['localizer_top_k'], min_score=config['localizer_min_score'])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'coarse_candidates': self.coarse_candidates,
+                'passed': self.passed,
+                'time_avg_ms': round(self.time_total / self.frames * 1000, 2) if self.frames else 0.0,
+            }
@@ -0,0 +1,164 @@
+import numpy as np
+
+from plate_normalizer import PLATE_LETTERS, DIGITS, ALPHABET, CHAR_CODES
+
+# Типичные ошибки OCR на номерах: пара символов -> стоимость замены (полная замена = 1.0)
+OCR_CONFUSIONS = {
+    ('О', '0'): 0.1,
+    ('В', '8'): 0.2,
+    ('Н', 'М'): 0.3,
+    ('А', '4'): 0.5,
+    ('Т', '7'): 0.5,
+    ('У', 'Х'): 0.5,
+    ('3', '8'): 0.4,
+    ('6', '8'): 0.4,
+    ('5', '6'): 0.5,
+    ('1', '7'): 0.5,
+}
+
+# Шаблон российского номера: L - буква серии, D - цифра номера, R - код региона (2-3 цифры)
+TEMPLATE = 'LDDDLLRRR'
+SLOT_CHARS = {'L': PLATE_LETTERS, 'D': DIGITS, 'R': DIGITS}  # Символы, допустимые на позиции шаблона
+
+SCALE = 100  # стоимости хранятся в целых сотых долях
+
+
+class PlateMatcher:
+    """
+    Взвешенное расстояние редактирования между номерами.
+    Замена символа стоит 1.0, кроме известных путаниц OCR (О/0, В/8, Н/М ...),
+    вставка и удаление - 1.0. Путаница дешёвая, только если символ номера из базы
+    подходит позиции шаблона: О вместо 0 на месте цифры - путаница, 0 вместо О
+    на месте буквы серии - полная замена. Стоимость операции умножается на вес
+    позиции номера из базы по шаблону: ошибка в коде региона весит меньше, чем
+    в серии и номере. Схожесть = (1 - расстояние / длина более длинного номера) * 100
+    """
+    def __init__(self, confusions=OCR_CONFUSIONS, region_weight=0.8, width=12):
+        self.width = width
+        self.confusions = {}
+        for (a, b), cost in confusions.items():
+            self.confusions[(a, b)] = self.confusions[(b, a)] = cost
+
+        # Позиция номера из базы по шаблону (позиции за шаблоном относятся к региону) и её вес
+        self.slots = [TEMPLATE[min(j, len(TEMPLATE) - 1)] for j in range(width)]
+        self.weights = [region_weight if slot == 'R' else 1.0 for slot in self.slots]
+
+        # Таблица стоимостей замен по кодам символов: [позиция, символ запроса, символ базы]
+        size = len(ALPHABET) + 1
+        tables = {}
+        for slot in set(self.slots):
+            table = tables[slot] = np.full((size, size), SCALE, dtype=np.int32)
+            for a, code_a in CHAR_CODES.items():
+                for b, code_b in CHAR_CODES.items():
+                    table[code_a, code_b] = round(self.substitution_cost(a, b, slot) * SCALE)
+        self.table = np.stack([np.round(tables[slot] * w).astype(np.int16)
+                               for slot, w in zip(self.slots, self.weights)])
+        self._table_rows = self.table.tolist()  # та же таблица для скалярного расчёта
+        self.indel = [round(SCALE * w) for w in self.weights]
+
+        # Классы взаимозаменяемых символов (связные компоненты графа путаниц)
+        parent = {c: c for c in ALPHABET}
+        def find(c):
+            while parent[c] != c:
+                c = parent[c]
+            return c
+        for a, b in confusions:
+            if a in parent and b in parent:
+                parent[find(a)] = find(b)
+        classes = {}
+        for c in ALPHABET:
+            classes.setdefault(find(c), []).append(CHAR_CODES[c])
+        self.char_class = {c: find(c) for c in ALPHABET}
+        self.class_codes = {root: codes for root, codes in classes.items()}
+
+        # Самая дешёвая операция, меняющая класс символа (замена между классами, вставка, удаление)
+        self.min_cross_cost = round(SCALE * min(self.weights))
+
+    def substitution_cost(self, a, b, slot=None):
+        """Замена символа запроса a символом номера из базы b на позиции шаблона slot"""
+        if a == b:
+            return 0.0
+        if slot is not None and b not in SLOT_CHARS[slot]:
+            return 1.0
+        return self.confusions.get((a, b), 1.0)
+
+    def _insert_cost(self, j):
+        """Лишний символ в запросе перед позицией j номера из базы"""
+        return self.indel[min(max(j - 1, 0), self.width - 1)]
+
+    def distance(self, plate, db_plate):
+        """Расстояние для одной пары (в сотых долях), те же стоимости, что и в distances"""
+        def delete_cost(j):
+            return self.indel[min(j, self.width - 1)]
+
+        db_codes = [CHAR_CODES.get(c, 0) for c in db_plate]
+        previous = [0]
+        for j in range(len(db_plate)):
+            previous.append(previous[-1] + delete_cost(j))
+        for q in plate:
+            code = CHAR_CODES.get(q, 0)
+            current = [previous[0] + self._insert_cost(0)]
+            for j, c in enumerate(db_plate, 1):
+                # код 0 (посторонний символ) в таблице всегда полная замена
+                substitute = 0 if q == c else self._table_rows[min(j - 1, self.width - 1)][code][db_codes[j - 1]]
+                current.append(min(
+                    previous[j - 1] + substitute,
+                    previous[j] + self._insert_cost(j),
+                    current[j - 1] + delete_cost(j - 1),
+                ))
+            previous = current
+        return previous[-1]
+
+    def similarity(self, plate, db_plate):
+        """Схожесть пары номеров в процентах"""
+        return float(self.to_similarity(self.distance(plate, db_plate), len(plate), len(db_plate)))
+
+    @staticmethod
+    def longest(length1, length2):
+        return np.maximum(np.maximum(length1, length2), 1).astype(np.int64)
+
+    @classmethod
+    def to_similarity(cls, distance, length1, length2):
+        """Перевод расстояния в схожесть, % (работает и для массивов)"""
+        return np.maximum(0.0, 1.0 - distance / (SCALE * cls.longest(length1, length2))) * 100
+
+    def max_distance(self, threshold, length1, length2):
+        """Наибольшее расстояние, при котором схожесть не ниже порога"""
+        return (1.0 - threshold / 100.0) * SCALE * self.longest(length1, length2)
+
+    def distances(self, plate, codes, lengths):
+        """
+        Расстояния от запроса до набора номеров сразу.
+        codes - матрица кодов (номер x позиция), lengths - длины номеров.
+        Для каждого символа запроса замены и вставки считаются одной операцией
+        над всеми позициями и номерами, последовательно идут только удаления
+        """
+        count = codes.shape[0]
+        if not count:
+            return np.zeros(0, dtype=np.int32)
+        width = min(codes.shape[1], self.width, int(np.max(lengths)))
+        columns = np.ascontiguousarray(codes[:, :width].T)
+        query = [CHAR_CODES.get(c, 0) for c in plate]
+        insert = np.array([self._insert_cost(j) for j in range(width + 1)], dtype=np.int16)[:, None]
+        delete = self.indel[:width]
+
+        previous = np.empty((width + 1, count), dtype=np.int16)
+        previous[0] = 0
+        for j in range(1, width + 1):
+            previous[j] = previous[j - 1] + delete[j - 1]
+        current = np.empty_like(previous)
+        step = np.empty(count, dtype=np.int16)
+
+        for q in query:
+            substitute = np.take_along_axis(self.table[:width, q], columns, axis=1)
+            # замена (диагональ) и лишний символ запроса (сверху) - для всех позиций сразу
+            np.add(previous[:-1], substitute, out=current[1:])
+            np.minimum(current[1:], previous[1:] + insert[1:], out=current[1:])
+            current[0] = previous[0] + insert[0]
+            # пропущенный символ номера (слева) зависит от соседней ячейки
+            for j in range(1, width + 1):
+                np.add(current[j - 1], delete[j - 1], out=step)
+                np.minimum(current[j], step, out=current[j])
+            previous, current = current, previous
+
+        return previous[np.minimum(lengths, width), np.arange(count)].astype(np.int32)
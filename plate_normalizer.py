@@ -0,0 +1,110 @@
+"""
+Нормализация и проверка формата номеров - общая для проверки прочтений OCR,
+загрузки базы, кэша и индекса номеров. Заглавные буквы, замена латинских букв
+того же начертания на кириллицу, З и Ч - на 3 и 4, удаление прочих символов.
+Пакет строк склеивается в одну строку, поэтому регистр, замены и удаление
+выполняются одним проходом по всему пакету; коды символов для матриц
+PlateIndex строятся одним массивом NumPy по таблице кодов
+"""
+import re
+
+import numpy as np
+
+PLATE_LETTERS = 'АВЕКМНОРСТУХ'  # Буквы российских номеров
+DIGITS = '0123456789'
+ALPHABET = PLATE_LETTERS + DIGITS  # Символы нормализованного номера
+CHAR_CODES = {c: i + 1 for i, c in enumerate(ALPHABET)}  # 0 - пустая позиция или посторонний символ
+
+# Латинские буквы того же начертания -> буквы номера; З и Ч, которых нет в номерах, -> похожие цифры
+LOOKALIKES = dict(zip('ABEKMHOPCTYX', PLATE_LETTERS), З='3', Ч='4')
+_TRANSLATE = str.maketrans(LOOKALIKES)
+_JUNK = re.compile(f"[^{ALPHABET}]+")
+_BATCH_JUNK = re.compile(f"[^{ALPHABET}\n]+")  # в пакете строки разделены переводом строки
+
+# Шаблон номера: серия (буква), номер (3 цифры), серия (2 буквы), регион (2-3 цифры)
+PLATE_RE = re.compile(f"([{PLATE_LETTERS}])([0-9]{{3}})([{PLATE_LETTERS}]{{2}})([0-9]{{2,3}})")
+
+# Код символа по его номеру Unicode (символы вне ALPHABET - 0)
+_CODE_TABLE = np.zeros(0x10000, dtype=np.uint8)
+for _char, _code in CHAR_CODES.items():
+    _CODE_TABLE[ord(_char)] = _code
+
+
+def _replace_lookalikes(text):
+    # Для длинной строки пакета str.replace на каждую замену быстрее str.translate:
+    # с кириллицей translate ищет в словаре каждый символ; для одного номера - наоборот
+    for char, replacement in LOOKALIKES.items():
+        text = text.replace(char, replacement)
+    return text
+
+
+def normalize_plate(text):
+    """Номер в виде для сравнения и поиска: только символы ALPHABET"""
+    return _JUNK.sub('', (text or '').upper().translate(_TRANSLATE))
+
+
+def normalize_plates(texts):
+    """normalize_plate для списка строк одним проходом по склеенному пакету"""
+    texts = [text or '' for text in texts]
+    joined = "\n".join(texts)
+    if joined.count("\n") != len(texts) - 1:
+        # перевод строки внутри строки пакета - разделитель не годится
+        return [normalize_plate(text) for text in texts]
+    return _BATCH_JUNK.sub('', _replace_lookalikes(joined.upper())).split("\n") if texts else []
+
+
+def _fields(plate):
+    match = PLATE_RE.fullmatch(plate)
+    if match is None:
+        return None
+    first, number, last, region = match.groups()
+    return {'plate': plate, 'series': first + last, 'number': number, 'region': region}
+
+
+def parse_plate(text):
+    """
+    Поля номера {'plate', 'series', 'number', 'region'} после нормализации
+    или None, если номер не соответствует шаблону
+    """
+    return _fields(normalize_plate(text))
+
+
+def parse_plates(texts):
+    """parse_plate для списка строк"""
+    return [_fields(plate) for plate in normalize_plates(texts)]
+
+
+def is_valid_plate(text):
+    """Соответствует ли номер (после нормализации) российскому шаблону"""
+    return PLATE_RE.fullmatch(normalize_plate(text)) is not None
+
+
+def validate_plates(texts):
+    """(нормализованные номера, признаки соответствия шаблону) для списка строк"""
+    plates = normalize_plates(texts)
+    return plates, [PLATE_RE.fullmatch(plate) is not None for plate in plates]
+
+
+def encode_plates(plates, width):
+    """
+    Коды символов номеров (CHAR_CODES) матрицей uint8 (номер x позиция, width столбцов).
+    Возвращает (коды, длины, признаки): признак False - номер длиннее width
+    или с символами не из ALPHABET, его строка кодов - нули (как в PlateIndex.add)
+    """
+    count = len(plates)
+    lengths = np.fromiter(map(len, plates), dtype=np.int64, count=count)
+    codes = np.zeros((count, width), dtype=np.uint8)
+    if not count:
+        return codes, lengths, np.zeros(0, dtype=bool)
+    # все номера - одна строка UTF-32: номера символов Unicode массивом, коды - по таблице
+    points = np.frombuffer("".join(plates).encode('utf-32-le'), dtype=np.uint32)
+    flat = np.where(points < len(_CODE_TABLE), _CODE_TABLE[np.minimum(points, len(_CODE_TABLE) - 1)], 0)
+    rows = np.repeat(np.arange(count), lengths)
+    columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    foreign = flat == 0
+    regular = lengths <= width
+    regular[rows[foreign]] = False
+    inside = columns < width
+    codes[rows[inside], columns[inside]] = flat[inside]
+    codes[~regular] = 0
+    return codes, lengths, regular
@@ -0,0 +1,134 @@
+"""
+Подготовка вырезок номеров к OCR: перевод в оттенки серого, выравнивание
+наклона, приведение к общей высоте, выравнивание контраста (CLAHE)
+и бинаризация (Otsu по каждой вырезке или адаптивная по всему пакету).
+Вырезки пакета раскладываются в столбик на общем холсте - его и получает
+модель OCR. Холст и буферы создаются один раз на поток и переиспользуются
+между кадрами; масштабирование и бинаризация пишут прямо в холст
+"""
+import threading
+
+import cv2
+import numpy as np
+
+BINARIZATION = ('otsu', 'adaptive', 'none')
+
+
+class PlatePreprocessor:
+    """
+    height - высота вырезки на холсте (высота входа модели EasyOCR),
+    max_aspect - предел отношения ширины к высоте (длиннее - сжимается по ширине).
+    Маленькие вырезки увеличиваются только до height, большие - уменьшаются
+    до неё, поэтому OCR получает вход одного размера независимо от расстояния до машины
+    """
+    def __init__(self, height=64, max_aspect=8.0, binarization='otsu', adaptive_block=31, adaptive_c=10,
+                 clahe=False, clahe_clip=2.0, deskew=True, max_skew=20.0, min_skew=0.5, gap=8):
+        if binarization not in BINARIZATION:
+            raise ValueError(f"Неизвестная бинаризация {binarization}, возможны: {', '.join(BINARIZATION)}")
+        self.height = int(height)
+        self.width = int(height * max_aspect)  # Ширина холста
+        self.binarization = binarization
+        self.adaptive_block = int(adaptive_block) | 1  # окно адаптивного порога - нечётное
+        self.adaptive_c = adaptive_c
+        self.clahe = clahe
+        self.clahe_clip = clahe_clip
+        self.deskew = deskew
+        self.max_skew = max_skew  # Больший наклон - скорее ошибка оценки, чем наклон номера, градусы
+        self.min_skew = min_skew  # Меньший наклон не исправляется, градусы
+        self.gap = gap            # Зазор между вырезками на холсте
+        self._local = threading.local()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(height=config['preprocess_height'], max_aspect=config['preprocess_max_aspect'],
+                   binarization=config['preprocess_binarization'],
+                   adaptive_block=config['preprocess_adaptive_block'], clahe=config['preprocess_clahe'],
+                   deskew=config['preprocess_deskew'])
+
+    @property
+    def step(self):
+        return self.height + self.gap
+
+    def _canvas(self, count):
+        """Холст потока на count вырезок; растёт только при большем пакете"""
+        local = self._local
+        rows = self.step * count
+        if getattr(local, 'canvas', None) is None or local.canvas.shape[0] < rows:
+            local.canvas = np.empty((rows, self.width), dtype=np.uint8)
+        canvas = local.canvas[:rows]  # строки подряд - непрерывный срез
+        canvas.fill(255)
+        return canvas
+
+    def _clahe(self):
+        local = self._local
+        if getattr(local, 'clahe', None) is None:
+            local.clahe = cv2.createCLAHE(clipLimit=self.clahe_clip, tileGridSize=(2, 8))
+        return local.clahe
+
+    def skew_angle(self, gray):
+        """
+        Наклон номера по описанному прямоугольнику минимальной площади (minAreaRect)
+        внешних контуров тёмных областей вырезки - рамки или символов.
+        0, если наклон не определён
+        """
+        _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return 0.0
+        _, (w, h), angle = cv2.minAreaRect(np.vstack(contours))
+        if min(w, h) < 2:
+            return 0.0
+        if w < h:
+            angle -= 90.0  # длинная сторона прямоугольника - вдоль номера
+        angle = (angle + 90.0) % 180.0 - 90.0
+        if abs(angle) > self.max_skew:
+            return 0.0
+        return angle
+
+    def _deskew(self, slot):
+        """Поворот вырезки на холсте на найденный наклон (на уже уменьшенной копии - дешевле)"""
+        angle = self.skew_angle(slot)
+        if abs(angle) < self.min_skew:
+            return
+        h, w = slot.shape
+        matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+        # углы заполняются цветом фона номера (медиана вырезки), а не повтором краёв с рамкой
+        slot[:] = cv2.warpAffine(slot, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=int(np.median(slot)))
+
+    def prepare_batch(self, images):
+        """
+        Холст с подготовленными вырезками и их прямоугольники [x_min, x_max, y_min, y_max]
+        в порядке images. Холст - буфер потока: действителен до следующего вызова в этом потоке
+        """
+        canvas = self._canvas(len(images))
+        boxes = []
+        for i, image in enumerate(images):
+            y = i * self.step
+            if image is None or image.size == 0 or min(image.shape[:2]) < 2:
+                boxes.append([0, 1, y, y + self.height])  # пустая вырезка - белый прямоугольник
+                continue
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            h, w = gray.shape
+            width = min(self.width, max(1, int(round(w * self.height / h))))
+            slot = canvas[y:y + self.height, :width]
+            interpolation = cv2.INTER_LINEAR if self.height > h else cv2.INTER_AREA
+            cv2.resize(gray, (width, self.height), dst=slot, interpolation=interpolation)
+            if self.deskew:
+                self._deskew(slot)
+            if self.clahe:
+                self._clahe().apply(slot, dst=slot)
+            if self.binarization == 'otsu':
+                cv2.threshold(slot, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=slot)
+            boxes.append([0, width, y, y + self.height])
+        if self.binarization == 'adaptive' and boxes:
+            # один проход по всему пакету; зазоры между вырезками белые
+            cv2.adaptiveThreshold(canvas, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                  self.adaptive_block, self.adaptive_c, dst=canvas)
+        return canvas, boxes
+
+    def prepare(self, image):
+        """Одна подготовленная вырезка (копия)"""
+        canvas, boxes = self.prepare_batch([image])
+        x_min, x_max, y_min, y_max = boxes[0]
+        return canvas[y_min:y_max, x_min:x_max].copy()
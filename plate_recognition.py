@@ -1,64 +1,116 @@
-from PIL import Image
-from PIL import ImageDraw #импорт необходимого инструментария из библиотеки PIL
-from PIL import ImageOps
 import cv2 # импорт Open CV
-import numpy as np
-import os
-import matplotlib.pyplot as plt
-from matplotlib.pyplot import hist
-from skimage.io import imread, imsave, imshow
-import easyocr
+import time
+from ocr_engine import get_reader_pool
+from metrics import get_registry
+from plate_localizer import PlateLocalizer, find_candidates
+from plate_preprocess import PlatePreprocessor
+from plate_normalizer import normalize_plates
+from plate_decoder import PlateDecoder, best_plate
+
+# поиск номеров для detect_place*: грубый проход на уменьшенном кадре, уточнение и отбор лучших
+localizer = PlateLocalizer()
+# подготовка вырезок по умолчанию; настройки config.py - PlatePreprocessor.from_config
+default_preprocessor = PlatePreprocessor()
+# разбор прочтений по грамматике номера; настройки config.py - PlateDecoder.from_config
+default_decoder = PlateDecoder()
+
+def recognize_plates_batch(plate_images, preprocessor=None, decoder=None):
+    """
+    Пакетное распознавание списка вырезок (из одного или нескольких кадров)
+    одним вызовом модели. Вырезки складываются в столбик на общем холсте,
+    а recognize получает их прямоугольники, поэтому детектор текста не запускается.
+    Возвращает список словарей {'text', 'confidence', 'reading', 'hypotheses'}
+    в порядке входных вырезок: reading - прочтение OCR после normalize_plates
+    (одним проходом на пакет), hypotheses - варианты номера (PlateDecoder.decode),
+    text - лучший вариант, само прочтение, если варианты не строились (hypotheses None),
+    или "", если вырезка не похожа на номер
+    """
+    results = [{'text': "", 'confidence': 0.0, 'reading': "", 'hypotheses': []} for _ in plate_images]
+    if not plate_images:
+        return results
+
+    preprocessor = preprocessor or default_preprocessor
+    with get_registry().timer('preprocess_batch_seconds'):
+        canvas, boxes = preprocessor.prepare_batch(plate_images)
+
+    recognized = get_reader_pool().recognize(canvas, horizontal_list=boxes, free_list=[],
+                                             batch_size=len(boxes), detail=1)
+    for bbox, text, prob in recognized:
+        # порядок результатов EasyOCR не гарантирован - сопоставляем по вертикали
+        index = int(bbox[0][1]) // preprocessor.step
+        if 0 <= index < len(results):
+            results[index] = {'text': text, 'confidence': float(prob)}
+
+    decoder = decoder or default_decoder
+    rejected = 0
+    for result, reading in zip(results, normalize_plates([result['text'] for result in results])):
+        hypotheses = decoder.decode(reading, result['confidence'], normalized=True)
+        text = reading if hypotheses is None else (hypotheses[0]['plate'] if hypotheses else "")
+        result.update(text=text, reading=reading, hypotheses=hypotheses)
+        rejected += hypotheses == []
+    # вырезки, не похожие на номер, дальше не идут - в том числе в базу
+    get_registry().inc('ocr_rejected_total', rejected)
+    return results
 
 def recognize_plate(plate_image):
     """Распознавание текста на картинке"""
-    # конвертация в оттенки серого
-    gray_plate = cv2.cvtColor(plate_image, cv2.COLOR_BGR2GRAY)
+    return recognize_plates_batch([plate_image])[0]['text']
+
+def find_plate_regions(car_img):
+    """
+    Поиск областей, похожих на номерной знак, по всему кадру в полном разрешении.
+    Возвращает список прямоугольников (x, y, w, h) в координатах кадра
+    """
+    # переводим в gray
+    gray = cv2.cvtColor(car_img, cv2.COLOR_BGR2GRAY)
+    return find_candidates(gray)
 
-    # дополнительная обработка для EasyOCR
-    _, binary_plate = cv2.threshold(gray_plate, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+def crop_plate(car_img, box):
+    """Вырезка номера по прямоугольнику - срез кадра, а не копия"""
+    x, y, w, h = box
+    return car_img[y +1: y + h-1, x+1: x + w-1]
 
-    # увеличение изображения для лучшего распознавания
-    scale_percent = 200  # увеличение на 200%
-    width = int(binary_plate.shape[1] * scale_percent / 100)
-    height = int(binary_plate.shape[0] * scale_percent / 100)
-    resized = cv2.resize(binary_plate, (width, height), interpolation=cv2.INTER_CUBIC)
+def detect_plates(car_img, detector=None):
+    """
+    Поиск и пакетное распознавание всех номеров на кадре.
+    Возвращает список {'box', 'text', 'confidence'} по каждому прямоугольнику
+    """
+    return detect_plates_batch([car_img], detector)[0]
 
-    # распознавание текста
-    reader = easyocr.Reader(['ru'])
-    string = reader.readtext(resized)
-    result = ""
-    for (bbox, text, prob) in string:
-      result = text
+def detect_plates_batch(frames, detector=None, preprocessor=None, decoder=None):
+    """
+    Распознавание кандидатов сразу с нескольких кадров одним вызовом модели.
+    detector - функция поиска номеров (по умолчанию localizer),
+    preprocessor - подготовка вырезок (по умолчанию default_preprocessor),
+    decoder - разбор прочтений (по умолчанию default_decoder).
+    Возвращает для каждого кадра список {'box', 'text', 'confidence', 'reading', 'hypotheses'}
+    """
+    detector = detector or localizer
+    boxes = [detector(frame) for frame in frames]
+    crops = [crop_plate(frame, box) for frame, frame_boxes in zip(frames, boxes) for box in frame_boxes]
+    recognized = iter(recognize_plates_batch(crops, preprocessor, decoder))
 
+    results = []
+    for frame_boxes in boxes:
+        results.append([dict(next(recognized), box=box) for box in frame_boxes])
+    return results
+
+def detect_place_frame(car_img, detector=None):
+    """
+    Распознавание номера на кадре, уже находящемся в памяти (BGR ndarray): лучший
+    вариант номера среди всех рамок кадра. Вырезки - срезы кадра без копирования
+    """
+    plate = best_plate(detect_plates(car_img, detector))
+
+    result = plate['text'] if plate is not None else "Номер не найден или не прочитан"
     return result
 
 def detect_place(image_path):
-  result = ""
+  """Обёртка над detect_place_frame для изображения на диске"""
   # 1. Загрузка изображения
   car_img = cv2.imread(image_path)
   if car_img is None:
       print("Ошибка: изображение не загружено!")
       return
 
-  # переводим в gray
-  gray = cv2.cvtColor(car_img, cv2.COLOR_BGR2GRAY)
-
-  # бинаризация + игра с шумом
-  binary = cv2.inRange(gray, 100, 255)
-  kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3,3))
-  transform_img = cv2.dilate(binary, kernel, iterations=1)
-
-  # перебираем все найденные контуры в цикле
-  contours, _ = cv2.findContours(transform_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-  for icontour in contours:
-    x, y, w, h = cv2.boundingRect(icontour)
-    aspect_ratio = w / h
-    # номер обычно шире, чем высота (2:1 - 5:1)
-    if 2 < aspect_ratio < 5 and w > 50 and h > 10:
-      number = car_img[y +1: y + h-1, x+1: x + w-1]
-      text = recognize_plate(number)
-      result += text
-
-  if result == "":
-    result = "Номер не найден или не прочитан"
-  return result
\ No newline at end of file
+  return detect_place_frame(car_img)
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Хранилище базы номеров: настройка соединений SQLite, миграции схемы
+(PRAGMA user_version) и пул соединений для чтения из рабочих потоков.
+
+Все соединения открываются в режиме WAL: чтение (проверка на въезде, окно
+просмотра) идёт из своего снимка базы и не ждёт записи, даже пакетной
+загрузки; запись ждёт другую запись не дольше BUSY_TIMEOUT_MS.
+Скомпилированные запросы кэшируются в каждом соединении по тексту SQL
+(cached_statements), поэтому тексты запросов - постоянные строки
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from plate_normalizer import normalize_plate, normalize_plates
+
+BUSY_TIMEOUT_MS = 5000      # Сколько запись ждёт другую запись, мс
+CACHED_STATEMENTS = 256     # Скомпилированных запросов в кэше соединения
+
+
+def canonical_plate(text):
+    """Номер для поиска (normalize_plate, то же, что LicensePlateValidator.clean_plate)"""
+    return normalize_plate(text)
+
+
+def _create_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS car_owners (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plate_number TEXT NOT NULL UNIQUE,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        patronymic TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _index_last_name(conn):
+    # Поиск и сортировка по фамилии (id - хвост индекса для постраничного чтения)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_car_owners_last_name ON car_owners (last_name)")
+
+
+def _add_canonical_plate(conn):
+    # Номер в виде canonical_plate для точного поиска по индексу
+    conn.execute("ALTER TABLE car_owners ADD COLUMN plate_canonical TEXT")
+    rows = conn.execute("SELECT id, plate_number FROM car_owners").fetchall()
+    conn.executemany("UPDATE car_owners SET plate_canonical = ? WHERE id = ?",
+                     [(canonical_plate(plate), row_id) for row_id, plate in rows])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_car_owners_canonical ON car_owners (plate_canonical)")
+
+
+def _normalize_canonical_plate(conn):
+    # Латинские буквы того же начертания теперь приводятся к кириллице - пересчёт plate_canonical
+    rows = conn.execute("SELECT id, plate_number, plate_canonical FROM car_owners").fetchall()
+    canonical = normalize_plates([plate for _, plate, _ in rows])
+    conn.executemany("UPDATE car_owners SET plate_canonical = ? WHERE id = ?",
+                     [(new, row_id) for (row_id, _, old), new in zip(rows, canonical) if new != old])
+
+
+# Миграции по порядку; PRAGMA user_version - число уже выполненных.
+# Новые миграции добавляются только в конец
+MIGRATIONS = (
+    _create_table,
+    _index_last_name,
+    _add_canonical_plate,
+    _normalize_canonical_plate,
+)
+
+
+def configure(conn):
+    """Настройки соединения: WAL, ожидание занятой базы, синхронизация NORMAL (безопасно в WAL)"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def migrate(conn):
+    """Выполнение недостающих миграций, каждая - в своей транзакции. Возвращает версию схемы"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # вторая копия программы ждёт, а не мигрирует параллельно
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                conn.rollback()
+                continue  # миграцию уже выполнил другой процесс
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return len(MIGRATIONS)
+
+
+_migrated = set()   # Пути баз, схема которых уже проверена в этом процессе
+_migrate_lock = threading.Lock()
+
+
+def connect(db_path, check_same_thread=True):
+    """Настроенное соединение с базой номеров; при первом открытии базы выполняются миграции"""
+    conn = configure(sqlite3.connect(db_path, check_same_thread=check_same_thread,
+                                     cached_statements=CACHED_STATEMENTS))
+    with _migrate_lock:
+        if db_path not in _migrated:
+            migrate(conn)
+            if db_path != ':memory:':
+                _migrated.add(db_path)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Соединения для чтения из любых потоков: каждое выдаётся одному потоку
+    на время блока with. Соединений не больше size; остальные потоки ждут
+    """
+    def __init__(self, db_path, size=4):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()  # последнее возвращённое - с тёплым кэшем запросов
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._take()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # соединение возвращается в пул без открытого снимка
+            self._idle.put(conn)
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return connect(self.db_path, check_same_thread=False)
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, size=4):
+    """Общий для процесса пул соединений базы db_path"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path, size)
+        return pool
@@ -0,0 +1,257 @@
+import threading
+import itertools
+
+from plate_normalizer import normalize_plate
+
+
+def box_iou(a, b):
+    """Отношение площади пересечения к площади объединения двух рамок (x, y, w, h)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def centroid_distance(a, b):
+    """Расстояние между центрами рамок в долях ширины большей из них"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2.0) - (bx + bw / 2.0)
+    dy = (ay + ah / 2.0) - (by + bh / 2.0)
+    return (dx * dx + dy * dy) ** 0.5 / max(aw, bw, 1)
+
+
+def normalize_reading(text):
+    """Текст OCR в виде номера (normalize_plate) - для посимвольного голосования"""
+    return normalize_plate(text)
+
+
+class PlateTrack:
+    """Рамка номера, прослеженная по кадрам одной камеры, и накопленные голоса OCR"""
+    def __init__(self, track_id, stream_id, box, timestamp):
+        self.track_id = track_id
+        self.stream_id = stream_id
+        self.box = box
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.frames = 1         # Кадров, в которых найдена рамка
+        self.readings = 0       # Прочтений OCR
+        self.votes = {}         # длина текста -> [{символ: суммарная уверенность} по позициям]
+        self.length_weights = {}  # длина текста -> суммарная уверенность прочтений такой длины
+        self.length_counts = {}   # длина текста -> число прочтений
+        self.hypotheses = None  # номер -> суммарная оценка вариантов PlateDecoder по прочтениям
+        self.undecoded = False  # было прочтение с текстом, которое PlateDecoder не разобрал
+        self.raw_weights = {}   # прочтение OCR до разбора -> суммарная уверенность
+        self.decision = None    # Итоговый номер, после которого OCR для трека не нужен
+        self.decided_at = None  # Время кадра, на котором трек определился
+
+    def restart(self):
+        """Сброс голосов - трек снова требует прочтений"""
+        self.readings = 0
+        self.votes, self.length_weights, self.length_counts = {}, {}, {}
+        self.hypotheses = None
+        self.undecoded = False
+        self.raw_weights = {}
+        self.decision = None
+        self.decided_at = None
+
+    def add_reading(self, text, confidence, hypotheses=None, reading=None):
+        self.readings += 1
+        if hypotheses is None:
+            self.undecoded = self.undecoded or bool(text)
+        else:
+            self.hypotheses = self.hypotheses or {}
+            for hypothesis in hypotheses:
+                plate = hypothesis['plate']
+                self.hypotheses[plate] = self.hypotheses.get(plate, 0.0) + hypothesis['score']
+        if not text:
+            return
+        weight = max(float(confidence), 0.01)  # нулевая уверенность всё же считается голосом
+        if reading:
+            self.raw_weights[reading] = self.raw_weights.get(reading, 0.0) + weight
+        positions = self.votes.setdefault(len(text), [{} for _ in text])
+        for chars, c in zip(positions, text):
+            chars[c] = chars.get(c, 0.0) + weight
+        self.length_weights[len(text)] = self.length_weights.get(len(text), 0.0) + weight
+        self.length_counts[len(text)] = self.length_counts.get(len(text), 0) + 1
+
+    def consensus(self):
+        """
+        Лучший текст по голосам: (текст, число прочтений этой длины, доля
+        голосов за самый спорный символ). Сначала выбирается длина с наибольшим
+        весом, затем по каждой позиции символ с наибольшим весом
+        """
+        if not self.length_weights:
+            return '', 0, 0.0
+        length = max(self.length_weights, key=self.length_weights.get)
+        text, agreement = [], 1.0
+        for chars in self.votes[length]:
+            c = max(chars, key=chars.get)
+            text.append(c)
+            agreement = min(agreement, chars[c] / sum(chars.values()))
+        return ''.join(text), self.length_counts[length], agreement
+
+    def ranked_hypotheses(self, limit=5):
+        """Варианты номера по сумме оценок всех прочтений трека (оценка - средняя на прочтение)"""
+        ranked = sorted(self.hypotheses.items(), key=lambda item: -item[1])[:limit]
+        return [{'plate': plate, 'region': plate[6:], 'score': round(total / self.readings, 4)}
+                for plate, total in ranked]
+
+
+class PlateTracker:
+    """
+    Слежение за рамками номеров между кадрами и голосование по прочтениям OCR.
+    Рамка нового кадра продолжает трек, если пересекается с ним (IoU)
+    или её центр сместился меньше чем на centroid_factor ширины рамки.
+    Каждое прочтение добавляет голоса за символы с весом уверенности OCR.
+    Номер считается определённым, когда есть min_votes согласных по длине
+    прочтений и за каждый символ отдано не меньше agreement голосов,
+    либо когда израсходован бюджет max_readings прочтений (тогда берётся
+    лучший вариант). После этого кадры того же трека в OCR не отправляются.
+    Через decision_ttl секунд решение сбрасывается: на месте уехавшей машины
+    могла встать следующая, а рамка осталась той же
+    """
+    def __init__(self, iou_threshold=0.3, centroid_factor=0.5, max_age=1.5,
+                 min_votes=3, agreement=0.6, max_readings=8, decision_ttl=5.0):
+        self.iou_threshold = iou_threshold
+        self.centroid_factor = centroid_factor
+        self.max_age = max_age          # Трек без рамок дольше max_age секунд забывается
+        self.min_votes = min_votes
+        self.agreement = agreement
+        self.max_readings = max_readings
+        self.decision_ttl = decision_ttl
+        self._tracks = {}               # stream_id -> список активных треков
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Счётчики
+        self.tracks_created = 0
+        self.decided = 0            # Треков с итоговым номером
+        self.decided_by_budget = 0  # из них по исчерпанию бюджета, без согласия
+        self.ocr_requested = 0      # Рамок, отправленных в OCR
+        self.ocr_skipped = 0        # Рамок уже определённых треков, OCR пропущен
+
+    def update(self, stream_id, boxes, timestamp):
+        """Сопоставление рамок кадра с треками потока; возвращает трек для каждой рамки"""
+        with self._lock:
+            tracks = [track for track in self._tracks.get(stream_id, ())
+                      if timestamp - track.last_seen <= self.max_age]
+
+            # Жадное сопоставление: сначала самые похожие пары
+            pairs = []
+            for i, box in enumerate(boxes):
+                for j, track in enumerate(tracks):
+                    iou = box_iou(box, track.box)
+                    if iou >= self.iou_threshold:
+                        pairs.append((iou, i, j))
+                    elif centroid_distance(box, track.box) <= self.centroid_factor:
+                        pairs.append((0.0, i, j))
+            pairs.sort(reverse=True)
+
+            result = [None] * len(boxes)
+            used = set()
+            for _, i, j in pairs:
+                if result[i] is not None or j in used:
+                    continue
+                used.add(j)
+                track = tracks[j]
+                track.box = boxes[i]
+                track.last_seen = timestamp
+                track.frames += 1
+                result[i] = track
+
+            for i, box in enumerate(boxes):
+                if result[i] is None:
+                    track = PlateTrack(next(self._ids), stream_id, box, timestamp)
+                    tracks.append(track)
+                    self.tracks_created += 1
+                    result[i] = track
+
+            self._tracks[stream_id] = tracks
+            for track in result:
+                if track.decision is not None and timestamp - track.decided_at > self.decision_ttl:
+                    track.restart()
+                if track.decision is None:
+                    self.ocr_requested += 1
+                else:
+                    self.ocr_skipped += 1
+            return result
+
+    @staticmethod
+    def needs_ocr(track):
+        return track.decision is None
+
+    def vote(self, track, text, confidence, hypotheses=None, reading=None):
+        """
+        Учёт прочтения OCR (и, если есть, его вариантов PlateDecoder и прочтения до разбора
+        reading). Возвращает итоговый номер (словарь, как в результатах конвейера),
+        если трек определился именно сейчас, иначе None
+        """
+        with self._lock:
+            if track.decision is not None:
+                return None  # прочтение кадра, отправленного в OCR до решения
+            track.add_reading(normalize_reading(text), confidence, hypotheses, reading)
+            plate, votes, agreement = track.consensus()
+            confirmed = bool(plate) and votes >= self.min_votes and agreement >= self.agreement
+            if not confirmed and track.readings < self.max_readings:
+                return None
+            if not confirmed and not plate:
+                track.restart()  # бюджет исчерпан, но номер ни разу не прочитан
+                return None
+
+            track.decision = {
+                'text': plate,
+                'confidence': round(agreement, 3),
+                'box': track.box,
+                'track_id': track.track_id,
+                'votes': votes,
+                'readings': track.readings,
+                'frames': track.frames,
+                'confirmed': confirmed,
+            }
+            # варианты только если разобраны все прочтения: пустой список после одного
+            # мусорного кадра означал бы отказ без проверки по базе
+            if track.hypotheses and not track.undecoded:
+                track.decision['hypotheses'] = track.ranked_hypotheses()
+            if track.raw_weights:
+                # что OCR прочитал чаще и увереннее всего - для проверки вариантов и журнала
+                track.decision['reading'] = max(track.raw_weights, key=track.raw_weights.get)
+            track.decided_at = track.last_seen
+            self.decided += 1
+            if not confirmed:
+                self.decided_by_budget += 1
+            return dict(track.decision)
+
+    def reset(self, stream_id=None):
+        """Забыть треки потока (или всех потоков), например перед новой ручной проверкой"""
+        with self._lock:
+            if stream_id is None:
+                self._tracks.clear()
+            else:
+                self._tracks.pop(stream_id, None)
+
+    @classmethod
+    def from_config(cls, config):
+        """Трекер по настройкам config.py; None, если слежение выключено"""
+        if not config['tracking']:
+            return None
+        return cls(max_age=config['track_max_age'], min_votes=config['vote_min_readings'],
+                   agreement=config['vote_agreement'], max_readings=config['vote_max_readings'],
+                   decision_ttl=config['track_decision_ttl'])
+
+    def stats(self):
+        with self._lock:
+            boxes = self.ocr_requested + self.ocr_skipped
+            return {
+                'active_tracks': sum(len(tracks) for tracks in self._tracks.values()),
+                'tracks_created': self.tracks_created,
+                'decided': self.decided,
+                'decided_by_budget': self.decided_by_budget,
+                'ocr_requested': self.ocr_requested,
+                'ocr_skipped': self.ocr_skipped,
+                'ocr_skip_rate': round(self.ocr_skipped / boxes, 3) if boxes else 0.0,
+            }
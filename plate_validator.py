@@ -1,72 +1,90 @@
 import sqlite3
-import re
-from difflib import SequenceMatcher
+
+from plate_matcher import PlateMatcher
+from plate_normalizer import normalize_plate
+from whitelist_cache import WhitelistCache
 
 class LicensePlateValidator:
-    def __init__(self, db_path='plates.db'):
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_path='plates.db', matcher=None, cache=None):
         self.camera_plate = None
+        # Взвешенное сравнение с учётом типичных ошибок OCR
+        self.matcher = matcher if matcher is not None else PlateMatcher()
+        # Кэш базы номеров; общий кэш (например, для нескольких полос) передаётся снаружи
+        self.owns_cache = cache is None
+        self.cache = cache if cache is not None else WhitelistCache(db_path)
     
     def set_camera_plate(self, plate):
         self.camera_plate = plate
     
     def clean_plate(self, raw_plate):
         """
-        Очистка номера с сохранением оригинальных символов
-        и минимальными заменами только критичных ошибок
+        Очистка номера (normalize_plate) с минимальными заменами: латинские буквы
+        того же начертания - кириллицей, З и Ч - цифрами 3 и 4.
+        Путаницы вроде О/0 и В/8 не исправляются здесь, а учитываются
+        при сравнении (PlateMatcher) с учётом позиции символа в номере
         """
-        # Удаляем все не-буквенно-цифровые символы
-        cleaned = re.sub(r'[^АВЕКМНОРСТУХ0-9]', '', raw_plate.upper())
-        
-        # Только самые необходимые замены:
-        char_map = {
-            '0': 'О', 
-            'О': '0', 
-            'З': '3',  
-            'Ч': '4',  
-        }
-        
-        return ''.join(char_map.get(c, c) for c in cleaned)
+        return normalize_plate(raw_plate)
     
     def calculate_similarity(self, plate1, plate2):
-        return SequenceMatcher(None, plate1, plate2).ratio() * 100
+        return self.matcher.similarity(plate1, plate2)
     
+    def on_database_change(self, event, record):
+        """Обработчик изменений из LicensePlateManager - поддерживает кэш актуальным"""
+        self.cache.on_database_change(event, record)
+
     def check_against_database(self, threshold=80):
-        if not self.camera_plate:
-            return []
+        return self.find_matches(self.camera_plate, threshold)
+
+    def find_matches(self, raw_plate, threshold=80):
+        """Совпадения для номера без изменения camera_plate (можно вызывать из разных потоков)"""
+        return self.match_hypotheses(raw_plate, None, threshold)[0]
+
+    def match_hypotheses(self, raw_plate, hypotheses, threshold=80, reading=None):
+        """
+        Совпадения для номера и его вариантов PlateDecoder: (совпадения, номер
+        для вердикта - вариант с точным совпадением или сам номер). reading -
+        прочтение OCR до разбора: варианты сравниваются с ним, нечёткий поиск
+        идёт по нему. hypotheses=None - только сам номер; пустой список -
+        прочтение не похоже на номер, и база не проверяется
+        """
+        if not raw_plate:
+            return [], None
         
-        cleaned_plate = self.clean_plate(self.camera_plate)
+        cleaned_plate = self.clean_plate(raw_plate)
+        if hypotheses == []:
+            return [], cleaned_plate
+        reading = self.clean_plate(reading) if reading else ""
+        variants = [reading] if reading else []
+        for plate in [cleaned_plate] + [hypothesis['plate'] for hypothesis in hypotheses or ()]:
+            if plate not in variants:
+                variants.append(plate)
         
         try:
-            self.cursor.execute("SELECT plate_number, first_name, last_name, patronymic FROM car_owners")
-            all_plates = self.cursor.fetchall()
-            
-            matches = []
-            for db_plate, first_name, last_name, patronymic in all_plates:
-                similarity = self.calculate_similarity(cleaned_plate, db_plate)
-                if similarity >= threshold:
-                    matches.append({
-                        'plate': db_plate,
-                        'similarity': round(similarity, 1),
-                        'owner': f"{last_name} {first_name} {patronymic or ''}".strip()
-                    })
-            
-            matches.sort(key=lambda x: x['similarity'], reverse=True)
-            return matches
+            # Сначала точное совпадение любого варианта в кэше, затем нечёткий поиск по индексу
+            matches, exact_plate = self.cache.search_any(variants, threshold, self.matcher)
+            return matches, exact_plate or cleaned_plate
             
         except sqlite3.Error:
-            return []
+            return [], cleaned_plate
     
     def get_verdict(self, threshold=80):
-        matches = self.check_against_database(threshold)
+        return self.check_plate(self.camera_plate, threshold)
+
+    def check_plate(self, raw_plate, threshold=80, hypotheses=None, reading=None):
+        """
+        Вердикт для номера, как get_verdict, но без состояния валидатора.
+        hypotheses - варианты номера (PlateDecoder), reading - прочтение OCR до разбора;
+        cleaned - вариант, давший точное совпадение
+        """
+        matches, cleaned = self.match_hypotheses(raw_plate, hypotheses, threshold, reading)
         
         return {
-            'input': self.camera_plate,
-            'cleaned': self.clean_plate(self.camera_plate) if self.camera_plate else None,
+            'input': raw_plate,
+            'cleaned': cleaned,
             'matches': matches,
             'access_granted': len(matches) > 0
         }
     
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        if self.owns_cache:
+            self.cache.close()
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Кадры предпросмотра для окна: масштабирование до размера окна и перевод в RGB
+выполняются в потоке захвата, окну остаётся только показать готовый кадр
+"""
+import threading
+
+import cv2
+import numpy as np
+
+
+class PreviewBuffer:
+    """
+    Тройная буферизация кадров предпросмотра: захват пишет в свободный буфер,
+    окно читает последний опубликованный. Если окно не успело забрать кадр,
+    он заменяется новым - очередь сигналов не растёт, показывается только
+    последний кадр. Буферы создаются заново только при смене размера окна
+    """
+    def __init__(self, interpolation=cv2.INTER_LINEAR):
+        self.interpolation = interpolation
+        self._lock = threading.Lock()
+        self._requested = None  # Размер окна (ширина, высота), задаётся из потока интерфейса
+        self._size = None       # Размер текущих буферов
+        self._buffers = []
+        self._scaled = None     # Уменьшенный кадр BGR перед переводом в RGB
+        self._latest = None     # Индекс опубликованного буфера
+        self._reading = None    # Индекс буфера, который сейчас показывает окно
+        self._pending = False   # Опубликованный кадр ещё не забран окном
+        self.published = 0
+        self.replaced = 0       # Кадров, заменённых следующим до показа
+
+    def set_size(self, width, height):
+        """Размер области показа; вызывается из потока интерфейса"""
+        self._requested = (int(width), int(height))
+
+    def _allocate(self, size):
+        width, height = size
+        with self._lock:
+            self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(3)]
+            self._scaled = np.empty((height, width, 3), dtype=np.uint8)
+            self._latest = None
+            self._reading = None
+            self._pending = False
+            self._size = size
+
+    def publish(self, frame):
+        """
+        Подготовка кадра (поток захвата). True - окно нужно уведомить:
+        предыдущий кадр уже забран, иначе окно и так заберёт этот
+        """
+        size = self._requested
+        if size is None or size[0] < 1 or size[1] < 1 or frame is None or frame.size == 0:
+            return False
+        if size != self._size:
+            self._allocate(size)  # буферы пересоздаёт только поток захвата
+        with self._lock:
+            index = next(i for i in range(3) if i != self._latest and i != self._reading)
+        buffer = self._buffers[index]
+        cv2.resize(frame, size, dst=self._scaled, interpolation=self.interpolation)
+        cv2.cvtColor(self._scaled, cv2.COLOR_BGR2RGB, dst=buffer)
+        with self._lock:
+            notify = not self._pending
+            if self._pending:
+                self.replaced += 1
+            self._latest = index
+            self._pending = True
+            self.published += 1
+            return notify
+
+    def take(self):
+        """Последний кадр (RGB) для показа или None; после показа - release()"""
+        with self._lock:
+            if not self._pending:
+                return None
+            self._pending = False
+            self._reading = self._latest
+            return self._buffers[self._reading]
+
+    def release(self):
+        with self._lock:
+            self._reading = None
+
+    def stats(self):
+        with self._lock:
+            return {'published': self.published, 'replaced': self.replaced}
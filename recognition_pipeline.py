@@ -0,0 +1,309 @@
+import threading
+import time
+import queue
+import itertools
+from collections import deque
+
+from plate_recognition import find_plate_regions, crop_plate, recognize_plates_batch
+from metrics import get_registry, COUNT_BUCKETS
+
+
+class FairFrameScheduler:
+    """
+    Кольцевые буферы последних кадров для нескольких видеопотоков с общим ожиданием.
+    При переполнении вытесняется самый старый кадр, поэтому захват никогда
+    не блокируется. Кадры выдаются по кругу: каждый поток получает свою очередь обработки,
+    и одна загруженная камера не может вытеснить остальные
+    """
+    def __init__(self, capacity=1):
+        self.capacity = max(1, int(capacity))
+        self._buffers = {}          # stream_id -> deque последних кадров
+        self._order = deque()       # Порядок обхода потоков
+        self._counters = {}         # stream_id -> {'pushed', 'dropped'}
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, stream_id, item):
+        """Добавление кадра потока без ожидания; при переполнении вытесняется старый"""
+        with self._cond:
+            buffer = self._buffers.get(stream_id)
+            if buffer is None:
+                buffer = self._buffers[stream_id] = deque(maxlen=self.capacity)
+                self._counters[stream_id] = {'pushed': 0, 'dropped': 0}
+                self._order.append(stream_id)
+            counters = self._counters[stream_id]
+            if len(buffer) == self.capacity:
+                counters['dropped'] += 1
+            buffer.append(item)
+            counters['pushed'] += 1
+            self._cond.notify()
+
+    def _pop_next(self):
+        for _ in range(len(self._order)):
+            stream_id = self._order[0]
+            self._order.rotate(-1)  # следующий вызов начнёт со следующего потока
+            buffer = self._buffers[stream_id]
+            if buffer:
+                return buffer.popleft()
+        return None
+
+    def get(self, timeout=None):
+        """Кадр следующего по кругу потока, None по таймауту или после close()"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or any(self._buffers.values()), timeout):
+                return None
+            return self._pop_next()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(buffer) for buffer in self._buffers.values())
+
+    def stream_stats(self):
+        """Счётчики и глубина буфера по каждому потоку"""
+        with self._cond:
+            return {stream_id: dict(counters, depth=len(self._buffers[stream_id]))
+                    for stream_id, counters in self._counters.items()}
+
+
+class StageStats:
+    """Счётчики одной стадии конвейера"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0      # Обработано элементов
+        self.dropped = 0        # Отброшено элементов
+        self.errors = 0         # Исключений в обработчике
+        self.busy_time = 0.0    # Суммарное время работы, с
+        self.blocked_time = 0.0 # Время ожидания места в следующей очереди, с
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'busy_time_s': round(self.busy_time, 3),
+                'blocked_time_s': round(self.blocked_time, 3),
+            }
+
+
+class RecognitionPipeline:
+    """
+    Конвейер распознавания из трёх стадий:
+    захват (буферы последних кадров по камерам) -> поиск номеров -> OCR.
+    Стадии связаны ограниченными очередями; поиск номеров ждёт, пока OCR
+    освободит место (обратное давление), а лишние кадры вытесняются на входе.
+    Один конвейер может обслуживать несколько камер: кадры каждой камеры
+    хранятся отдельно и выбираются по кругу, а модели OCR общие.
+    Результаты передаются в обработчик потока (add_stream) или в on_result
+    из потока OCR.
+    С tracker (PlateTracker) рамки прослеживаются между кадрами, прочтения
+    одного номера накапливаются голосованием, и результат передаётся один раз
+    на трек - когда номер определился; рамки определённых треков в OCR не идут.
+    Длительности стадий пишутся в metrics и в item['timings'] каждого результата
+    """
+    def __init__(self, on_result=None, on_error=None, detection_workers=1, ocr_workers=1,
+                 frame_buffer_size=1, ocr_queue_size=4, max_batch_frames=4,
+                 detector=find_plate_regions, recognizer=recognize_plates_batch, tracker=None,
+                 metrics=None):
+        self.on_result = on_result
+        self.on_error = on_error
+        self.detection_workers = max(1, int(detection_workers))
+        self.ocr_workers = max(1, int(ocr_workers))
+        self.max_batch_frames = max(1, int(max_batch_frames))
+        self.detector = detector
+        self.recognizer = recognizer
+        self.tracker = tracker
+        self.metrics = metrics if metrics is not None else get_registry()
+
+        self.frames = FairFrameScheduler(frame_buffer_size)
+        self._handlers = {}     # stream_id -> обработчик результатов
+        self._detectors = {}    # stream_id -> свой поиск номеров (например, PlateLocalizer с областями камеры)
+        self.ocr_queue = queue.Queue(maxsize=max(1, int(ocr_queue_size)))
+        self.detection_stats = StageStats()
+        self.ocr_stats = StageStats()
+
+        self._frame_ids = itertools.count(1)
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        """Запуск рабочих потоков"""
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.detection_workers):
+            self._spawn(self._detection_loop, f"plate-detect-{i}")
+        for i in range(self.ocr_workers):
+            self._spawn(self._ocr_loop, f"plate-ocr-{i}")
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def add_stream(self, stream_id, on_result, detector=None):
+        """Регистрация обработчика результатов (и, если нужно, поиска номеров) для отдельной камеры"""
+        self._handlers[stream_id] = on_result
+        if detector is not None:
+            self._detectors[stream_id] = detector
+
+    def remove_stream(self, stream_id):
+        self._handlers.pop(stream_id, None)
+        self._detectors.pop(stream_id, None)
+        self.reset_tracks(stream_id)
+
+    def reset_tracks(self, stream_id=None):
+        """Сброс треков потока: следующая проверка распознаёт номер заново"""
+        if self.tracker is not None:
+            self.tracker.reset(stream_id)
+
+    def submit(self, frame, stream_id=None):
+        """Передача кадра в конвейер; никогда не блокирует поток захвата"""
+        self.frames.put(stream_id, {'frame_id': next(self._frame_ids), 'stream_id': stream_id,
+                                    'timestamp': time.time(), 'frame': frame})
+
+    def _report_error(self, message):
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def _detection_loop(self):
+        """Стадия поиска областей номеров"""
+        while self._running:
+            item = self.frames.get(timeout=0.2)
+            if item is None:
+                continue
+
+            start = time.perf_counter()
+            capture_wait = time.time() - item['timestamp']
+            try:
+                frame = item.pop('frame')
+                boxes = self._detectors.get(item['stream_id'], self.detector)(frame)
+                if self.tracker is not None:
+                    # Рамки уже определённых треков не распознаются повторно
+                    tracks = self.tracker.update(item['stream_id'], boxes, item['timestamp'])
+                    pending = [(box, track) for box, track in zip(boxes, tracks)
+                               if self.tracker.needs_ocr(track)]
+                    boxes = [box for box, _ in pending]
+                    item['tracks'] = [track for _, track in pending]
+                item['boxes'] = boxes
+                item['crops'] = [crop_plate(frame, box) for box in boxes]
+            except Exception as e:
+                self.detection_stats.add(errors=1)
+                self._report_error(f"Ошибка поиска номера: {str(e)}")
+                continue
+            detection_time = time.perf_counter() - start
+            self.detection_stats.add(processed=1, busy_time=detection_time)
+            item['timings'] = {'capture_wait': capture_wait, 'detection': detection_time}
+            self.metrics.observe('capture_wait_seconds', capture_wait)
+            self.metrics.observe('detection_seconds', detection_time)
+            self.metrics.observe('candidates_per_frame', len(boxes), COUNT_BUCKETS)
+
+            if not boxes:
+                continue
+
+            # Ждём места в очереди OCR (обратное давление)
+            wait_start = time.perf_counter()
+            while self._running:
+                try:
+                    self.ocr_queue.put(item, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                self.detection_stats.add(dropped=1)
+                self.metrics.inc('frames_dropped_total')
+            self.detection_stats.add(blocked_time=time.perf_counter() - wait_start)
+
+    def _ocr_loop(self):
+        """Стадия распознавания: забирает из очереди сразу несколько кадров и распознаёт их одним пакетом"""
+        while self._running:
+            try:
+                batch = [self.ocr_queue.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.max_batch_frames:
+                try:
+                    batch.append(self.ocr_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            try:
+                item_crops = [item.pop('crops') for item in batch]
+                crops = [crop for frame_crops in item_crops for crop in frame_crops]
+                recognized = iter(self.recognizer(crops))
+            except Exception as e:
+                self.ocr_stats.add(errors=1, dropped=len(batch))
+                self.metrics.inc('ocr_errors_total')
+                self._report_error(f"Ошибка распознавания: {str(e)}")
+                continue
+            ocr_time = time.perf_counter() - start
+            self.ocr_stats.add(processed=len(batch), busy_time=ocr_time)
+            self.metrics.observe('ocr_batch_seconds', ocr_time)
+            self.metrics.observe('ocr_batch_crops', len(crops), COUNT_BUCKETS)
+            self.metrics.inc('ocr_calls_total')
+            self.metrics.inc('ocr_crops_total', len(crops))
+
+            for item, frame_crops in zip(batch, item_crops):
+                boxes = item.pop('boxes')
+                item['timings']['ocr'] = ocr_time
+                # crop - вырезка номера (срез кадра) для журнала проездов
+                item['plates'] = [dict(next(recognized), box=box, crop=crop)
+                                  for box, crop in zip(boxes, frame_crops)]
+                if self.tracker is not None:
+                    # Вместо отдельных прочтений - номера треков, определившихся на этом кадре
+                    decided = [(self.tracker.vote(track, plate['text'], plate['confidence'],
+                                                  plate.get('hypotheses'), plate.get('reading')), plate['crop'])
+                               for track, plate in zip(item.pop('tracks'), item['plates'])]
+                    item['plates'] = [dict(plate, crop=crop) for plate, crop in decided if plate is not None]
+                    if not item['plates']:
+                        continue
+                handler = self._handlers.get(item['stream_id'], self.on_result)
+                if handler is None:
+                    continue
+                try:
+                    handler(item)
+                except Exception as e:
+                    self._report_error(f"Ошибка обработки результата: {str(e)}")
+
+    def stop(self, timeout=2.0):
+        """Остановка потоков; необработанные кадры отбрасываются"""
+        self._running = False
+        self.frames.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+        dropped = 0
+        while True:
+            try:
+                self.ocr_queue.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                break
+        self.ocr_stats.add(dropped=dropped)
+
+    def stats(self):
+        """Глубина очередей и счётчики по каждой стадии"""
+        streams = self.frames.stream_stats()
+        return {
+            'capture': {
+                'depth': sum(stream['depth'] for stream in streams.values()),
+                'pushed': sum(stream['pushed'] for stream in streams.values()),
+                'dropped': sum(stream['dropped'] for stream in streams.values()),
+            },
+            'streams': streams,
+            'detection': dict(self.detection_stats.snapshot(), depth=len(self.frames)),
+            'ocr': dict(self.ocr_stats.snapshot(), depth=self.ocr_queue.qsize()),
+            'tracking': self.tracker.stats() if self.tracker is not None else None,
+        }
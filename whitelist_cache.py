@@ -0,0 +1,230 @@
+import threading
+import time
+from difflib import SequenceMatcher
+
+from plate_index import PlateIndex
+from plate_storage import connect, get_pool, canonical_plate
+from metrics import get_registry
+
+
+def format_owner(first_name, last_name, patronymic):
+    return f"{last_name} {first_name} {patronymic or ''}".strip()
+
+
+class WhitelistCache:
+    """
+    Копия таблицы car_owners в памяти: словарь для точного совпадения номера
+    и PlateIndex для нечёткого поиска. Изменения из этого процесса приходят
+    от LicensePlateManager (follow) и применяются к кэшу по одной записи.
+    Изменения из других процессов видны по PRAGMA data_version, который
+    опрашивается не чаще раза в poll_interval секунд - через соединение менеджера,
+    если кэш за ним следует (его собственная запись счётчик не меняет); при смене кэш
+    перечитывается целиком в фоновом потоке, а проверки до конца перечитывания
+    отвечают по прежней копии. Между опросами проверки не обращаются к SQLite
+    """
+    def __init__(self, db_path='plates.db', poll_interval=1.0):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        # Своё соединение (data_version считается для соединения), из разных потоков - только под self._lock.
+        # В режиме WAL чтение таблицы не ждёт пакетной записи из окна управления базой
+        self.conn = connect(db_path, check_same_thread=False)
+        self.cursor = self.conn.cursor()
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()  # Одно перечитывание за раз
+        self._reloading = False                # Запущено фоновое перечитывание
+
+        self.exact = {}         # номер (canonical_plate) -> совпадение в виде элемента результата search
+        self.index = None       # PlateIndex, строится при первой проверке
+        self.version = None     # PRAGMA data_version, которому соответствует кэш
+        self.source = None      # LicensePlateManager, через соединение которого опрашивается data_version
+        self._last_poll = 0.0   # Время последнего опроса data_version
+
+        # Счётчики
+        self.exact_hits = 0     # Ответ из словаря точных совпадений
+        self.fuzzy_hits = 0     # Найдено нечётким поиском
+        self.misses = 0         # Совпадений нет
+        self.reloads = 0        # Полных чтений таблицы
+        self.updates = 0        # Изменений, применённых без перечитывания
+        self.version_checks = 0 # Запросов PRAGMA data_version
+        self.metrics = get_registry()
+
+    def __len__(self):
+        return len(self.exact)
+
+    def data_version(self, wait=True):
+        """
+        Счётчик SQLite, меняющийся при commit из других соединений и процессов.
+        None - соединение менеджера занято записью, а wait=False
+        """
+        self.version_checks += 1
+        if self.source is not None:
+            version = self.source.data_version(wait)
+        else:
+            with self._lock:
+                self.cursor.execute("PRAGMA data_version")
+                version = self.cursor.fetchone()[0]
+        if version is not None:  # запрос не выполнялся, если соединение было занято
+            self.metrics.inc('db_queries_total')
+        return version
+
+    def follow(self, manager):
+        """
+        Следовать за изменениями LicensePlateManager этого процесса. Счётчик
+        соединения менеджера не меняется от его собственных commit, поэтому
+        запись из другого процесса, попавшая между записью менеджера и её
+        применением к кэшу, не теряется: она меняет счётчик, и кэш перечитывается
+        """
+        with self._lock:
+            self.source = manager
+            self.version = None  # счётчик другого соединения - сверить заново при следующей проверке
+        manager.add_listener(self.on_database_change)
+
+    def reload(self):
+        """
+        Полное чтение таблицы. Чтение (через пул соединений) и построение индекса
+        идут без блокировки кэша - проверки в это время отвечают по прежней копии
+        """
+        with self._reload_lock:
+            try:
+                with self._lock:
+                    updates = self.updates
+                # до чтения: более поздние изменения вызовут новое перечитывание
+                version = self.data_version()
+                with get_pool(self.db_path).connection() as conn:
+                    fetched = conn.execute("SELECT id, plate_number, plate_canonical, first_name, last_name, "
+                                           "patronymic FROM car_owners").fetchall()
+                self.metrics.inc('db_queries_total')  # само чтение; проверка версии учтена в data_version
+                rows, exact = [], {}
+                for row_id, plate, canonical, first_name, last_name, patronymic in fetched:
+                    owner = format_owner(first_name, last_name, patronymic)
+                    rows.append((row_id, plate, owner))
+                    exact[canonical or canonical_plate(plate)] = {'plate': plate, 'similarity': 100.0, 'owner': owner}
+                index = PlateIndex()
+                index.load(rows)
+                with self._lock:
+                    self.index = index
+                    self.exact = exact
+                    # изменения менеджера во время чтения в копию могли не попасть - перечитать ещё раз
+                    self.version = version if self.updates == updates else None
+                    self._last_poll = time.monotonic()
+                    self.reloads += 1
+            finally:
+                self._reloading = False
+
+    def refresh(self, force=False):
+        """
+        Проверка изменений из других процессов (не чаще poll_interval).
+        Первая загрузка и force - с ожиданием, остальные перечитывания - в фоне
+        """
+        with self._lock:
+            if self.index is not None:
+                now = time.monotonic()
+                if not force and now - self._last_poll < self.poll_interval:
+                    return
+                self._last_poll = now
+                if not force and self.version is not None:
+                    # менеджер посреди записи - сверка при следующем опросе, проверки не ждут
+                    current = self.data_version(wait=False)
+                    if current is None or current == self.version:
+                        return
+                if not force:
+                    if not self._reloading:
+                        self._reloading = True
+                        threading.Thread(target=self.reload, name="whitelist-reload", daemon=True).start()
+                    return
+        self.reload()
+
+    def on_database_change(self, event, record):
+        """
+        Обработчик изменений из LicensePlateManager - обновляет кэш без перечитывания.
+        Версия кэша не меняется: при follow запись менеджера счётчик не двигает, а без
+        follow её commit виден как чужой, и кэш перечитывается при следующем опросе
+        """
+        with self._lock:
+            if self.index is None:
+                return
+            if event not in ('add', 'delete'):
+                # пакетная загрузка или неизвестное изменение - перечитать при следующей проверке
+                self.version = None
+                self._last_poll = 0.0
+                return
+            plate = record['plate_number']
+            if event == 'add':
+                owner = format_owner(record['first_name'], record['last_name'], record['patronymic'])
+                self.index.add(record['id'], plate, owner)
+                self.exact[canonical_plate(plate)] = {'plate': plate, 'similarity': 100.0, 'owner': owner}
+            else:
+                self.index.remove(plate)
+                self.exact.pop(canonical_plate(plate), None)
+            self.updates += 1
+
+    def lookup(self, plate):
+        """Точное совпадение номера или None"""
+        self.refresh()
+        with self._lock:
+            match = self.exact.get(plate)
+            return dict(match) if match else None
+
+    def search(self, plate, threshold=80, matcher=None):
+        """
+        Совпадения в формате check_against_database. Точное совпадение
+        возвращается сразу, нечёткий поиск выполняется только без него
+        """
+        return self.search_any([plate], threshold, matcher)[0]
+
+    def search_any(self, plates, threshold=80, matcher=None):
+        """
+        Поиск по вариантам одного номера (PlateDecoder); первый - прочтение OCR,
+        с которым сравниваются остальные. Варианты проверяются точным совпадением
+        по порядку; вариант кроме первого засчитывается, только если он похож
+        на прочтение не меньше threshold (с этой похожестью в результате) - иначе
+        варианты были бы мягче нечёткого поиска. Без точных совпадений - нечёткий
+        поиск по прочтению. Возвращает (совпадения, вариант с точным совпадением или None)
+        """
+        start = time.perf_counter()
+        self.refresh()
+        first = plates[0]
+        with self._lock:
+            for plate in plates:
+                match = self.exact.get(plate)
+                if match is None:
+                    continue
+                if plate == first:
+                    similarity = 100.0
+                elif matcher is not None:
+                    similarity = round(matcher.similarity(first, plate), 1)
+                else:
+                    similarity = round(SequenceMatcher(None, first, plate).ratio() * 100, 1)
+                if similarity >= threshold:
+                    self.exact_hits += 1
+                    matches = [dict(match, similarity=similarity)]
+                    break
+            else:
+                plate = None
+                matches = self.index.search(first, threshold, matcher)
+                if matches:
+                    self.fuzzy_hits += 1
+                else:
+                    self.misses += 1
+        self.metrics.observe('whitelist_lookup_seconds', time.perf_counter() - start)
+        return matches, plate
+
+    def stats(self):
+        """Снимок счётчиков кэша"""
+        with self._lock:
+            lookups = self.exact_hits + self.fuzzy_hits + self.misses
+            return {
+                'size': len(self.exact),
+                'lookups': lookups,
+                'exact_hits': self.exact_hits,
+                'fuzzy_hits': self.fuzzy_hits,
+                'misses': self.misses,
+                'exact_hit_rate': round(self.exact_hits / lookups, 3) if lookups else 0.0,
+                'reloads': self.reloads,
+                'updates': self.updates,
+                'version_checks': self.version_checks,
+            }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
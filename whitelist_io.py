@@ -0,0 +1,149 @@
+"""
+Загрузка и выгрузка базы номеров: CSV и JSON-строки (по записи на строку).
+Файлы читаются и пишутся потоково, весь список в памяти не держится.
+    python whitelist_io.py import fleet.csv [--upsert] [--db plates.db]
+    python whitelist_io.py export plates.jsonl [--db plates.db]
+"""
+import csv
+import sys
+import json
+import time
+import argparse
+
+from config import load_config
+from license_plate_manager import LicensePlateManager
+
+# Порядок столбцов CSV без заголовка - как в поле ввода окна: номер фамилия имя отчество
+CSV_FIELDS = ('plate_number', 'last_name', 'first_name', 'patronymic')
+# Столбцы выгрузки - как в таблице car_owners
+EXPORT_FIELDS = ('id', 'plate_number', 'first_name', 'last_name', 'patronymic', 'created_at')
+# Другие названия столбцов в заголовке CSV и ключей JSON
+ALIASES = {
+    'plate': 'plate_number', 'number': 'plate_number', 'номер': 'plate_number',
+    'фамилия': 'last_name', 'имя': 'first_name', 'отчество': 'patronymic',
+}
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+def normalize_keys(record):
+    """Названия полей записи -> поля car_owners"""
+    normalized = {}
+    for key, value in record.items():
+        if key is None:
+            continue  # лишние столбцы строки CSV
+        key = key.strip().lower()
+        normalized[ALIASES.get(key, key)] = value
+    return normalized
+
+
+def read_csv(path, encoding='utf-8-sig'):
+    """
+    Записи CSV в виде (номер строки, словарь). Разделитель (запятая, точка с запятой
+    или табуляция) определяется по началу файла. Если первая строка не заголовок
+    с plate_number/номер, столбцы идут в порядке CSV_FIELDS
+    """
+    with open(path, newline='', encoding=encoding) as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = None
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                names = [ALIASES.get(cell.strip().lower(), cell.strip().lower()) for cell in row]
+                header = names if 'plate_number' in names else list(CSV_FIELDS)
+                if header is names:
+                    continue
+            yield reader.line_num, normalize_keys(dict(zip(header, row)))
+
+
+def read_jsonl(path, encoding='utf-8'):
+    """Записи файла JSON-строк в виде (номер строки, словарь); ошибка разбора - в поле _error"""
+    with open(path, encoding=encoding) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, {'_error': "Строка - не JSON"}
+                continue
+            if not isinstance(record, dict):
+                yield line_number, {'_error': "Ожидается JSON-объект"}
+                continue
+            yield line_number, normalize_keys(record)
+
+
+def read_records(path):
+    """Чтение по расширению файла: .jsonl/.ndjson - JSON-строки, остальное - CSV"""
+    return read_jsonl(path) if path.lower().endswith(JSONL_EXTENSIONS) else read_csv(path)
+
+
+def import_file(manager, path, upsert=False, batch_size=5000, on_progress=None):
+    """Загрузка файла через manager.import_records; возвращает отчёт с временем загрузки"""
+    start = time.perf_counter()
+    report = manager.import_records(read_records(path), upsert=upsert, batch_size=batch_size,
+                                    on_progress=on_progress)
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def export_file(manager, path):
+    """Потоковая выгрузка всех записей в CSV или JSON-строки (по расширению). Возвращает число записей"""
+    count = 0
+    if path.lower().endswith(JSONL_EXTENSIONS):
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in manager.iter_records():
+                f.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n")
+                count += 1
+    else:
+        # utf-8-sig - чтобы Excel открыл кириллицу без выбора кодировки
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+            for row in manager.iter_records():
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def format_report(report, limit=20):
+    """Итог загрузки текстом: счётчики и первые limit ошибок"""
+    lines = [f"Прочитано строк: {report['read']}, добавлено: {report['added']}, "
+             f"обновлено: {report['updated']}, ошибок: {report['error_count']}"]
+    if report.get('repeated'):
+        lines[0] += f", повторов в файле: {report['repeated']}"
+    if 'seconds' in report:
+        lines[0] += f" за {report['seconds']} с"
+    for item in report['errors'][:limit]:
+        lines.append(f"строка {item['line']}: {item['plate'] or '-'} - {item['error']}")
+    if report['error_count'] > limit:
+        lines.append(f"... и ещё {report['error_count'] - limit}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('path')
+    parser.add_argument('--upsert', action='store_true', help="обновлять владельцев существующих номеров")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--db', help="база номеров (по умолчанию db_path из config.json)")
+    args = parser.parse_args()
+
+    manager = LicensePlateManager(args.db or load_config()['db_path'])
+    try:
+        if args.command == 'import':
+            report = import_file(manager, args.path, upsert=args.upsert, batch_size=args.batch_size)
+            print(format_report(report))
+            sys.exit(1 if report['error_count'] else 0)
+        else:
+            print(f"Выгружено записей: {export_file(manager, args.path)}")
+    finally:
+        manager.close()